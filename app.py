@@ -1,25 +1,96 @@
+import argparse
 import logging
 import sys
 import os
+from datetime import datetime
 
 # プロジェクトのルートをシステムパスに追加
 # これにより、'src'パッケージ内のモジュールを正しくインポートできる
 project_root = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, project_root)
 
+from src.core.shard import Shard
+from src.core.shard_launcher import launch_shards
+from src.core.task_plan import TaskPlan, DEFAULT_TASK_OVERHEAD_SEC, estimate_runtime_sec, load_task_seconds
 from src.core.task_processor import TaskProcessor
+from src.core.checkpoint_store import CheckpointStore
+from src.reporters.report_merger import merge_reports
+from src.utils.config_loader import load_config
 from src.utils.logger_setup import setup_logging
 
-def main():
+def show_plan(resume: bool, shard: Shard | None, shards: int):
+    """ ブラウザを起動せずに、タスク計画の件数と所要時間の見積もりを表示する """
+    logger = logging.getLogger(__name__)
+    config = load_config()
+    if not config:
+        return
+
+    plan = TaskPlan.compile(config.video_processing_rules, shard)
+    plans = [plan]
+    if shards > 1:
+        plans = [TaskPlan(plan.rules, Shard(i, shards)) for i in range(1, shards + 1)]
+
+    logger.info("--- タスク計画 ---")
+    for line in plan.describe():
+        logger.info(line)
+
+    pending = 0
+    for plan in plans:
+        resolved = {}
+        if resume and config.checkpoint_path:
+            checkpoint_path = plan.shard.path_for(config.checkpoint_path) if plan.shard else config.checkpoint_path
+            resolved = CheckpointStore(checkpoint_path).load()
+        for video_id, versions in plan.iter_videos():
+            result = resolved.get(video_id, {})
+            pending += sum(1 for version in versions if version not in result.get("versions", {}))
+    task_count = sum(plan.task_count for plan in plans)
+    logger.info(f"合計: 動画 {sum(plan.video_count for plan in plans)} 件, タスク {task_count} 件 (未取得: {pending} 件)")
+
+    task_seconds = load_task_seconds()
+    source = "前回の計測結果"
+    if task_seconds is None:
+        task_seconds = config.video_play_duration + DEFAULT_TASK_OVERHEAD_SEC
+        source = "既定値"
+    concurrency = config.max_workers * max(shards, 1)
+    runtime_sec = round(estimate_runtime_sec(pending, concurrency, task_seconds))
+    logger.info(
+        f"所要時間の見積もり: 約 {runtime_sec // 3600}時間{runtime_sec % 3600 // 60}分{runtime_sec % 60}秒 "
+        f"(1タスク {task_seconds:.1f}秒 ({source}), 同時実行数 {concurrency})"
+    )
+
+def main(engine: str = "sync", resume: bool = False, shard: Shard | None = None, shards: int = 0,
+         report_path: str | None = None, merge_paths: list[str] | None = None, plan_only: bool = False):
     """
     アプリケーションを初期化し、タスクプロセッサを実行する
+    shardsを指定した場合はシャードごとのプロセスを起動し、merge_pathsを指定した場合はレポートの結合のみ行う
+    plan_onlyを指定した場合は処理を行わず、タスク計画を表示する
     """
-    setup_logging()
+    setup_logging(shard.name if shard else "")
     logger = logging.getLogger(__name__)
-    logger.info("アプリケーションを開始します。")
 
     try:
-        processor = TaskProcessor()
+        if plan_only:
+            show_plan(resume, shard, shards)
+            return
+
+        if merge_paths:
+            config = load_config()
+            output_path = report_path or os.path.join("urls", f"urls_{datetime.now().strftime('%Y-%m-%d-%H%M%S')}.yaml")
+            if config:
+                merge_reports(merge_paths, output_path, TaskPlan.compile(config.video_processing_rules))
+            return
+
+        if shards > 1:
+            logger.info(f"{shards} 個のシャードに分割して実行します。(エンジン: {engine})")
+            launch_shards(os.path.abspath(__file__), shards, engine, resume, report_path)
+            return
+
+        logger.info(f"アプリケーションを開始します。(エンジン: {engine}{f', シャード: {shard}' if shard else ''})")
+        if engine == "async":
+            from src.core.async_task_processor import AsyncTaskProcessor
+            processor = AsyncTaskProcessor(resume=resume, shard=shard, report_path=report_path)
+        else:
+            processor = TaskProcessor(resume=resume, shard=shard, report_path=report_path)
         processor.run()
     except Exception as e:
         logger.critical(f"予期せぬクリティカルなエラーで処理が中断されました: {e}", exc_info=True)
@@ -27,4 +98,34 @@ def main():
         logger.info("アプリケーションを終了します。")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="動画ページからm3u8のURLとメタデータを抽出します。")
+    parser.add_argument(
+        "--engine", choices=["sync", "async"], default="sync",
+        help="実行エンジン。asyncは1つのイベントループで複数ページを並行処理します (同時実行数はmax_workers)"
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="チェックポイントから前回の結果を読み込み、未取得(ERROR)のタスクのみ処理します"
+    )
+    parser.add_argument(
+        "--shard", type=Shard.parse,
+        help="i/n 形式で指定し、n個に分割した動画のうちi番目のみ処理します (複数のマシンで分担する場合など)"
+    )
+    parser.add_argument(
+        "--shards", type=int, default=0,
+        help="指定した数のプロセスを起動して分担処理し、終了後にレポートを1つに結合します"
+    )
+    parser.add_argument("--report", help="レポートの出力先 (デフォルト: urls/urls_日時.yaml)")
+    parser.add_argument(
+        "--merge", nargs="+", metavar="REPORT",
+        help="処理を行わず、指定したシャードごとのレポートを--reportのパスに結合します"
+    )
+    parser.add_argument(
+        "--plan", action="store_true",
+        help="処理を行わず、ルールごとのタスク数と所要時間の見積もりを表示します (--resume, --shard, --shardsと併用可)"
+    )
+    args = parser.parse_args()
+    if args.shard and args.shards:
+        parser.error("--shard と --shards は同時に指定できません。")
+
+    main(args.engine, args.resume, args.shard, args.shards, args.report, args.merge, args.plan)
\ No newline at end of file
@@ -0,0 +1,185 @@
+import hashlib
+import logging
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger(__name__)
+
+LOGIN_PATH = "/spdwe_login/"
+MOVIE_PATH = "/spdwe/movie2/"
+HLS_PATH = "/hls/"
+SESSION_COOKIE = "bench_session"
+# プレイヤーが要求するm3u8のホスト。UrlFinderはリクエストの発生だけを監視するため、実在しないホストでよい
+PLAYER_CDN = "https://cdn.bench.invalid"
+
+LOGIN_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Login</title></head>
+<body>
+<form method="post" action="{login_path}">
+  <input type="text" name="email">
+  <input type="password" name="password">
+  <button type="submit">ログイン</button>
+</form>
+</body></html>
+"""
+
+# Tabでプレイヤーにフォーカスを移した後、Spaceで再生するとm3u8を要求する
+# URLはスクリプト内で組み立て、HTMLに完全なURLが現れないようにする (本番のプレイヤーと同様)
+MOVIE_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Movie {video_id}</title></head>
+<body>
+<p class="pageHeader02_lesson">Bench Lesson</p>
+<p class="pageHeader02_songNumber">1-{video_id}</p>
+<h1 class="pageHeader02_title">Bench Song {video_id}</h1>
+<a href="#">menu</a>
+<div id="player" tabindex="0">player</div>
+<script>
+  let tabs = 0;
+  document.addEventListener('keydown', (event) => {{
+    if (event.key === 'Tab') tabs += 1;
+    if (event.key === ' ' && tabs > 0) {{
+      setTimeout(() => {{
+        fetch('{cdn}' + '/{video_id}/' + '{token}' + '_9.m3u8').catch(() => {{}});
+      }}, {player_delay_ms});
+    }}
+  }});
+</script>
+</body></html>
+"""
+
+# MPEG-TSのNULLパケット (188バイト)。中身は意味を持たないが、転送量の計測には十分
+TS_NULL_PACKET = b"\x47\x1f\xff\x10" + b"\xff" * 184
+
+class FakeSite:
+    """
+    ベンチマーク用に、ログインフォーム・動画ページ・HLS配信を模したローカルHTTPサーバー
+    すべての応答にlatency_msの遅延を加える。missing_idsの動画ページは404を返す
+    """
+    def __init__(self, latency_ms: int = 50, player_delay_ms: int = 300,
+                 segments: int = 10, segment_bytes: int = 64 * 1024, port: int = 0,
+                 missing_ids: set[int] | None = None):
+        self.latency_ms = latency_ms
+        self.missing_ids = missing_ids or set()
+        self.player_delay_ms = player_delay_ms
+        self.segments = segments
+        self.segment_bytes = segment_bytes
+        self._segment = (TS_NULL_PACKET * (segment_bytes // len(TS_NULL_PACKET) + 1))[:segment_bytes]
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeSite":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-site", daemon=True)
+        self._thread.start()
+        logger.info(f"ベンチマーク用のサイトを起動しました: {self.base_url}")
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeSite":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def hls_url(self, name: str) -> str:
+        """ ダウンローダーのベンチマークで使用するm3u8のURL """
+        return f"{self.base_url}{HLS_PATH}{name}/index_9.m3u8"
+
+    def media_playlist(self) -> str:
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:2", "#EXT-X-MEDIA-SEQUENCE:0"]
+        for i in range(self.segments):
+            lines += ["#EXTINF:2.0,", f"seg{i}.ts"]
+        lines.append("#EXT-X-ENDLIST")
+        return "\n".join(lines) + "\n"
+
+    def _handler_class(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+            def _delay(self):
+                if site.latency_ms:
+                    time.sleep(site.latency_ms / 1000)
+
+            def _send(self, status: int, body: bytes = b"", content_type: str = "text/html; charset=utf-8",
+                      headers: dict | None = None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _logged_in(self) -> bool:
+                return f"{SESSION_COOKIE}=1" in (self.headers.get("Cookie") or "")
+
+            def do_GET(self):
+                self._delay()
+                path = urlsplit(self.path).path
+                if path == LOGIN_PATH:
+                    self._send(200, LOGIN_HTML.format(login_path=LOGIN_PATH).encode("utf-8"))
+                elif path.startswith(MOVIE_PATH):
+                    self._movie(path)
+                elif path.startswith(HLS_PATH):
+                    self._hls(path)
+                else:
+                    self._send(404, b"not found")
+
+            def do_POST(self):
+                self._delay()
+                if urlsplit(self.path).path != LOGIN_PATH:
+                    self._send(404, b"not found")
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                form = parse_qs(self.rfile.read(length).decode("utf-8"))
+                if not form.get("email") or not form.get("password"):
+                    self._send(200, LOGIN_HTML.format(login_path=LOGIN_PATH).encode("utf-8"))
+                    return
+                self._send(302, headers={
+                    "Location": MOVIE_PATH,
+                    "Set-Cookie": f"{SESSION_COOKIE}=1; Path=/",
+                })
+
+            def _movie(self, path: str):
+                if not self._logged_in():
+                    self._send(302, headers={"Location": LOGIN_PATH})
+                    return
+                match = re.fullmatch(rf"{MOVIE_PATH}(\d+)/?", path)
+                if not match:
+                    self._send(200, b"<html><body>movies</body></html>")
+                    return
+                video_id = match.group(1)
+                if int(video_id) in site.missing_ids:
+                    self._send(404, b"not found")
+                    return
+                version = parse_qs(urlsplit(self.path).query).get("ver", [""])[0]
+                token = hashlib.md5(f"{video_id}-{version}".encode("utf-8")).hexdigest()
+                body = MOVIE_HTML.format(
+                    video_id=video_id, token=token, cdn=PLAYER_CDN, player_delay_ms=site.player_delay_ms
+                )
+                self._send(200, body.encode("utf-8"))
+
+            def _hls(self, path: str):
+                name = path.rsplit("/", 1)[-1]
+                if name == "index_9.m3u8":
+                    self._send(200, site.media_playlist().encode("utf-8"), "application/vnd.apple.mpegurl")
+                elif re.fullmatch(r"seg\d+\.ts", name):
+                    self._send(200, site._segment, "video/mp2t")
+                else:
+                    self._send(404, b"not found")
+
+        return Handler
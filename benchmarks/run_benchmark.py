@@ -0,0 +1,211 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import yaml
+
+# プロジェクトのルートをシステムパスに追加し、'src'パッケージをインポートできるようにする
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from fake_site import FakeSite, LOGIN_PATH, MOVIE_PATH
+from src.reporters.report_index import ReportIndex, read_report
+from src.utils.config_loader import Config
+from src.utils.logger_setup import setup_logging
+
+logger = logging.getLogger(__name__)
+
+TARGETS = ("extractor", "downloader", "all")
+
+def build_config(site: FakeSite, args) -> Config:
+    """ ローカルのサイトを対象とし、チェックポイントなどの永続化を行わない設定を生成する """
+    return Config(
+        login_url=f"{site.base_url}{LOGIN_PATH}",
+        video_url_base=f"{site.base_url}{MOVIE_PATH}",
+        retry_count=1,
+        video_play_duration=args.play_duration,
+        timeout_navigation=10000,
+        timeout_visible=5000,
+        timeout_click=5000,
+        username="bench@example.com",
+        password="bench",
+        video_processing_rules=[
+            {"id_range": {"start": 1, "end": args.videos}, "versions": args.versions}
+        ],
+        max_workers=args.workers,
+        browser_headless=True,
+        browser_channel=args.channel,
+        browser_args=["--mute-audio"],
+        block_resource_types=["image", "font"],
+        block_media_segments=True,
+        allow_url_patterns=[r"\.m3u8(\?|$)"],
+        extraction_mode=args.extraction_mode,
+        probe_enabled=not args.no_probe,
+    )
+
+def bench_extractor(site: FakeSite, args) -> dict:
+    """ TaskProcessorでローカルのサイトからURLを抽出し、処理件数と所要時間を返す """
+    if args.engine == "async":
+        from src.core.async_task_processor import AsyncTaskProcessor as processor_class
+    else:
+        from src.core.task_processor import TaskProcessor as processor_class
+
+    processor = processor_class(config=build_config(site, args))
+    start = time.perf_counter()
+    processor.run()
+    wall_time = time.perf_counter() - start
+
+    tasks = (args.videos - len(missing_ids(args))) * len(args.versions)
+    # 処理が終わった動画はall_resultsから取り除かれるため、出力されたレポートから数える
+    index = ReportIndex()
+    index.add(read_report(processor.report_path))
+    succeeded = len(index.urls)
+    return {
+        "target": "extractor",
+        "engine": args.engine,
+        "workers": args.workers,
+        "extraction_mode": args.extraction_mode,
+        "tasks": tasks,
+        "succeeded": succeeded,
+        "wall_time_sec": round(wall_time, 3),
+        "tasks_per_sec": round(succeeded / wall_time, 3) if wall_time > 0 else 0.0,
+        "stages": processor.metrics.summary()["stages"],
+    }
+
+def missing_ids(args) -> set[int]:
+    """ --missing-everyで指定した、存在しない動画として扱うID """
+    if args.missing_every <= 0:
+        return set()
+    return set(range(args.missing_every, args.videos + 1, args.missing_every))
+
+def write_download_yaml(site: FakeSite, args, path: str):
+    """ ローカルのHLS配信を指すurls_*.yaml形式のファイルを生成する """
+    items = []
+    for video_id in range(1, args.videos + 1):
+        item = {
+            "id": video_id,
+            "lesson": "Bench Lesson",
+            "song_number": f"1-{video_id}",
+            "title": f"Bench Song {video_id}",
+        }
+        if args.versions == [None]:
+            item["url"] = site.hls_url(str(video_id))
+        else:
+            item["versions"] = [{"ver": ver, "url": site.hls_url(f"{video_id}_{ver}")} for ver in args.versions]
+        items.append(item)
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.dump(items, f, allow_unicode=True, sort_keys=False)
+
+def bench_downloader(site: FakeSite, args, workdir: str) -> dict:
+    """ download_videos.pyを別プロセスで実行し、ダウンロード件数と所要時間を返す """
+    yaml_path = os.path.join(workdir, "bench_urls.yaml")
+    write_download_yaml(site, args, yaml_path)
+    download_dir = os.path.join(workdir, "downloader")
+    os.makedirs(download_dir, exist_ok=True)
+
+    command = [
+        sys.executable, os.path.join(project_root, "downloader", "download_videos.py"), yaml_path,
+        "--jobs", str(args.jobs), "--backend", args.backend,
+        "--segment-workers", str(args.segment_workers),
+    ]
+    start = time.perf_counter()
+    completed = subprocess.run(command, cwd=download_dir, capture_output=True, text=True, encoding="utf-8")
+    wall_time = time.perf_counter() - start
+    if completed.returncode != 0:
+        logger.error(f"ダウンローダーが異常終了しました: {completed.stderr.strip()}")
+
+    files = [
+        os.path.join(root, name)
+        for root, _, names in os.walk(os.path.join(download_dir, "VIDEO"))
+        for name in names if name.endswith(".mp4")
+    ]
+    total_bytes = sum(os.path.getsize(path) for path in files)
+    return {
+        "target": "downloader",
+        "backend": args.backend,
+        "jobs": args.jobs,
+        "tasks": args.videos * len(args.versions),
+        "succeeded": len(files),
+        "wall_time_sec": round(wall_time, 3),
+        "tasks_per_sec": round(len(files) / wall_time, 3) if wall_time > 0 else 0.0,
+        "mb_per_sec": round(total_bytes / wall_time / 1024 ** 2, 3) if wall_time > 0 else 0.0,
+    }
+
+def parse_versions(text: str) -> list[int | None]:
+    """ "1,2,3" や "none" (バージョン指定なし) を解析する """
+    return [None if v.strip().lower() == "none" else int(v) for v in text.split(",") if v.strip()]
+
+def main(args):
+    workdir = args.workdir or tempfile.mkdtemp(prefix="dlmv2-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    # レポートやログは作業ディレクトリに出力する
+    original_cwd = os.getcwd()
+    os.chdir(workdir)
+    setup_logging()
+
+    results = []
+    try:
+        with FakeSite(args.latency_ms, args.player_delay_ms, args.segments, args.segment_kb * 1024,
+                      missing_ids=missing_ids(args)) as site:
+            if args.target in ("extractor", "all"):
+                results.append(bench_extractor(site, args))
+            if args.target in ("downloader", "all"):
+                results.append(bench_downloader(site, args, workdir))
+    finally:
+        os.chdir(original_cwd)
+
+    logger.info("--- ベンチマーク結果 ---")
+    for result in results:
+        logger.info(
+            f"{result['target']}: {result['succeeded']}/{result['tasks']} 件, "
+            f"{result['wall_time_sec']:.2f}秒, {result['tasks_per_sec']:.2f} 件/秒"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"parameters": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+        logger.info(f"結果を保存しました: {args.output}")
+
+    if args.workdir is None and not args.keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+    else:
+        logger.info(f"作業ディレクトリ: {workdir}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ローカルの模擬サイトを使って抽出とダウンロードの処理速度を計測します。")
+    parser.add_argument("--target", choices=TARGETS, default="all", help="計測対象 (デフォルト: all)")
+    parser.add_argument("--videos", type=int, default=10, help="処理する動画の数 (デフォルト: 10)")
+    parser.add_argument("--versions", type=parse_versions, default=[1, 2, 3], help="バージョン (カンマ区切り、noneは指定なし。デフォルト: 1,2,3)")
+    parser.add_argument("--latency-ms", type=int, default=50, help="模擬サイトの応答ごとの遅延 (デフォルト: 50)")
+    parser.add_argument("--player-delay-ms", type=int, default=300, help="再生操作からm3u8を要求するまでの遅延 (デフォルト: 300)")
+    parser.add_argument("--engine", choices=["sync", "async"], default="sync", help="抽出の実行エンジン (デフォルト: sync)")
+    parser.add_argument("--workers", type=int, default=1, help="抽出の同時実行数 (max_workers、デフォルト: 1)")
+    parser.add_argument(
+        "--extraction-mode", choices=["browser", "http_first"], default="browser",
+        help="抽出方式 (デフォルト: browser)"
+    )
+    parser.add_argument(
+        "--missing-every", type=int, default=0,
+        help="N件ごとに1件を存在しない動画(404)にします。URL抽出のみが対象です (デフォルト: 0、すべて存在)"
+    )
+    parser.add_argument("--no-probe", action="store_true", help="URL抽出の前に動画の存在を確認しません")
+    parser.add_argument("--play-duration", type=int, default=5, help="URLを待機する再生時間の上限(秒) (デフォルト: 5)")
+    parser.add_argument(
+        "--channel", default=None,
+        help="使用するブラウザのチャンネル (例: chrome)。未指定の場合はPlaywright同梱のChromiumを使用します"
+    )
+    parser.add_argument("--jobs", type=int, default=4, help="ダウンロードの同時実行数 (デフォルト: 4)")
+    parser.add_argument("--backend", default="native", help="ダウンロード方式 (デフォルト: native)")
+    parser.add_argument("--segment-workers", type=int, default=8, help="1本あたりのセグメントの同時取得数 (デフォルト: 8)")
+    parser.add_argument("--segments", type=int, default=10, help="1本あたりのセグメント数 (デフォルト: 10)")
+    parser.add_argument("--segment-kb", type=int, default=64, help="セグメントのサイズ(KB) (デフォルト: 64)")
+    parser.add_argument("--workdir", help="作業ディレクトリ。未指定の場合は一時ディレクトリを使用し、終了後に削除します")
+    parser.add_argument("--keep", action="store_true", help="一時ディレクトリを削除せずに残します")
+    parser.add_argument("--output", help="結果をJSONで保存するパス")
+    main(parser.parse_args())
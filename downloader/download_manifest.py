@@ -0,0 +1,102 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    path TEXT PRIMARY KEY,
+    source_url TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    duration REAL,
+    checksum TEXT NOT NULL,
+    completed_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_downloads_source_url ON downloads (source_url);
+"""
+
+@dataclass
+class ManifestEntry:
+    path: str
+    source_url: str
+    size: int
+    duration: Optional[float]
+    checksum: str
+    completed_at: str
+
+def file_checksum(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """ ファイルのSHA-256を計算する """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class DownloadManifest:
+    """
+    ダウンロードが完了したファイルの記録 (SQLite)
+    実行開始時に全件をメモリ上の索引に読み込み、各タスクの判定は索引の参照だけで行う
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self.by_path: Dict[str, ManifestEntry] = {}
+        self.by_url: Dict[str, ManifestEntry] = {}
+        for row in self._conn.execute(
+            "SELECT path, source_url, size, duration, checksum, completed_at FROM downloads"
+        ):
+            self._index(ManifestEntry(*row))
+        logger.info(f"ダウンロード記録から {len(self.by_path)} 件を読み込みました: {path}")
+
+    def _index(self, entry: ManifestEntry):
+        self.by_path[entry.path] = entry
+        self.by_url[entry.source_url] = entry
+
+    def record(self, path: str, source_url: str, duration: Optional[float] = None) -> ManifestEntry:
+        """ 完了したファイルのサイズとチェックサムを計算して記録する """
+        entry = ManifestEntry(
+            path=path,
+            source_url=source_url,
+            size=os.path.getsize(path),
+            duration=duration,
+            checksum=file_checksum(path),
+            completed_at=datetime.now().isoformat(timespec="seconds"),
+        )
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO downloads VALUES (?, ?, ?, ?, ?, ?)",
+                (entry.path, entry.source_url, entry.size, entry.duration, entry.checksum, entry.completed_at),
+            )
+            self._conn.commit()
+            self._index(entry)
+        return entry
+
+    def forget(self, path: str):
+        """ 破損などで再ダウンロードするファイルの記録を削除する """
+        with self._lock:
+            self._conn.execute("DELETE FROM downloads WHERE path = ?", (path,))
+            self._conn.commit()
+            entry = self.by_path.pop(path, None)
+            if entry and self.by_url.get(entry.source_url) is entry:
+                del self.by_url[entry.source_url]
+
+    def is_intact(self, entry: ManifestEntry, verify_checksum: bool = False) -> bool:
+        """ 記録されたファイルが存在し、サイズ(とチェックサム)が記録と一致するかを判定する """
+        try:
+            if os.path.getsize(entry.path) != entry.size:
+                return False
+        except OSError:
+            return False
+        return not verify_checksum or file_checksum(entry.path) == entry.checksum
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
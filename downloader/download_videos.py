@@ -1,82 +1,355 @@
 import argparse
 import logging
 import os
+import shutil
+import sys
+import threading
 import yaml
-from typing import List, Dict, Any
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterable, Iterator, Optional
+
+# プロジェクトのルートをシステムパスに追加し、URL抽出ツールと共通の'src'パッケージをインポートできるようにする
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
 
 from utils.logger_setup import setup_logging
-from path_formatter import format_download_tasks
-from downloader import download_video
+from path_formatter import iter_all_tasks
+from downloader import (
+    download_video, expected_duration, probe_duration, DownloadResult, BACKENDS, REASON_YTDLP_MISSING
+)
+from host_limiter import HostLimiter
+from download_manifest import DownloadManifest
+from yaml_stream import iter_yaml_items
+from scheduler import BandwidthLimiter, PriorityPolicy, RateWindow, format_rate, parse_rate
+from src.utils.retry_policy import CircuitBreaker, RetryPolicy, RetryQueue
+
+logger = logging.getLogger(__name__)
+
+class DownloadStats:
+    """ 複数スレッドから更新される成功/失敗/スキップの件数 """
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, key: str):
+        with self._lock:
+            self._counts[key] += 1
+
+    def __getitem__(self, key: str) -> int:
+        with self._lock:
+            return self._counts[key]
+
+# plan_taskが決める、各タスクで行う処理
+ACTION_DOWNLOAD = "download"
+ACTION_COPY = "copy"            # 同じURLを別名で取得済みのファイルを複製する
+ACTION_VERIFY = "verify"        # 記録のあるファイルのチェックサムを照合する (--verify-checksum)
+ACTION_ADOPT = "adopt"          # 記録のない既存ファイルを検査し、完成品であれば記録に取り込む
+
+# 記録のない既存ファイルの再生時間と、プレイリストの再生時間の差として許容する範囲(秒)
+ADOPT_DURATION_TOLERANCE_SEC = 2.0
+
+# ffprobeがない旨の警告を1回の実行で1度だけ出力するためのフラグ
+_ffprobe_missing_logged = threading.Event()
+
+def plan_task(task: Dict[str, Any], manifest: DownloadManifest, verify_checksum: bool = False) -> Optional[str]:
+    """
+    ダウンロード記録を参照し、タスクで行う処理(ACTION_*)を返す。完了済みのファイルはNoneを返す
+    ここでは記録の参照とファイルサイズの確認のみを行い、ファイル全体を読み書きする処理はワーカーに任せる
+    """
+    full_path = os.path.join(task["dir_path"], task["file_name"])
+    download_url = task["download_url"]
+
+    entry = manifest.by_path.get(full_path)
+    if entry:
+        if manifest.is_intact(entry):
+            return ACTION_VERIFY if verify_checksum else None
+        logger.warning(f"ファイルが欠損または破損しているため、再ダウンロードします: {full_path}")
+        manifest.forget(full_path)
+        if os.path.exists(full_path):
+            os.remove(full_path)
+    elif os.path.exists(full_path):
+        return ACTION_ADOPT
+
+    same_url = manifest.by_url.get(download_url)
+    if same_url and same_url.path != full_path and manifest.is_intact(same_url):
+        task["copy_from"] = same_url.path
+        return ACTION_COPY
+
+    return ACTION_DOWNLOAD
+
+def adopt_existing(full_path: str, download_url: str, manifest: DownloadManifest) -> Optional[bool]:
+    """
+    記録の導入前にダウンロードされたファイル(途中で中断されたものを含む)を検査する
+    ffprobeで読み込め、再生時間がプレイリストと一致すれば完成品として記録に取り込みTrueを、
+    再生時間がプレイリストと一致しなければ削除してFalseを返す
+    判定できない場合(ffprobeがない、ファイルを読み込めない、プレイリストを取得できない)は、ファイルを残してNoneを返す
+    (プレイリストのURLの期限が切れていると再ダウンロードできないため、不一致を確認できたファイルのみ削除する)
+    """
+    if shutil.which("ffprobe") is None:
+        if not _ffprobe_missing_logged.is_set():
+            _ffprobe_missing_logged.set()
+            logger.warning("ffprobeが見つからないため、記録のない既存ファイルは検査せずに残します。")
+        return None
+    duration = probe_duration(full_path)
+    if duration is None:
+        logger.warning(f"記録のない既存ファイルを動画として読み込めないため、残したままスキップします: {full_path}")
+        return None
+    expected = expected_duration(download_url)
+    if expected is None:
+        logger.warning(f"プレイリストを取得できないため、記録のない既存ファイルを検査できません (次回の実行で再確認します): {full_path}")
+        return None
+    if abs(duration - expected) <= ADOPT_DURATION_TOLERANCE_SEC:
+        logger.info(f"記録のない既存ファイルを検査し、ダウンロード記録に追加しました: {full_path}")
+        manifest.record(full_path, download_url, duration)
+        return True
+    logger.warning(
+        f"記録のない既存ファイルの再生時間がプレイリストと一致しないため、再ダウンロードします "
+        f"({duration:.0f}秒 / {expected:.0f}秒): {full_path}"
+    )
+    os.remove(full_path)
+    return False
+
+def resolve_existing(task: Dict[str, Any], manifest: DownloadManifest) -> Optional[bool]:
+    """
+    ダウンロード以外の処理(複製・照合・既存ファイルの検査)を行う
+    完了した場合はTrue、ダウンロードが必要な場合はFalse、判定できず今回は処理しない場合はNoneを返す
+    """
+    action = task.get("action", ACTION_DOWNLOAD)
+    full_path = os.path.join(task["dir_path"], task["file_name"])
+    download_url = task["download_url"]
+
+    if action == ACTION_VERIFY:
+        entry = manifest.by_path.get(full_path)
+        if entry and manifest.is_intact(entry, verify_checksum=True):
+            return True
+        logger.warning(f"チェックサムが記録と一致しないため、再ダウンロードします: {full_path}")
+        manifest.forget(full_path)
+        if os.path.exists(full_path):
+            os.remove(full_path)
+    elif action == ACTION_ADOPT:
+        return adopt_existing(full_path, download_url, manifest)
+    elif action == ACTION_COPY:
+        source = manifest.by_path.get(task["copy_from"])
+        if source and manifest.is_intact(source):
+            logger.info(f"同じURLの動画が {source.path} に保存済みのため、複製します: {full_path}")
+            os.makedirs(task["dir_path"], exist_ok=True)
+            shutil.copy2(source.path, full_path)
+            manifest.record(full_path, download_url, source.duration)
+            return True
+    return False
+
+def iter_download_tasks(yaml_path: str, manifest: DownloadManifest, stats: DownloadStats,
+                        verify_checksum: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    YAMLファイルの項目を先頭から順に読み込み、ダウンロードが必要なタスクを逐次返す
+    全件の読み込みを待たずに最初のダウンロードを開始できる
+    """
+    def valid_items() -> Iterator[Dict[str, Any]]:
+        try:
+            for item in iter_yaml_items(yaml_path):
+                if item.get('status') == 'MISSING':
+                    logger.info(f"ID {item.get('id')} は存在しない動画のためスキップします。")
+                    stats.add("skip")
+                    continue
+                if item.get('status') == 'ERROR' and 'versions' not in item:
+                    logger.warning(f"ID {item.get('id')} はエラーのためスキップします。")
+                    stats.add("skip")
+                    continue
+                yield item
+        except (yaml.YAMLError, ValueError) as e:
+            # 読み込み済みの項目は処理を続け、以降の項目は読み込まない (トップレベルがシーケンスでない場合はValueError)
+            logger.error(f"YAMLファイルの読み込み中にエラーが発生しました: {e}")
+
+    for task in iter_all_tasks(valid_items()):
+        action = plan_task(task, manifest, verify_checksum)
+        if action is None:
+            stats.add("skip")
+        else:
+            task["action"] = action
+            yield task
+
+def process_task(task: Dict[str, Any], index: int, host_limiter: HostLimiter,
+                 manifest: DownloadManifest, backend: str = "ytdlp", segment_workers: int = 8,
+                 limiter: Optional[BandwidthLimiter] = None) -> DownloadResult:
+    """
+    1件のダウンロードタスクを処理し、結果を返す
+    """
+    dir_path = task["dir_path"]
+    file_name = task["file_name"]
+    download_url = task["download_url"]
+
+    full_path = os.path.join(dir_path, file_name)
 
-def main(yaml_path: str):
+    logger.info(f"--- 処理中 ({index}) ---")
+    logger.info(f"動画URL: {download_url}")
+    logger.info(f"保存先: {full_path}")
+
+    os.makedirs(dir_path, exist_ok=True)
+
+    if limiter:
+        limiter.wait_until_allowed()
+    with host_limiter.slot(download_url):
+        result = download_video(download_url, full_path, backend, segment_workers, limiter)
+    if result:
+        manifest.record(full_path, download_url, result.duration)
+        return result
+
+    if os.path.exists(full_path):
+        try:
+            os.remove(full_path)
+        except OSError as e:
+            logger.error(f"失敗したファイルの削除に失敗しました: {e}")
+    return result
+
+def build_retry_policy(retries: int, retry_delay: float) -> RetryPolicy:
+    """ ダウンロードのリトライ方針。yt-dlpが見つからない場合は再試行しても成功しないため予算を0にする """
+    return RetryPolicy(retries, {REASON_YTDLP_MISSING: 0}, base_delay=retry_delay, max_delay=retry_delay * 16)
+
+def build_circuit_breaker(retry_delay: float, window: int = 10, cooldown: Optional[float] = None) -> CircuitBreaker:
+    """ 失敗が続いた場合に新しいダウンロードを止める遮断器。停止時間を省略した場合は待機時間の24倍とする """
+    return CircuitBreaker(window, cooldown=retry_delay * 24 if cooldown is None else cooldown)
+
+def main(yaml_path: str, jobs: int = 1, per_host: int = 2, backend: str = "auto", segment_workers: int = 8,
+         manifest_path: str = "download_manifest.sqlite3", verify_checksum: bool = False,
+         limiter: Optional[BandwidthLimiter] = None, priority: Optional[PriorityPolicy] = None,
+         retries: int = 2, retry_delay: float = 5.0, breaker_window: int = 10,
+         breaker_cooldown: Optional[float] = None):
     setup_logging()
-    logger = logging.getLogger(__name__)
-    
-    logger.info(f"YAMLファイルを読み込みます: {yaml_path}")
-    try:
-        with open(yaml_path, 'r', encoding='utf-8') as f:
-            data = yaml.safe_load(f)
-    except FileNotFoundError:
+
+    if not os.path.exists(yaml_path):
         logger.error(f"指定されたYAMLファイルが見つかりません: {yaml_path}")
         return
-    except Exception as e:
-        logger.error(f"YAMLファイルの読み込み中にエラーが発生しました: {e}")
-        return
+    logger.info(f"YAMLファイルを読み込みます: {yaml_path}")
 
-    success_count = 0
-    skip_count = 0
-    fail_count = 0
-    
-    download_queue: List[Dict[str, Any]] = []
-    for item in data:
-        if item.get('status') == 'ERROR' and 'versions' not in item:
-            logger.warning(f"ID {item.get('id')} はエラーのためスキップします。")
-            skip_count += 1
-            continue
-        
-        tasks = format_download_tasks(item)
-        download_queue.extend(tasks)
-
-    total_tasks = len(download_queue)
-    logger.info(f"ダウンロード対象の動画は {total_tasks} 件です。")
-
-    for i, task in enumerate(download_queue):
-        dir_path = task["dir_path"]
-        file_name = task["file_name"]
-        download_url = task["download_url"]
-        
-        full_path = os.path.join(dir_path, file_name)
-        
-        logger.info(f"--- 処理中 ({i+1}/{total_tasks}) ---")
-        logger.info(f"動画URL: {download_url}")
-        logger.info(f"保存先: {full_path}")
+    stats = DownloadStats()
+    manifest = DownloadManifest(manifest_path)
+    jobs = max(1, jobs)
+    logger.info(f"ダウンロードを開始します。(同時実行数: {jobs}, ホストごとの上限: {per_host}, 方式: {backend})")
+    if limiter and limiter.is_active():
+        logger.info(
+            f"転送速度の制限: 全体 {format_rate(limiter.current_rate())}, ホストごと {format_rate(limiter.host_rate)}"
+            f", 時間帯の指定 {len(limiter.windows)} 件"
+        )
 
-        if os.path.exists(full_path):
-            logger.warning("ファイルが既に存在するため、スキップします。")
-            skip_count += 1
-            continue
-
-        os.makedirs(dir_path, exist_ok=True)
-        
-        if download_video(download_url, full_path):
-            success_count += 1
-        else:
-            fail_count += 1
-            if os.path.exists(full_path):
-                try:
-                    os.remove(full_path)
-                except OSError as e:
-                    logger.error(f"失敗したファイルの削除に失敗しました: {e}")
+    host_limiter = HostLimiter(per_host)
+    # 投入済みで未完了のタスク数を制限し、キューが際限なく膨らまないようにする
+    pending = threading.BoundedSemaphore(jobs * 2)
+    retry_policy = build_retry_policy(retries, retry_delay)
+    circuit_breaker = build_circuit_breaker(retry_delay, breaker_window, breaker_cooldown)
+    # 失敗したタスクは待機時間が経過するまで後回しにし、その間は他のタスクを処理する
+    work = RetryQueue()
+
+    def run(task: Dict[str, Any], index: int, failures: int):
+        try:
+            if task["action"] != ACTION_DOWNLOAD:
+                # 複製やチェックサムの計算はファイル全体を読み書きするため、計画ではなくワーカーで行う
+                resolved = resolve_existing(task, manifest)
+                if resolved is not False:
+                    # 完了済み、または判定できずファイルを残した場合
+                    stats.add("skip")
+                    return
+                task["action"] = ACTION_DOWNLOAD
+            circuit_breaker.wait()
+            result = process_task(task, index, host_limiter, manifest, backend, segment_workers, limiter)
+            circuit_breaker.record(bool(result))
+            if result:
+                stats.add("success")
+            elif retry_policy.should_retry(result.reason, failures + 1):
+                delay = retry_policy.delay(failures + 1)
+                logger.info(
+                    f"{delay:.1f}秒後に再試行します ({result.reason}: {failures + 1}/{retry_policy.budget(result.reason)}): "
+                    f"{task['download_url']}"
+                )
+                work.defer((task, index, failures + 1), delay)
+            else:
+                stats.add("fail")
+        except Exception as e:
+            logger.error(f"予期せぬエラーが発生しました: {e}", exc_info=True)
+            stats.add("fail")
+        finally:
+            pending.release()
+            work.task_done()
+
+    tasks: Iterable[Dict[str, Any]] = iter_download_tasks(yaml_path, manifest, stats, verify_checksum)
+    if priority and priority.is_active():
+        # 並べ替えのため、優先度を指定した場合は全件を読み込んでから開始する
+        tasks = priority.order(tasks)
+        logger.info(f"優先度順に並べ替えました (レッスン: {priority.lessons}, バージョン: {priority.versions})。")
+
+    submitted = 0
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="download") as executor:
+        def dispatch(item):
+            pending.acquire()
+            executor.submit(run, *item)
+
+        for task in tasks:
+            submitted += 1
+            work.put((task, submitted, 0))
+            dispatch(work.get())
+        # 再試行待ちのタスクがなくなるまで投入を続ける
+        while (item := work.get()) is not None:
+            dispatch(item)
+
+    logger.info(f"ダウンロード・検査の対象の動画は {submitted} 件でした。")
+    manifest.close()
 
     logger.info("--- 全ての処理が完了しました ---")
-    logger.info(f"成功: {success_count} 件")
-    logger.info(f"失敗: {fail_count} 件")
-    logger.info(f"スキップ (エラー/既存): {skip_count} 件")
+    logger.info(f"成功: {stats['success']} 件")
+    logger.info(f"失敗: {stats['fail']} 件")
+    logger.info(f"スキップ (エラー/既存): {stats['skip']} 件")
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="YAMLファイルから動画をダウンロードします。")
     parser.add_argument("yaml_file", help="入力するurls_XXX.yamlファイルのパス")
+    parser.add_argument("--jobs", type=int, default=1, help="同時にダウンロードする動画の数 (デフォルト: 1)")
+    parser.add_argument("--per-host", type=int, default=2, help="同じホストに対する同時ダウンロード数の上限 (デフォルト: 2)")
+    parser.add_argument(
+        "--backend", choices=BACKENDS, default="auto",
+        help="ダウンロード方式。autoはネイティブのHLSダウンローダーを使い、失敗時にyt-dlpで再試行します (デフォルト: auto)"
+    )
+    parser.add_argument("--segment-workers", type=int, default=8, help="1本の動画で同時に取得するセグメント数 (デフォルト: 8)")
+    parser.add_argument(
+        "--manifest", default="download_manifest.sqlite3",
+        help="ダウンロード済みファイルの記録(SQLite)のパス (デフォルト: download_manifest.sqlite3)"
+    )
+    parser.add_argument("--verify-checksum", action="store_true", help="既存ファイルのチェックサムも照合して破損を検出します (低速)")
+    parser.add_argument("--limit-rate", help="全体の転送速度の上限 (例: 10M, 500K)。未指定の場合は無制限")
+    parser.add_argument("--host-rate", help="同じホストに対する転送速度の上限 (例: 5M)。未指定の場合は無制限")
+    parser.add_argument(
+        "--window", action="append", default=[],
+        help="時間帯ごとの全体の転送速度 (例: 09:00-18:00=2M)。0を指定した時間帯は一時停止します。複数指定可"
+    )
+    parser.add_argument("--priority-lessons", help="優先してダウンロードするレッスン名 (カンマ区切り、先頭ほど優先)")
+    parser.add_argument(
+        "--priority-versions",
+        help="優先してダウンロードするバージョン (カンマ区切りの番号またはLyrics/Vocabulary/Karaoke、先頭ほど優先)"
+    )
+    parser.add_argument("--retries", type=int, default=2, help="失敗したダウンロードを再試行する回数 (デフォルト: 2)")
+    parser.add_argument(
+        "--retry-delay", type=float, default=5.0,
+        help="最初の再試行までの待機時間(秒)。以降は失敗するごとに倍増します (デフォルト: 5)"
+    )
+    parser.add_argument(
+        "--breaker-window", type=int, default=10,
+        help="直近この件数のうち8割以上が失敗した場合に、新しいダウンロードを一時停止します (デフォルト: 10)"
+    )
+    parser.add_argument(
+        "--breaker-cooldown", type=float,
+        help="一時停止する時間(秒) (デフォルト: --retry-delayの24倍)"
+    )
     args = parser.parse_args()
-    
-    main(args.yaml_file)
\ No newline at end of file
+
+    try:
+        limiter = BandwidthLimiter(
+            parse_rate(args.limit_rate), parse_rate(args.host_rate),
+            [RateWindow.parse(window) for window in args.window],
+            jobs=args.jobs, per_host=args.per_host,
+        )
+        priority = PriorityPolicy.from_args(args.priority_lessons, args.priority_versions)
+    except ValueError as e:
+        parser.error(str(e))
+
+    main(args.yaml_file, args.jobs, args.per_host, args.backend, args.segment_workers, args.manifest, args.verify_checksum,
+         limiter, priority, args.retries, args.retry_delay, args.breaker_window, args.breaker_cooldown)
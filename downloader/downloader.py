@@ -1,23 +1,108 @@
 import logging
 import subprocess
 import shutil
+from dataclasses import dataclass
+from typing import Optional
+
+from hls_downloader import HlsDownloader, HlsError, discard_partial
 
 logger = logging.getLogger(__name__)
 
+BACKENDS = ("auto", "native", "ytdlp")
+
+# 失敗の理由 (リトライの予算をこの単位で管理する)
+REASON_HLS = "hls"
+REASON_YTDLP = "ytdlp"
+REASON_YTDLP_MISSING = "ytdlp_missing"
+REASON_UNEXPECTED = "unexpected"
+
+@dataclass
+class DownloadResult:
+    """ ダウンロードの結果。真偽値として評価すると成功したかどうかを表す """
+    ok: bool
+    duration: Optional[float] = None
+    reason: Optional[str] = None
+
+    def __bool__(self) -> bool:
+        return self.ok
+
 def is_ytdlp_installed():
     """yt-dlpが利用可能か確認する"""
     return shutil.which("yt-dlp") is not None
 
-def download_video(download_url: str, full_output_path: str) -> bool:
+def probe_duration(path: str) -> Optional[float]:
+    """
+    ffprobeでファイルの再生時間(秒)を取得する
+    ffprobeがない場合、またはファイルを動画として読み込めない場合はNoneを返す
+    """
+    if shutil.which("ffprobe") is None:
+        return None
+    command = [
+        "ffprobe", "-v", "error", "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1", path,
+    ]
+    try:
+        output = subprocess.run(command, check=True, capture_output=True, text=True, encoding='utf-8').stdout
+        duration = float(output.strip())
+    except (subprocess.CalledProcessError, ValueError, OSError):
+        return None
+    return duration if duration > 0 else None
+
+def expected_duration(download_url: str) -> Optional[float]:
+    """ プレイリストから動画全体の再生時間(秒)を求める。取得できない場合はNone """
+    try:
+        return HlsDownloader().fetch_playlist(download_url).total_duration
+    except (HlsError, UnicodeDecodeError, ValueError) as e:
+        logger.debug(f"プレイリストから再生時間を取得できませんでした: {download_url}: {e}")
+        return None
+
+def download_video(download_url: str, full_output_path: str, backend: str = "ytdlp", segment_workers: int = 8,
+                   limiter=None) -> DownloadResult:
+    """
+    動画をダウンロードする
+    backend="auto"はネイティブのHLSダウンローダーを試し、失敗した場合はyt-dlpで再試行する
+    limiterにscheduler.BandwidthLimiterを渡すと、転送速度を制限する
+    """
+    if backend in ("auto", "native"):
+        result = download_video_native(download_url, full_output_path, segment_workers, limiter)
+        if result or backend == "native":
+            return result
+        logger.info("yt-dlpでダウンロードを再試行します。")
+        result = download_video_ytdlp(download_url, full_output_path, limiter)
+        if result:
+            discard_partial(full_output_path)
+        return result
+    return download_video_ytdlp(download_url, full_output_path, limiter)
+
+def download_video_native(download_url: str, full_output_path: str, segment_workers: int = 8,
+                          limiter=None) -> DownloadResult:
+    """
+    プレイリストを解析し、セグメントをプロセス内で並列に取得してダウンロードする
+    """
+    logger.info(f"ダウンロードを開始します (ネイティブ): {download_url}")
+    try:
+        playlist = HlsDownloader(segment_workers=segment_workers, limiter=limiter).download(download_url, full_output_path)
+        logger.info(f"ダウンロード成功: {full_output_path}")
+        return DownloadResult(True, playlist.total_duration)
+    except HlsError as e:
+        logger.warning(f"ネイティブのダウンロードに失敗しました: {e}")
+        reason = REASON_HLS
+    except Exception as e:
+        logger.error(f"ネイティブのダウンロード中に予期せぬエラーが発生しました: {e}", exc_info=True)
+        reason = REASON_UNEXPECTED
+    # 取得済みのセグメントは一時ファイル(.hls.part)に残し、次回の実行で続きから取得する
+    return DownloadResult(False, reason=reason)
+
+def download_video_ytdlp(download_url: str, full_output_path: str, limiter=None) -> DownloadResult:
     """
     yt-dlpを使用して動画をダウンロードする
     """
     if not is_ytdlp_installed():
         logger.critical("yt-dlpが見つかりません。実行ファイルをダウンロードし、PATHを通してください。")
-        return False
+        return DownloadResult(False, reason=REASON_YTDLP_MISSING)
 
     logger.info(f"ダウンロードを開始します: {download_url}")
-    
+
     command = [
         "yt-dlp",
         "--quiet",
@@ -26,15 +111,18 @@ def download_video(download_url: str, full_output_path: str) -> bool:
         "-o", full_output_path,
         download_url
     ]
+    rate = limiter.process_rate(download_url) if limiter else None
+    if rate:
+        command[1:1] = ["--limit-rate", str(int(rate))]
 
     try:
         subprocess.run(command, check=True, capture_output=True, text=True, encoding='utf-8')
         logger.info(f"ダウンロード成功: {full_output_path}")
-        return True
+        return DownloadResult(True)
     except subprocess.CalledProcessError as e:
         logger.error(f"ダウンロード失敗: {full_output_path}")
         logger.error(f"yt-dlpエラー: {e.stderr.strip()}")
-        return False
+        return DownloadResult(False, reason=REASON_YTDLP)
     except Exception as e:
         logger.error(f"予期せぬエラーが発生しました: {e}", exc_info=True)
-        return False
\ No newline at end of file
+        return DownloadResult(False, reason=REASON_UNEXPECTED)
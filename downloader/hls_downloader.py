@@ -0,0 +1,375 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+except ImportError:  # AES-128で暗号化されたプレイリストにのみ必要
+    Cipher = None
+
+from src.utils.retry_policy import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+ATTRIBUTE_PATTERN = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+# 取得の失敗の種類。再試行しても結果が変わらない4xxは再試行しない
+REASON_CLIENT_ERROR = "client_error"
+REASON_TRANSIENT = "transient"
+RETRYABLE_STATUS_CODES = (408, 429)
+
+# ffmpegがない旨の警告を1回の実行で1度だけ出力するためのフラグ
+_ffmpeg_missing_logged = threading.Event()
+
+class HlsError(Exception):
+    """ ネイティブのHLSダウンロードで処理できないことを表す (yt-dlpへのフォールバック対象) """
+
+@dataclass
+class HlsKey:
+    method: str
+    uri: Optional[str] = None
+    iv: Optional[bytes] = None
+
+@dataclass
+class HlsSegment:
+    uri: str
+    duration: float
+    sequence: int
+    key: Optional[HlsKey] = None
+
+@dataclass
+class MediaPlaylist:
+    segments: List[HlsSegment] = field(default_factory=list)
+    init_uri: Optional[str] = None
+
+    @property
+    def total_duration(self) -> float:
+        return sum(segment.duration for segment in self.segments)
+
+def _parse_attributes(text: str) -> Dict[str, str]:
+    return {key: value.strip('"') for key, value in ATTRIBUTE_PATTERN.findall(text)}
+
+def select_variant(text: str, base_url: str) -> Optional[str]:
+    """ マスタープレイリストであれば、最も帯域の大きいバリアントのURLを返す """
+    best_url, best_bandwidth = None, -1
+    lines = text.splitlines()
+    for i, line in enumerate(lines):
+        if not line.startswith("#EXT-X-STREAM-INF:"):
+            continue
+        bandwidth = int(_parse_attributes(line.split(":", 1)[1]).get("BANDWIDTH", 0))
+        uri = next((l.strip() for l in lines[i + 1:] if l.strip() and not l.startswith("#")), None)
+        if uri and bandwidth > best_bandwidth:
+            best_url, best_bandwidth = urljoin(base_url, uri), bandwidth
+    return best_url
+
+def parse_media_playlist(text: str, base_url: str) -> MediaPlaylist:
+    """ メディアプレイリストを解析し、セグメントの一覧を返す """
+    if not text.lstrip().startswith("#EXTM3U"):
+        raise HlsError("m3u8形式ではありません。")
+
+    playlist = MediaPlaylist()
+    sequence = 0
+    duration = 0.0
+    key: Optional[HlsKey] = None
+
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+        if line.startswith("#EXT-X-MEDIA-SEQUENCE:"):
+            sequence = int(line.split(":", 1)[1])
+        elif line.startswith("#EXTINF:"):
+            duration = float(line.split(":", 1)[1].split(",")[0])
+        elif line.startswith("#EXT-X-KEY:"):
+            attrs = _parse_attributes(line.split(":", 1)[1])
+            method = attrs.get("METHOD", "NONE")
+            if method == "NONE":
+                key = None
+            elif method == "AES-128":
+                iv = attrs.get("IV")
+                key = HlsKey(
+                    method=method,
+                    uri=urljoin(base_url, attrs["URI"]),
+                    iv=bytes.fromhex(iv[2:]) if iv else None,
+                )
+            else:
+                raise HlsError(f"未対応の暗号化方式です: {method}")
+        elif line.startswith("#EXT-X-MAP:"):
+            playlist.init_uri = urljoin(base_url, _parse_attributes(line.split(":", 1)[1])["URI"])
+        elif line.startswith("#EXT-X-BYTERANGE"):
+            raise HlsError("バイトレンジ指定のセグメントには対応していません。")
+        elif not line.startswith("#"):
+            playlist.segments.append(HlsSegment(urljoin(base_url, line), duration, sequence, key))
+            sequence += 1
+            duration = 0.0
+
+    if not playlist.segments:
+        raise HlsError("プレイリストにセグメントがありません。")
+    return playlist
+
+class HlsDownloader:
+    """
+    HLSのセグメントをプロセス内で並列に取得し、順番通りに1つのファイルへ書き出す
+    同時に保持するセグメントは先読み数(segment_workers * 2)までに抑え、動画全体をメモリに載せない
+    """
+    def __init__(self, segment_workers: int = 8, timeout: float = 30, retries: int = 2, retry_delay: float = 1.0,
+                 limiter=None):
+        self.segment_workers = max(1, segment_workers)
+        self.timeout = timeout
+        # 1件の取得に失敗した場合の再試行。失敗するごとに待機時間を倍増させ、CDNへの再試行の集中を避ける
+        self.retry_policy = RetryPolicy(
+            retries, {REASON_CLIENT_ERROR: 0}, base_delay=retry_delay, max_delay=retry_delay * 16
+        )
+        # scheduler.BandwidthLimiter。取得したセグメントのバイト数を転送速度の制限に計上する
+        self.limiter = limiter
+        self._keys: Dict[str, bytes] = {}
+        self._keys_lock = threading.Lock()
+        # requests.Sessionはスレッドセーフではないため、スレッドごとに保持する
+        self._local = threading.local()
+        self._sessions: List[requests.Session] = []
+        self._sessions_lock = threading.Lock()
+
+    def _session(self) -> requests.Session:
+        """ 現在のスレッド用のセッションを返す """
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._local.session = session
+            with self._sessions_lock:
+                self._sessions.append(session)
+        return session
+
+    def close(self):
+        """ すべてのスレッドのセッションを閉じる """
+        with self._sessions_lock:
+            for session in self._sessions:
+                session.close()
+            self._sessions.clear()
+        self._local = threading.local()
+
+    def _get(self, url: str) -> bytes:
+        failures = 0
+        while True:
+            try:
+                response = self._session().get(url, timeout=self.timeout)
+                response.raise_for_status()
+                return response.content
+            except requests.RequestException as e:
+                failures += 1
+                reason = _classify(e)
+                if not self.retry_policy.should_retry(reason, failures):
+                    raise HlsError(f"取得に失敗しました: {url} ({e})") from e
+                delay = self.retry_policy.delay(failures)
+                logger.debug(f"{delay:.1f}秒後に再試行します ({failures}/{self.retry_policy.budget(reason)}): {url} ({e})")
+                time.sleep(delay)
+
+    def load_playlist(self, url: str) -> MediaPlaylist:
+        """ プレイリストを取得する。マスタープレイリストの場合はバリアントを辿る """
+        text = self._get(url).decode("utf-8")
+        variant_url = select_variant(text, url)
+        if variant_url:
+            logger.debug(f"バリアントプレイリストを使用します: {variant_url}")
+            url = variant_url
+            text = self._get(url).decode("utf-8")
+        return parse_media_playlist(text, url)
+
+    def fetch_playlist(self, url: str) -> MediaPlaylist:
+        """ セグメントを取得せずに、プレイリストのみを取得する """
+        try:
+            return self.load_playlist(url)
+        finally:
+            self.close()
+
+    def _key_bytes(self, key: HlsKey) -> bytes:
+        with self._keys_lock:
+            if key.uri in self._keys:
+                return self._keys[key.uri]
+        value = self._get(key.uri)
+        with self._keys_lock:
+            self._keys[key.uri] = value
+        return value
+
+    def fetch_segment(self, segment: HlsSegment) -> bytes:
+        """ セグメントを取得し、暗号化されていれば復号して返す """
+        data = self._get(segment.uri)
+        if self.limiter:
+            self.limiter.throttle(segment.uri, len(data))
+        if segment.key is None:
+            return data
+        if Cipher is None:
+            raise HlsError("AES-128の復号にはcryptographyパッケージが必要です。")
+        iv = segment.key.iv or segment.sequence.to_bytes(16, "big")
+        decryptor = Cipher(algorithms.AES(self._key_bytes(segment.key)), modes.CBC(iv)).decryptor()
+        decrypted = decryptor.update(data) + decryptor.finalize()
+        padding = decrypted[-1] if decrypted else 0
+        return decrypted[:-padding] if 0 < padding <= 16 else decrypted
+
+    def download(self, url: str, full_output_path: str) -> MediaPlaylist:
+        """
+        プレイリストの全セグメントを取得してfull_output_pathへ保存する
+        中断された場合は書き込み済みのセグメントを一時ファイルに残し、次回はその続きから取得する
+        """
+        try:
+            playlist = self.load_playlist(url)
+            items = list(playlist.segments)
+            if playlist.init_uri:
+                items.insert(0, HlsSegment(playlist.init_uri, 0.0, 0))
+
+            partial = PartialDownload(f"{full_output_path}.hls.part", _fingerprint(items))
+            if partial.load():
+                logger.info(f"途中から再開します ({partial.completed}/{len(items)} セグメント取得済み)。")
+            else:
+                logger.info(f"{len(playlist.segments)} 個のセグメント ({playlist.total_duration:.0f}秒) を取得します。")
+
+            with partial.open() as output:
+                self._write_segments(
+                    items[partial.completed:], output,
+                    on_written=lambda: partial.commit(output, partial.completed + 1)
+                )
+
+            try:
+                _finalize(partial.part_path, full_output_path)
+            except HlsError:
+                # 取得したデータを変換できないため、次回は最初から取得し直す
+                discard_partial(full_output_path)
+                raise
+            partial.discard()
+            return playlist
+        finally:
+            self.close()
+
+    def _write_segments(self, segments: List[HlsSegment], output,
+                        on_written: Optional[Callable[[], None]] = None):
+        """ セグメントを並列に取得し、取得順に関係なくプレイリストの順番で書き込む """
+        window = self.segment_workers * 2
+        with ThreadPoolExecutor(max_workers=self.segment_workers, thread_name_prefix="segment") as executor:
+            in_flight: Deque[Future] = deque()
+            remaining = iter(segments)
+            for segment in remaining:
+                in_flight.append(executor.submit(self.fetch_segment, segment))
+                if len(in_flight) >= window:
+                    break
+            while in_flight:
+                output.write(in_flight.popleft().result())
+                if on_written:
+                    on_written()
+                next_segment = next(remaining, None)
+                if next_segment is not None:
+                    in_flight.append(executor.submit(self.fetch_segment, next_segment))
+
+def _classify(error: requests.RequestException) -> str:
+    """ 取得の失敗を、再試行すれば成功しうるかどうかで分類する """
+    response = getattr(error, "response", None)
+    if response is not None and 400 <= response.status_code < 500 and response.status_code not in RETRYABLE_STATUS_CODES:
+        return REASON_CLIENT_ERROR
+    return REASON_TRANSIENT
+
+def discard_partial(full_output_path: str):
+    """ 別の方式でダウンロードが完了した場合などに、ネイティブの一時ファイルを削除する """
+    for path in (f"{full_output_path}.hls.part", f"{full_output_path}.hls.part.json"):
+        if os.path.exists(path):
+            os.remove(path)
+
+def _fingerprint(items: List[HlsSegment]) -> str:
+    """
+    プレイリストの内容が前回と同じかを判定するための値
+    CDNの署名付きURLはプレイリストを取得するたびにクエリ文字列が変わるため、クエリを除いたURIと再生時間・シーケンス番号から求める
+    """
+    lines = (f"{urlsplit(item.uri)._replace(query='', fragment='').geturl()} {item.duration} {item.sequence}" for item in items)
+    return hashlib.sha1("\n".join(lines).encode("utf-8")).hexdigest()
+
+class PartialDownload:
+    """
+    書き込み途中の一時ファイル(.hls.part)と、書き込み済みのセグメント数・バイト数を記録するマニフェスト
+    セグメントは順番通りに書き込むため、再開時はマニフェストのバイト数まで切り詰めて続きから追記する
+    """
+    def __init__(self, part_path: str, fingerprint: str):
+        self.part_path = part_path
+        self.manifest_path = f"{part_path}.json"
+        self.fingerprint = fingerprint
+        self.completed = 0
+        self.offset = 0
+
+    def load(self) -> bool:
+        """ 同じプレイリストの途中までのダウンロードがあれば、その状態を読み込む """
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if manifest.get("fingerprint") != self.fingerprint:
+            logger.info("プレイリストが前回から変更されているため、最初から取得します。")
+            return False
+        if not os.path.exists(self.part_path) or os.path.getsize(self.part_path) < manifest["offset"]:
+            return False
+        self.completed, self.offset = manifest["completed"], manifest["offset"]
+        return True
+
+    def open(self):
+        """ 一時ファイルを開く。再開時は記録済みの位置まで切り詰め、それ以外は新規に作成する """
+        if self.completed == 0:
+            self.offset = 0
+            return open(self.part_path, "wb")
+        output = open(self.part_path, "r+b")
+        output.truncate(self.offset)
+        output.seek(self.offset)
+        return output
+
+    def commit(self, output, completed: int):
+        """ 書き込み済みのデータをフラッシュしてから、マニフェストを更新する """
+        output.flush()
+        self.completed, self.offset = completed, output.tell()
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": self.fingerprint, "completed": self.completed, "offset": self.offset}, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def discard(self):
+        """ 完了後にマニフェストを削除する """
+        if os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
+
+def _finalize(part_path: str, full_output_path: str):
+    """
+    取得したMPEG-TSをffmpegでMP4コンテナへ変換して保存する
+    ffmpegがない場合は、yt-dlpと同様にMPEG-TSのまま出力ファイル名で保存する
+    変換に失敗した場合は、取得したデータが壊れている可能性があるためHlsErrorを送出する (yt-dlpへのフォールバック対象)
+    """
+    if shutil.which("ffmpeg") is None:
+        if not _ffmpeg_missing_logged.is_set():
+            _ffmpeg_missing_logged.set()
+            logger.warning("ffmpegが見つからないため、MP4へ変換せずに中身はMPEG-TSのまま保存します。")
+        os.replace(part_path, full_output_path)
+        return
+
+    tmp_path = f"{full_output_path}.tmp"
+    command = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-i", part_path, "-c", "copy", "-bsf:a", "aac_adtstoasc",
+        "-f", "mp4", tmp_path,
+    ]
+    try:
+        subprocess.run(command, check=True, capture_output=True, text=True, encoding="utf-8")
+    except subprocess.CalledProcessError as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise HlsError(f"ffmpegによるMP4への変換に失敗しました: {e.stderr.strip()}") from e
+    os.replace(tmp_path, full_output_path)
+    os.remove(part_path)
@@ -0,0 +1,27 @@
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator
+from urllib.parse import urlsplit
+
+class HostLimiter:
+    """
+    ホストごとの同時ダウンロード数を制限する
+    CDNに対して過剰な同時接続を行わないために使用する
+    """
+    def __init__(self, per_host: int):
+        self.per_host = max(1, per_host)
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.per_host)
+            return self._semaphores[host]
+
+    @contextmanager
+    def slot(self, url: str) -> Iterator[None]:
+        """ URLのホストの空き枠を確保する (空きがなければ待機する) """
+        semaphore = self._semaphore(urlsplit(url).hostname or "")
+        with semaphore:
+            yield
@@ -1,7 +1,8 @@
 import logging
 import re
 import os
-from typing import Dict, Any
+from functools import lru_cache
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -18,16 +19,46 @@ SONG_NUMBER_DIR_MAP = {
     "4": "04",
 }
 
+VIDEO_ROOT_DIR = "VIDEO"
+
+INVALID_FILENAME_CHARS = re.compile(r'[\\/*?:"<>|]')
+NUMBER_PATTERN = re.compile(r'\d+')
+
+@lru_cache(maxsize=None)
 def _sanitize_filename(name: str) -> str:
     """ファイル名として使用できない文字を除去する"""
-    return re.sub(r'[\\/*?:"<>|]', '', name)
+    return INVALID_FILENAME_CHARS.sub('', name)
+
+@lru_cache(maxsize=None)
+def _parse_song_number(song_number: str) -> Optional[Tuple[str, str]]:
+    """
+    song_number("1-3a"など)から、番号ディレクトリ名とファイル名の接頭辞("01", "1-03_")を求める
+    形式が不正な場合はNoneを返す
+    """
+    prefix, _, suffix = song_number.partition('-')
+    numeric_suffix_match = NUMBER_PATTERN.search(suffix)
+    if not numeric_suffix_match:
+        return None
+    number_dir = SONG_NUMBER_DIR_MAP.get(prefix, prefix)
+    return number_dir, f"{prefix}-{int(numeric_suffix_match.group()):02d}_"
+
+def _iter_sources(item: Dict[str, Any]) -> Iterator[Tuple[Optional[int], str]]:
+    """
+    YAMLの1エントリから、(バージョン番号, ダウンロードURL)の組を順に返す
+    バージョンがないエントリは、バージョン番号Noneの1件として扱う
+    """
+    if 'versions' in item:
+        for version_info in item['versions']:
+            if version_info.get('status') == 'ERROR' or not version_info.get('url'):
+                continue
+            yield version_info.get('ver'), version_info['url']
+    elif item.get('url') and item.get('status') != 'ERROR':
+        yield None, item['url']
 
 def format_download_tasks(item: Dict[str, Any]) -> list:
     """
     YAMLの1エントリから、ダウンロードに必要なタスク情報のリストを生成する
     """
-    download_tasks = []
-    
     video_id = item.get('id')
     lesson = item.get('lesson')
     song_number = item.get('song_number')
@@ -37,64 +68,44 @@ def format_download_tasks(item: Dict[str, Any]) -> list:
         logger.warning(f"ID {video_id} のメタデータが不足しているためスキップします。")
         return []
 
-    # バージョンがある場合
-    if 'versions' in item:
-        for version_info in item['versions']:
-            if version_info.get('status') == 'ERROR':
-                continue
-            
-            ver = version_info.get('ver')
-            download_url = version_info.get('url')
-            if not download_url:
-                continue
-
-            lesson_dir = _sanitize_filename(lesson)
-            version_suffix = VERSION_SUFFIX_MAP.get(ver, "")
-            root_dir = f"{lesson_dir}{version_suffix}"
-            
-            song_num_prefix = song_number.split('-')[0]
-            number_dir = SONG_NUMBER_DIR_MAP.get(song_num_prefix, song_num_prefix)
-            
-            dir_path = os.path.join("VIDEO", root_dir, number_dir)
-
-            song_num_suffix = song_number.split('-')[1]
-            numeric_suffix_match = re.search(r'\d+', song_num_suffix)
-            if not numeric_suffix_match: continue
-            numeric_suffix = int(numeric_suffix_match.group())
-            
-            file_prefix = f"{song_num_prefix}-{numeric_suffix:02d}_"
-            sanitized_title = _sanitize_filename(title)
-            file_name = f"{file_prefix}{sanitized_title}.mp4"
-
-            download_tasks.append({
-                "dir_path": dir_path,
-                "file_name": file_name,
-                "download_url": download_url,
-            })
-    # バージョンがない場合
-    elif 'url' in item and item.get('status') != 'ERROR':
-        download_url = item.get('url')
-        if not download_url:
-            return []
-            
-        lesson_dir = _sanitize_filename(lesson)
-        song_num_prefix = song_number.split('-')[0]
-        number_dir = SONG_NUMBER_DIR_MAP.get(song_num_prefix, song_num_prefix)
-        dir_path = os.path.join("VIDEO", lesson_dir, number_dir)
-
-        song_num_suffix = song_number.split('-')[1]
-        numeric_suffix_match = re.search(r'\d+', song_num_suffix)
-        if not numeric_suffix_match: return []
-        numeric_suffix = int(numeric_suffix_match.group())
+    parsed = _parse_song_number(str(song_number))
+    if parsed is None:
+        logger.warning(f"ID {video_id} の曲番号の形式が不正なためスキップします: {song_number}")
+        return []
+    number_dir, file_prefix = parsed
 
-        file_prefix = f"{song_num_prefix}-{numeric_suffix:02d}_"
-        sanitized_title = _sanitize_filename(title)
-        file_name = f"{file_prefix}{sanitized_title}.mp4"
+    lesson_dir = _sanitize_filename(lesson)
+    file_name = f"{file_prefix}{_sanitize_filename(title)}.mp4"
 
-        download_tasks.append({
-            "dir_path": dir_path,
+    return [
+        {
+            "dir_path": os.path.join(VIDEO_ROOT_DIR, f"{lesson_dir}{VERSION_SUFFIX_MAP.get(ver, '')}", number_dir),
             "file_name": file_name,
             "download_url": download_url,
-        })
+            "lesson": lesson,
+            "ver": ver,
+        }
+        for ver, download_url in _iter_sources(item)
+    ]
+
+def iter_all_tasks(items: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    YAMLの全エントリからタスクを入力順に生成する
+    異なるエントリが同じ保存先になる場合は、先に現れたものを採用して後のものを警告付きで除外する
+    """
+    owners: Dict[str, Tuple[Any, str]] = {}
+    for item in items:
+        for task in format_download_tasks(item):
+            full_path = os.path.join(task["dir_path"], task["file_name"])
+            owner = owners.get(full_path)
+            if owner is None:
+                owners[full_path] = (item.get('id'), task["download_url"])
+                yield task
+            elif owner[1] != task["download_url"]:
+                logger.warning(
+                    f"ID {item.get('id')} の保存先がID {owner[0]} と重複するためスキップします: {full_path}"
+                )
 
-    return download_tasks
\ No newline at end of file
+def format_all_tasks(items: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """ YAMLの全エントリから、保存先の重複を除いたタスクのリストを1回の走査で生成する """
+    return list(iter_all_tasks(items))
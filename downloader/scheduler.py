@@ -0,0 +1,215 @@
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from urllib.parse import urlsplit
+
+from path_formatter import VERSION_SUFFIX_MAP
+
+logger = logging.getLogger(__name__)
+
+RATE_PATTERN = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([KMG]?)i?B?\s*$', re.IGNORECASE)
+RATE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+WINDOW_PATTERN = re.compile(r'^\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*=\s*(.+)$')
+
+# 一時停止中に時間帯の終了を確認する間隔(秒)
+PAUSE_CHECK_INTERVAL = 30
+
+def parse_rate(text: Optional[str]) -> Optional[float]:
+    """
+    "500K", "2M", "1.5MB"のような転送速度(バイト/秒)を解析する
+    未指定の場合はNone(無制限)を返す
+    """
+    if text is None or str(text).strip() == "":
+        return None
+    match = RATE_PATTERN.match(str(text))
+    if not match:
+        raise ValueError(f"転送速度の形式が不正です: {text}")
+    return float(match.group(1)) * RATE_UNITS[match.group(2).upper()]
+
+def format_rate(rate: Optional[float]) -> str:
+    """ ログ表示用に転送速度を整形する """
+    if rate is None:
+        return "無制限"
+    for unit in ("G", "M", "K"):
+        if rate >= RATE_UNITS[unit]:
+            return f"{rate / RATE_UNITS[unit]:.1f}{unit}B/s"
+    return f"{rate:.0f}B/s"
+
+class TokenBucket:
+    """
+    転送量をバイト単位で制限するトークンバケット
+    取得済みのデータ量を後から差し引き、不足分(借り越し)が解消されるまで呼び出し元を待機させる
+    """
+    def __init__(self, rate: Optional[float], burst_sec: float = 1.0):
+        self.rate = rate
+        self.burst_sec = burst_sec
+        self._tokens = rate * burst_sec if rate else 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate: Optional[float]):
+        """ 時間帯の切り替えなどで制限値を変更する """
+        with self._lock:
+            if rate != self.rate:
+                self._refill(time.monotonic())
+                self.rate = rate
+                if rate:
+                    self._tokens = min(self._tokens, rate * self.burst_sec)
+
+    def _refill(self, now: float):
+        if self.rate:
+            self._tokens = min(self._tokens + (now - self._updated) * self.rate, self.rate * self.burst_sec)
+        self._updated = now
+
+    def consume(self, amount: int):
+        """ amountバイト分のトークンを差し引き、制限を超えていれば超過分が回復するまで待機する """
+        with self._lock:
+            if not self.rate:
+                return
+            self._refill(time.monotonic())
+            self._tokens -= amount
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+@dataclass
+class RateWindow:
+    """ 1日のうちの時間帯と、その間に適用する全体の転送速度 (0は一時停止) """
+    start: int  # 0時からの経過分
+    end: int
+    rate: Optional[float]
+
+    @classmethod
+    def parse(cls, text: str) -> "RateWindow":
+        """ "09:00-18:00=2M" の形式を解析する。日付をまたぐ"22:00-06:00"も指定できる """
+        match = WINDOW_PATTERN.match(text)
+        if not match:
+            raise ValueError(f"時間帯の形式が不正です (例: 09:00-18:00=2M): {text}")
+        start_h, start_m, end_h, end_m, rate = match.groups()
+        return cls(
+            start=int(start_h) * 60 + int(start_m),
+            end=int(end_h) * 60 + int(end_m),
+            rate=0.0 if rate.strip() == "0" else parse_rate(rate),
+        )
+
+    def contains(self, minute: int) -> bool:
+        if self.start <= self.end:
+            return self.start <= minute < self.end
+        return minute >= self.start or minute < self.end
+
+    def minutes_until_end(self, minute: int) -> int:
+        return (self.end - minute) % (24 * 60) or 24 * 60
+
+class BandwidthLimiter:
+    """
+    全体とホストごとの転送速度を制限する
+    全体の制限値は時間帯によって切り替わり、0の時間帯はダウンロードを開始せずに待機する
+    """
+    def __init__(self, global_rate: Optional[float] = None, host_rate: Optional[float] = None,
+                 windows: Sequence[RateWindow] = (), jobs: int = 1, per_host: int = 1):
+        self.default_rate = global_rate
+        self.host_rate = host_rate
+        self.windows = list(windows)
+        self.jobs = max(1, jobs)
+        self.per_host = max(1, per_host)
+        self._global = TokenBucket(global_rate)
+        self._hosts: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def is_active(self) -> bool:
+        return bool(self.default_rate or self.host_rate or self.windows)
+
+    def current_rate(self, now: Optional[datetime] = None) -> Optional[float]:
+        """ 現在の時間帯に適用される全体の転送速度を返す """
+        window = self._current_window(now)
+        return window.rate if window else self.default_rate
+
+    def _current_window(self, now: Optional[datetime] = None) -> Optional[RateWindow]:
+        now = now or datetime.now()
+        minute = now.hour * 60 + now.minute
+        return next((window for window in self.windows if window.contains(minute)), None)
+
+    def _host_bucket(self, url: str) -> Optional[TokenBucket]:
+        if not self.host_rate:
+            return None
+        host = urlsplit(url).hostname or ""
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = TokenBucket(self.host_rate)
+            return self._hosts[host]
+
+    def wait_until_allowed(self):
+        """ 一時停止の時間帯であれば、その時間帯が終わるまで待機する """
+        while True:
+            now = datetime.now()
+            window = self._current_window(now)
+            if not window or window.rate != 0:
+                return
+            minutes = window.minutes_until_end(now.hour * 60 + now.minute)
+            logger.info(f"ダウンロードを一時停止する時間帯です。再開まで約{minutes}分待機します。")
+            time.sleep(min(PAUSE_CHECK_INTERVAL, minutes * 60))
+
+    def throttle(self, url: str, amount: int):
+        """ 取得したデータ量を全体とホストの制限に計上し、必要に応じて待機する """
+        self.wait_until_allowed()
+        self._global.set_rate(self.current_rate())
+        self._global.consume(amount)
+        host_bucket = self._host_bucket(url)
+        if host_bucket:
+            host_bucket.consume(amount)
+
+    def process_rate(self, url: str) -> Optional[float]:
+        """
+        外部プロセス(yt-dlp)に渡す1本あたりの転送速度
+        プロセス間でトークンを共有できないため、制限値を同時実行数で等分する
+        """
+        rates = []
+        global_rate = self.current_rate()
+        if global_rate:
+            rates.append(global_rate / self.jobs)
+        if self.host_rate:
+            rates.append(self.host_rate / self.per_host)
+        return min(rates) if rates else None
+
+@dataclass
+class PriorityPolicy:
+    """
+    ダウンロードの順番を決める優先度
+    レッスン名、バージョンの順に、指定された並び順で先頭に近いものを優先する (指定のないものは最後)
+    """
+    lessons: List[str] = field(default_factory=list)
+    versions: List[int] = field(default_factory=list)
+
+    @classmethod
+    def from_args(cls, lessons: Optional[str], versions: Optional[str]) -> "PriorityPolicy":
+        """ カンマ区切りのレッスン名と、バージョン番号または接尾辞("Karaoke"など)から生成する """
+        return cls(
+            lessons=[name.strip() for name in (lessons or "").split(",") if name.strip()],
+            versions=[_parse_version(name) for name in (versions or "").split(",") if name.strip()],
+        )
+
+    def is_active(self) -> bool:
+        return bool(self.lessons or self.versions)
+
+    def _rank(self, values: List[Any], value: Any) -> int:
+        return values.index(value) if value in values else len(values)
+
+    def key(self, task: Dict[str, Any]) -> tuple:
+        return self._rank(self.lessons, task.get("lesson")), self._rank(self.versions, task.get("ver"))
+
+    def order(self, tasks: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """ 優先度順に並べ替える。同じ優先度のタスクは入力の順番を保つ """
+        return sorted(tasks, key=self.key)
+
+def _parse_version(text: str) -> int:
+    name = text.strip()
+    if name.isdigit():
+        return int(name)
+    for ver, suffix in VERSION_SUFFIX_MAP.items():
+        if suffix.lstrip("_").lower() == name.lstrip("_").lower():
+            return ver
+    raise ValueError(f"不明なバージョンです: {text} (指定できる値: {', '.join(s.lstrip('_') for s in VERSION_SUFFIX_MAP.values())})")
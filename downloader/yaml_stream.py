@@ -0,0 +1,50 @@
+import logging
+from typing import Any, Iterator, List
+
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # libyamlなしでビルドされたPyYAMLの場合
+    from yaml import SafeLoader
+
+logger = logging.getLogger(__name__)
+
+def _is_item_start(line: str) -> bool:
+    """ トップレベルのシーケンス要素の開始行か ("---"などのドキュメント区切りは除く) """
+    return line.startswith("- ") or line.rstrip("\r\n") == "-"
+
+def _load_batch(lines: List[str]) -> List[Any]:
+    return yaml.load("".join(lines), Loader=SafeLoader) or []
+
+def iter_yaml_items(path: str, batch_size: int = 256) -> Iterator[Any]:
+    """
+    トップレベルがブロック形式のシーケンスであるYAMLファイルを、要素ごとに順に読み込む
+    ファイル全体を一度に読み込まず、batch_size要素ずつ解析するため、大きなファイルでもメモリ使用量が一定になる
+    ブロック形式のシーケンスでない場合は、ファイル全体を読み込んで要素を返す
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        header: List[str] = []
+        for line in f:
+            if _is_item_start(line):
+                break
+            header.append(line)
+        else:
+            # 要素の開始行が見つからない (フロー形式など) 場合は通常の読み込みに任せる
+            data = yaml.load("".join(header), Loader=SafeLoader)
+            if isinstance(data, list):
+                yield from data
+            elif data is not None:
+                raise ValueError("YAMLのトップレベルがシーケンスではありません。")
+            return
+
+        batch = [line]
+        item_count = 1
+        for line in f:
+            if _is_item_start(line):
+                if item_count >= batch_size:
+                    yield from _load_batch(batch)
+                    batch, item_count = [], 0
+                item_count += 1
+            batch.append(line)
+        yield from _load_batch(batch)
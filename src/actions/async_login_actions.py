@@ -0,0 +1,29 @@
+import logging
+from playwright.async_api import Page, expect
+from src.utils.config_loader import Config
+
+logger = logging.getLogger(__name__)
+
+async def perform_login(page: Page, config: Config):
+    logger.info(f"ログインページにアクセスします: {config.login_url}")
+    await page.goto(config.login_url, wait_until='domcontentloaded')
+
+    logger.info("ユーザー名とパスワードを入力します。")
+    user_input = page.locator('input[name="email"]')
+    await expect(user_input).to_be_visible(timeout=config.timeout_visible)
+    await user_input.fill(config.username)
+
+    pass_input = page.locator('input[name="password"]')
+    await expect(pass_input).to_be_visible(timeout=config.timeout_visible)
+    await pass_input.fill(config.password)
+
+    logger.info("ログインボタンをクリックし、ページ遷移を待ちます。")
+    login_button = page.locator('button[type="submit"]')
+    await expect(login_button).to_be_enabled(timeout=config.timeout_visible)
+
+    async with page.expect_navigation(wait_until="load", timeout=config.timeout_navigation):
+        await login_button.click()
+
+    if page.url == config.login_url:
+        raise Exception("ログインに失敗しました。URLが変わりませんでした。")
+    logger.info("ログイン成功を確認しました。")
@@ -0,0 +1,67 @@
+import logging
+from playwright.async_api import Page
+from src.utils.config_loader import Config
+from src.utils.metrics import stage
+from src.utils.countdown_timer import start_countdown_async
+from src.parsers.async_url_finder import AsyncUrlFinder
+
+logger = logging.getLogger(__name__)
+
+async def _wait(page: Page, finder: AsyncUrlFinder | None, timeout_ms: int) -> bool:
+    """
+    指定時間待機する。finderが指定されていれば、目的のURLを捕捉した時点で待機を打ち切る
+    戻り値はURLを捕捉済みかどうか
+    """
+    if finder is None:
+        await page.wait_for_timeout(timeout_ms)
+        return False
+    return await finder.wait_for_url(timeout=timeout_ms) is not None
+
+async def play_video(page: Page, config: Config, finder: AsyncUrlFinder | None = None):
+    """
+    キーボード操作で動画を再生する
+    finderを渡した場合は目的のURLを捕捉した時点で終了し、video_play_durationは待機の上限として扱う
+    """
+    if finder and finder.found_url:
+        logger.info("ページ読み込み時にURLを捕捉済みのため、再生操作をスキップします。")
+        return
+
+    logger.info("キーボード操作による動画の再生を開始します。")
+
+    try:
+        logger.debug("ページのフォーカスを待機します...")
+        with stage("play.focus_wait"):
+            if await _wait(page, finder, 2000):
+                logger.info("再生操作の前にURLを捕捉しました。")
+                return
+
+        with stage("play.keys"):
+            await page.locator('body').click(force=True)
+            logger.debug("ページにフォーカスを合わせました。")
+
+            for i in range(4):
+                await page.keyboard.press('Tab')
+                logger.debug(f"TABキーを押しました ({i+1}/4回)")
+                if await _wait(page, finder, 200):
+                    logger.info("再生操作の途中でURLを捕捉しました。")
+                    return
+
+            await page.keyboard.press('Space')
+            logger.info("スペースキーで動画の再生を実行しました。")
+
+        if finder:
+            play_timeout_ms = 2000 + config.video_play_duration * 1000
+            logger.debug(f"URLの捕捉を最大{play_timeout_ms/1000}秒間待機します...")
+            with stage("play.after_space"):
+                if await _wait(page, finder, play_timeout_ms):
+                    logger.info("URLを捕捉したため、動画の再生待機を終了します。")
+            return
+
+        logger.debug("再生開始を待機します...")
+        await page.wait_for_timeout(2000)
+    except Exception as e:
+        logger.error(f"キーボード操作による動画再生に失敗しました: {e}")
+        raise
+
+    await start_countdown_async(config.video_play_duration)
+    logger.info("動画の再生待機を終了します。")
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+from playwright.async_api import async_playwright, Browser, Playwright
+from src.utils.config_loader import Config
+from src.actions.async_login_actions import perform_login
+from src.core.async_context_pool import AsyncContextPool
+from src.core.browser_manager import launch_options
+from src.core.resource_policy import ResourcePolicy
+from src.core.session_store import is_login_redirect, load_storage_state, save_storage_state
+
+logger = logging.getLogger(__name__)
+
+class AsyncBrowserManager:
+    """
+    Playwright(async API)のブラウザのライフサイクルを管理するクラス
+    """
+    def __init__(self, config: Config):
+        self.config = config
+        self.playwright: Playwright | None = None
+        self.browser: Browser | None = None
+        self.storage_state: dict | None = None
+        self.resource_policy = ResourcePolicy.from_config(config)
+        self._session_lock = asyncio.Lock()
+        self.user_agent = (
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+            "AppleWebKit/537.36 (KHTML, like Gecko) "
+            "Chrome/114.0.0.0 Safari/537.36"
+        )
+
+    async def start(self):
+        """ Playwrightを起動し、保存済みの認証情報が使えなければログインして保存する """
+        logger.info("Playwright(async)を起動します。")
+        self.playwright = await async_playwright().start()
+        self.browser = await self.playwright.chromium.launch(**launch_options(self.config))
+        if not await self._restore_saved_state():
+            await self._login_and_save_state()
+
+    async def _restore_saved_state(self) -> bool:
+        """ ディスクに保存された認証情報を読み込み、有効であれば採用する """
+        state = load_storage_state(self.config.session_cache_path, self.config.session_max_age_sec)
+        if state is None:
+            return False
+        if not await self._probe_session(state):
+            logger.info("保存済みの認証情報は無効になっています。再ログインします。")
+            return False
+        self.storage_state = state
+        logger.info("保存済みの認証情報を再利用します。")
+        return True
+
+    async def _probe_session(self, state: dict) -> bool:
+        """ 認証が必要なページへアクセスし、ログインページへ転送されないことを確認する """
+        if not self.config.session_probe_url:
+            return True
+        context = await self.browser.new_context(storage_state=state, user_agent=self.user_agent)
+        try:
+            page = await context.new_page()
+            await page.goto(self.config.session_probe_url, wait_until='domcontentloaded', timeout=self.config.timeout_navigation)
+            return not self.is_session_rejected(page.url)
+        except Exception as e:
+            logger.warning(f"認証情報の有効性確認に失敗しました: {e}")
+            return False
+        finally:
+            await context.close()
+
+    def is_session_rejected(self, page_url: str) -> bool:
+        """ アクセスしたページがログインページへ転送されたかを判定する """
+        return is_login_redirect(page_url, self.config.login_url)
+
+    async def _login_and_save_state(self):
+        """ ログイン処理を実行し、セッション情報を保存する """
+        logger.info("--- ログイン処理と認証情報保存を開始 ---")
+        context = await self.browser.new_context(user_agent=self.user_agent)
+        page = await context.new_page()
+        try:
+            await perform_login(page, self.config)
+            self.storage_state = await context.storage_state()
+            logger.info("認証情報を取得しました。")
+        finally:
+            await context.close()
+        save_storage_state(self.config.session_cache_path, self.storage_state)
+
+    async def refresh_session(self, stale_state: dict | None) -> dict | None:
+        """
+        セッション切れを検知したタスクから呼ばれ、再ログインして新しい認証情報を返す
+        他のタスクが既に更新済みであれば、ログインせずにその認証情報を返す
+        """
+        async with self._session_lock:
+            if self.storage_state is not stale_state:
+                logger.info("認証情報は他のタスクにより更新済みです。")
+                return self.storage_state
+            logger.warning("セッション切れを検知しました。再ログインします。")
+            await self._login_and_save_state()
+            return self.storage_state
+
+    def create_context_pool(self, size: int = 1) -> AsyncContextPool:
+        """ 保存済みの認証情報を読み込んだコンテキストプールを生成する """
+        return AsyncContextPool(
+            self.browser, self.storage_state, self.user_agent, size,
+            resource_policy=self.resource_policy
+        )
+
+    async def stop(self):
+        """ ブラウザとPlaywrightを終了する """
+        if self.browser:
+            await self.browser.close()
+            logger.info("ブラウザを閉じました。")
+        if self.playwright:
+            await self.playwright.stop()
+            logger.info("Playwrightを停止しました。")
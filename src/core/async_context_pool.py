@@ -0,0 +1,96 @@
+import asyncio
+import logging
+from playwright.async_api import Browser, BrowserContext
+from src.core.resource_policy import ResourcePolicy
+
+logger = logging.getLogger(__name__)
+
+class AsyncContextPool:
+    """
+    認証情報(storage_state)を読み込んだBrowserContextを使い回すための非同期プール
+    上限まで作成済みで空きがない場合は、返却されるまで待機する
+    各コンテキストは作成時の認証情報を記録し、認証情報の更新後は古いものを使い回さずに破棄する
+    """
+    def __init__(self, browser: Browser, storage_state: dict | None, user_agent: str, size: int = 1,
+                 resource_policy: ResourcePolicy | None = None):
+        self.browser = browser
+        self.storage_state = storage_state
+        self.user_agent = user_agent
+        self.resource_policy = resource_policy
+        self.size = max(1, size)
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._created = 0
+        # コンテキストごとの、作成時に読み込んだ認証情報
+        self._states: dict[BrowserContext, dict | None] = {}
+
+    async def acquire(self) -> BrowserContext:
+        """ 空きコンテキストを返す。空きがなければ上限まで新規作成し、それ以上は返却を待つ """
+        while True:
+            if self._idle.empty() and self._created < self.size:
+                return await self._create_context()
+            context = await self._idle.get()
+            if self._states.get(context) is self.storage_state:
+                return context
+            # 返却待ちの間に認証情報が更新された
+            await self._close_context(context)
+
+    async def _create_context(self) -> BrowserContext:
+        self._created += 1
+        storage_state = self.storage_state
+        try:
+            context = await self.browser.new_context(
+                storage_state=storage_state,
+                user_agent=self.user_agent
+            )
+            if self.resource_policy:
+                await self.resource_policy.install_async(context)
+        except Exception:
+            self._created -= 1
+            raise
+        self._states[context] = storage_state
+        logger.debug(f"新しいコンテキストを作成しました ({self._created}/{self.size})。")
+        return context
+
+    def state_of(self, context: BrowserContext) -> dict | None:
+        """ コンテキストの作成時に読み込んだ認証情報を返す (セッション切れの際の再ログインの判定に使う) """
+        return self._states.get(context, self.storage_state)
+
+    async def release(self, context: BrowserContext, discard: bool = False):
+        """
+        コンテキストをプールへ返却する
+        失敗したタスクのコンテキストは状態が不明なため、discard=Trueで破棄する
+        貸し出し中に認証情報が更新されたコンテキストも、古いCookieを持つため破棄する
+        """
+        if discard or self._states.get(context) is not self.storage_state:
+            await self._close_context(context)
+            return
+        try:
+            for page in list(context.pages):
+                await page.close()
+            self._idle.put_nowait(context)
+        except Exception as e:
+            logger.warning(f"コンテキストの返却に失敗したため破棄します: {e}")
+            await self._close_context(context)
+
+    async def update_storage_state(self, storage_state: dict | None):
+        """
+        認証情報を差し替え、古い認証情報を持つ待機中のコンテキストを破棄する
+        貸し出し中のコンテキストは、返却時(release)に破棄する
+        """
+        if storage_state is self.storage_state:
+            return
+        self.storage_state = storage_state
+        await self.close()
+
+    async def close(self):
+        """ プール内のすべてのコンテキストを閉じる """
+        while not self._idle.empty():
+            await self._close_context(self._idle.get_nowait())
+
+    async def _close_context(self, context: BrowserContext):
+        self._created -= 1
+        self._states.pop(context, None)
+        try:
+            await context.close()
+        except Exception as e:
+            logger.debug(f"コンテキストのクローズ中にエラーが発生しました: {e}")
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+from urllib.parse import urljoin
+from playwright.async_api import APIRequestContext, Error as PlaywrightError
+from src.core.http_extractor import HttpExtractor
+from src.core.session_store import SessionExpiredError
+from src.core.steps import run_steps_async
+from src.utils.config_loader import Config, VideoMetadata
+
+logger = logging.getLogger(__name__)
+
+class AsyncHttpExtractor(HttpExtractor):
+    """
+    HttpExtractorの非同期版。PlaywrightのAPIRequestContextで取得するため、イベントループを止めない
+    HTMLの解析やプレイヤーのURLを辿る手順はHttpExtractorと共有し、取得処理のみを置き換える
+    """
+    def __init__(self, config: Config, browser_manager):
+        super().__init__(config, browser_manager)
+        self._request: APIRequestContext | None = None
+        self._request_state: dict | None = None
+        # 認証情報の更新前に作成したものも、取得中のタスクがあるため終了時まで閉じない
+        self._requests: list[APIRequestContext] = []
+        self._request_lock = asyncio.Lock()
+
+    async def _request_context(self) -> APIRequestContext:
+        """ 現在の認証情報を読み込んだAPIRequestContextを返す。認証情報が更新されていれば作り直す """
+        async with self._request_lock:
+            state = self.browser_manager.storage_state
+            if self._request is None or self._request_state is not state:
+                self._request = await self.browser_manager.playwright.request.new_context(
+                    storage_state=state, user_agent=self.browser_manager.user_agent
+                )
+                self._request_state = state
+                self._requests.append(self._request)
+            return self._request
+
+    async def fetch_text(self, url: str) -> str:
+        """ 認証付きでURLを取得する。ログインページへ転送された場合はSessionExpiredErrorを送出する """
+        response = await (await self._request_context()).get(url, timeout=self.config.timeout_navigation)
+        try:
+            if self.browser_manager.is_session_rejected(response.url):
+                raise SessionExpiredError("ログインページへ転送されました。")
+            if not response.ok:
+                raise PlaywrightError(f"HTTP {response.status}: {url}")
+            return await response.text()
+        finally:
+            await response.dispose()
+
+    async def probe(self, url: str) -> tuple[int, str | None]:
+        """ リダイレクトを辿らずに、URLのステータスコードと転送先(絶対URL)を返す (ページの存在確認用) """
+        response = await (await self._request_context()).get(
+            url, max_redirects=0, timeout=self.config.timeout_navigation
+        )
+        try:
+            location = response.headers.get("location")
+            return response.status, urljoin(url, location) if location else None
+        finally:
+            await response.dispose()
+
+    async def extract(self, video_url: str, need_metadata: bool) -> tuple[VideoMetadata | None, list[str]]:
+        return await run_steps_async(self.extract_steps(video_url, need_metadata))
+
+    async def close(self):
+        """ 作成したすべてのAPIRequestContextを閉じる """
+        for request in self._requests:
+            try:
+                await request.dispose()
+            except Exception as e:
+                logger.debug(f"APIRequestContextのクローズ中にエラーが発生しました: {e}")
+        self._requests.clear()
+        self._request = None
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+from src.core.async_browser_manager import AsyncBrowserManager
+from src.core.async_context_pool import AsyncContextPool
+from src.core.async_http_extractor import AsyncHttpExtractor
+from src.core.existence_probe import ExistenceProbe
+from src.core.shard import Shard
+from src.core.steps import run_steps_async
+from src.core.task_processor import TaskProcessor
+from src.utils.config_loader import Config, VideoMetadata
+from src.actions.async_video_actions import play_video
+from src.parsers.async_metadata_parser import extract_metadata
+from src.parsers.async_url_finder import AsyncUrlFinder
+from src.parsers.url_finder import M3U8_URL_PATTERN
+
+logger = logging.getLogger(__name__)
+
+class AsyncTaskProcessor(TaskProcessor):
+    """
+    1つのイベントループ上で複数ページを並行して操作するタスクプロセッサ
+    同時実行数はmax_workersのセマフォで制限する
+    処理手順や再試行の判定はTaskProcessorと共有し、ブラウザとHTTPの操作のみ非同期版に置き換える
+    """
+    def __init__(self, resume: bool = False, config: Config | None = None,
+                 shard: Shard | None = None, report_path: str | None = None):
+        super().__init__(resume, config, shard, report_path)
+        self.browser_manager = AsyncBrowserManager(self.config) if self.config else None
+
+    def run(self):
+        """ タスク処理を実行する """
+        if not self.browser_manager or not self.config:
+            logger.error("設定の読み込みまたはブラウザマネージャーの初期化に失敗しました。")
+            return
+
+        asyncio.run(self._run_async())
+
+    async def _run_async(self):
+        try:
+            self._open_checkpoint()
+            self._open_metadata_cache()
+            self.reporter.open()
+            await self.browser_manager.start()
+            self._start_http_extractor()
+            await self._process_rules_async()
+        finally:
+            self.browser_manager.resource_policy.log_summary()
+            self._save_final_report()
+            self._close_checkpoint()
+            self._close_metadata_cache()
+            await self._stop_http_extractor()
+            await self.browser_manager.stop()
+
+    def _start_http_extractor(self):
+        if self.config.extraction_mode == "http_first":
+            logger.info("HTTPによる直接抽出を優先し、失敗した場合のみブラウザで処理します。")
+            self.http_extractor = AsyncHttpExtractor(self.config, self.browser_manager)
+
+    async def _stop_http_extractor(self):
+        if self.http_extractor:
+            await self.http_extractor.close()
+
+    async def _probe_existence_async(self, groups: list[tuple[int, list[int | None]]]) -> list[tuple[int, list[int | None]]]:
+        """ _probe_existenceの非同期版 """
+        if not self.config.probe_enabled or not groups:
+            return groups
+
+        extractor = self.http_extractor or AsyncHttpExtractor(self.config, self.browser_manager)
+        try:
+            probe = ExistenceProbe(extractor, self.config.probe_workers)
+            missing = await probe.find_missing_async(
+                (video_id for video_id, _ in groups), lambda video_id: self._build_video_url(video_id, None)
+            )
+        finally:
+            if extractor is not self.http_extractor:
+                await extractor.close()
+        return self._exclude_missing(groups, missing)
+
+    async def _process_rules_async(self):
+        """ 設定されたルールに基づいて動画を並行処理する """
+        groups = await self._probe_existence_async(self._build_groups())
+        concurrency = self.config.max_workers
+        logger.info(f"{len(groups)} 件の動画を最大 {concurrency} 件ずつ並行処理します。")
+
+        semaphore = asyncio.Semaphore(concurrency)
+        pool = self.browser_manager.create_context_pool(concurrency)
+
+        async def run_video(video_id: int, versions: list[int | None], failures: int = 0):
+            async with semaphore:
+                remaining = self.circuit_breaker.remaining()
+                if remaining > 0:
+                    logger.info(f"処理の再開まで{remaining:.0f}秒待機します。")
+                    await asyncio.sleep(remaining)
+                failed = await run_steps_async(self._video_steps(pool, video_id, versions, failures))
+            retries = self._finish_video(video_id, failed, failures)
+            # 再試行の待機はセマフォの外で行い、その間は他の動画の処理に枠を譲る
+            await asyncio.gather(*(retry_later(video_id, version, failures + 1, delay) for version, delay in retries))
+
+        async def retry_later(video_id: int, version: int | None, failures: int, delay: float):
+            await asyncio.sleep(delay)
+            await run_video(video_id, [version], failures)
+
+        try:
+            await asyncio.gather(*(run_video(video_id, versions) for video_id, versions in groups))
+        finally:
+            await pool.close()
+
+    def _create_url_finder(self, page):
+        return AsyncUrlFinder(page, M3U8_URL_PATTERN)
+
+    async def _extract_metadata(self, page) -> VideoMetadata | None:
+        return await extract_metadata(page)
+
+    async def _play_video(self, page, finder):
+        await play_video(page, self.config, finder)
+
+    async def _refresh_session(self, pool: AsyncContextPool, stale_state: dict | None):
+        await pool.update_storage_state(await self.browser_manager.refresh_session(stale_state))
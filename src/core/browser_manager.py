@@ -1,10 +1,26 @@
 import logging
+import threading
+from contextlib import contextmanager
+from typing import Iterator
 from playwright.sync_api import sync_playwright, Browser, Playwright
 from src.utils.config_loader import Config
 from src.actions.login_actions import perform_login
+from src.core.context_pool import ContextPool
+from src.core.resource_policy import ResourcePolicy
+from src.core.session_store import is_login_redirect, load_storage_state, save_storage_state
 
 logger = logging.getLogger(__name__)
 
+def launch_options(config: Config) -> dict:
+    """
+    chromium.launchに渡す起動オプションを設定から生成する
+    channelを指定しない場合は、Playwright同梱のChromiumを使用する
+    """
+    options = {"headless": config.browser_headless, "args": list(config.browser_args)}
+    if config.browser_channel:
+        options["channel"] = config.browser_channel
+    return options
+
 class BrowserManager:
     """
     Playwrightブラウザのライフサイクルを管理するクラス
@@ -14,6 +30,8 @@ class BrowserManager:
         self.playwright: Playwright | None = None
         self.browser: Browser | None = None
         self.storage_state: dict | None = None
+        self.resource_policy = ResourcePolicy.from_config(config)
+        self._session_lock = threading.Lock()
         self.user_agent = (
             "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
             "AppleWebKit/537.36 (KHTML, like Gecko) "
@@ -21,16 +39,52 @@ class BrowserManager:
         )
 
     def start(self):
-        """ Playwrightを起動し、ログインして認証情報を保存する """
+        """ Playwrightを起動し、保存済みの認証情報が使えなければログインして保存する """
         logger.info("Playwrightを起動します。")
         self.playwright = sync_playwright().start()
-        self.browser = self.playwright.chromium.launch(channel="chrome", headless=False)
-        self._login_and_save_state()
+        self.browser = self._launch(self.playwright)
+        if not self._restore_saved_state():
+            self._login_and_save_state()
+
+    def _launch(self, playwright: Playwright) -> Browser:
+        """ 設定された起動プロファイルでブラウザを起動する """
+        return playwright.chromium.launch(**launch_options(self.config))
+
+    def _restore_saved_state(self) -> bool:
+        """ ディスクに保存された認証情報を読み込み、有効であれば採用する """
+        state = load_storage_state(self.config.session_cache_path, self.config.session_max_age_sec)
+        if state is None:
+            return False
+        if not self._probe_session(self.browser, state):
+            logger.info("保存済みの認証情報は無効になっています。再ログインします。")
+            return False
+        self.storage_state = state
+        logger.info("保存済みの認証情報を再利用します。")
+        return True
+
+    def _probe_session(self, browser: Browser, state: dict) -> bool:
+        """ 認証が必要なページへアクセスし、ログインページへ転送されないことを確認する """
+        if not self.config.session_probe_url:
+            return True
+        context = browser.new_context(storage_state=state, user_agent=self.user_agent)
+        try:
+            page = context.new_page()
+            page.goto(self.config.session_probe_url, wait_until='domcontentloaded', timeout=self.config.timeout_navigation)
+            return not self.is_session_rejected(page.url)
+        except Exception as e:
+            logger.warning(f"認証情報の有効性確認に失敗しました: {e}")
+            return False
+        finally:
+            context.close()
+
+    def is_session_rejected(self, page_url: str) -> bool:
+        """ アクセスしたページがログインページへ転送されたかを判定する """
+        return is_login_redirect(page_url, self.config.login_url)
 
-    def _login_and_save_state(self):
+    def _login_and_save_state(self, browser: Browser | None = None):
         """ ログイン処理を実行し、セッション情報を保存する """
         logger.info("--- ログイン処理と認証情報保存を開始 ---")
-        context = self.browser.new_context(user_agent=self.user_agent)
+        context = (browser or self.browser).new_context(user_agent=self.user_agent)
         page = context.new_page()
         try:
             perform_login(page, self.config)
@@ -38,6 +92,43 @@ class BrowserManager:
             logger.info("認証情報を取得しました。")
         finally:
             context.close()
+        save_storage_state(self.config.session_cache_path, self.storage_state)
+
+    def refresh_session(self, browser: Browser, stale_state: dict | None) -> dict | None:
+        """
+        セッション切れを検知したワーカーから呼ばれ、再ログインして新しい認証情報を返す
+        他のワーカーが既に更新済みであれば、ログインせずにその認証情報を返す
+        """
+        with self._session_lock:
+            if self.storage_state is not stale_state:
+                logger.info("認証情報は他のワーカーにより更新済みです。")
+                return self.storage_state
+            logger.warning("セッション切れを検知しました。再ログインします。")
+            self._login_and_save_state(browser)
+            return self.storage_state
+
+    def create_context_pool(self, browser: Browser | None = None, size: int = 1) -> ContextPool:
+        """ 保存済みの認証情報を読み込んだコンテキストプールを生成する """
+        return ContextPool(
+            browser or self.browser, self.storage_state, self.user_agent, size,
+            resource_policy=self.resource_policy
+        )
+
+    @contextmanager
+    def worker_browser(self) -> Iterator[Browser]:
+        """
+        ワーカースレッド専用のPlaywrightとブラウザを起動する
+        sync APIのオブジェクトは生成したスレッドでしか使えないため、スレッドごとに起動が必要
+        """
+        playwright = sync_playwright().start()
+        browser = None
+        try:
+            browser = self._launch(playwright)
+            yield browser
+        finally:
+            if browser:
+                browser.close()
+            playwright.stop()
 
     def stop(self):
         """ ブラウザとPlaywrightを終了する """
@@ -46,4 +137,4 @@ class BrowserManager:
             logger.info("ブラウザを閉じました。")
         if self.playwright:
             self.playwright.stop()
-            logger.info("Playwrightを停止しました。")
\ No newline at end of file
+            logger.info("Playwrightを停止しました。")
@@ -0,0 +1,82 @@
+import json
+import logging
+import os
+import threading
+from typing import Dict, Any
+from src.utils.config_loader import VideoMetadata
+
+logger = logging.getLogger(__name__)
+
+class CheckpointStore:
+    """
+    タスクの成功結果を1件ずつJSONL形式で追記するチェックポイント
+    処理が中断しても、再実行時に成功済みのタスクを読み込んでスキップできる
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def load(self) -> Dict[int, Dict[str, Any]]:
+        """ チェックポイントを読み込み、all_resultsと同じ形式で返す """
+        results: Dict[int, Dict[str, Any]] = {}
+        if not os.path.exists(self.path):
+            return results
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 書き込み途中で中断された最終行などは読み飛ばす
+                    logger.warning(f"チェックポイントの{line_no}行目を読み込めませんでした。")
+                    continue
+
+                entry = results.setdefault(record["id"], {"metadata": None, "versions": {}})
+                if record.get("type") == "metadata":
+                    entry["metadata"] = VideoMetadata(
+                        lesson=record["lesson"], song_number=record["song_number"], title=record["title"]
+                    )
+                elif record.get("type") == "url":
+                    entry["versions"][record.get("ver")] = record["url"]
+
+        logger.info(f"チェックポイントから {len(results)} 件の動画の結果を読み込みました: {self.path}")
+        return results
+
+    def open(self, resume: bool):
+        """ 書き込み用に開く。resumeでなければ既存の内容を破棄して新しく開始する """
+        output_dir = os.path.dirname(self.path)
+        if output_dir: os.makedirs(output_dir, exist_ok=True)
+        if not resume and os.path.exists(self.path):
+            logger.info(f"既存のチェックポイントを破棄して新しく開始します: {self.path}")
+        self._file = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+        if resume and self._file.tell() > 0 and not self._ends_with_newline():
+            # 中断された書き込みの続きに追記しないよう改行を補う
+            self._file.write("\n")
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def record_metadata(self, video_id: int, metadata: VideoMetadata):
+        self._append({
+            "type": "metadata", "id": video_id,
+            "lesson": metadata.lesson, "song_number": metadata.song_number, "title": metadata.title
+        })
+
+    def record_url(self, video_id: int, version: int | None, url: str):
+        self._append({"type": "url", "id": video_id, "ver": version, "url": url})
+
+    def _append(self, record: Dict[str, Any]):
+        if not self._file:
+            return
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
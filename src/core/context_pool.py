@@ -0,0 +1,84 @@
+import logging
+from playwright.sync_api import Browser, BrowserContext
+from src.core.resource_policy import ResourcePolicy
+
+logger = logging.getLogger(__name__)
+
+class ContextPool:
+    """
+    認証情報(storage_state)を読み込んだBrowserContextを使い回すためのプール
+    sync APIのオブジェクトはスレッド間で共有できないため、1つのプールは1スレッドからのみ利用する
+    各コンテキストは作成時の認証情報を記録し、認証情報の更新後は古いものを使い回さずに破棄する
+    """
+    def __init__(self, browser: Browser, storage_state: dict | None, user_agent: str, size: int = 1,
+                 resource_policy: ResourcePolicy | None = None):
+        self.browser = browser
+        self.storage_state = storage_state
+        self.user_agent = user_agent
+        self.resource_policy = resource_policy
+        self.size = max(1, size)
+        self._idle: list[BrowserContext] = []
+        self._created = 0
+        # コンテキストごとの、作成時に読み込んだ認証情報
+        self._states: dict[BrowserContext, dict | None] = {}
+
+    def acquire(self) -> BrowserContext:
+        """ 空きコンテキストを返す。空きがなければ上限まで新規作成する """
+        if self._idle:
+            return self._idle.pop()
+        if self._created >= self.size:
+            raise RuntimeError(f"コンテキストプールの上限({self.size})に達しています。")
+        context = self.browser.new_context(
+            storage_state=self.storage_state,
+            user_agent=self.user_agent
+        )
+        self._created += 1
+        self._states[context] = self.storage_state
+        if self.resource_policy:
+            self.resource_policy.install(context)
+        logger.debug(f"新しいコンテキストを作成しました ({self._created}/{self.size})。")
+        return context
+
+    def state_of(self, context: BrowserContext) -> dict | None:
+        """ コンテキストの作成時に読み込んだ認証情報を返す (セッション切れの際の再ログインの判定に使う) """
+        return self._states.get(context, self.storage_state)
+
+    def release(self, context: BrowserContext, discard: bool = False):
+        """
+        コンテキストをプールへ返却する
+        失敗したタスクのコンテキストは状態が不明なため、discard=Trueで破棄する
+        貸し出し中に認証情報が更新されたコンテキストも、古いCookieを持つため破棄する
+        """
+        if discard or self._states.get(context) is not self.storage_state:
+            self._close_context(context)
+            return
+        try:
+            for page in list(context.pages):
+                page.close()
+            self._idle.append(context)
+        except Exception as e:
+            logger.warning(f"コンテキストの返却に失敗したため破棄します: {e}")
+            self._close_context(context)
+
+    def update_storage_state(self, storage_state: dict | None):
+        """
+        認証情報を差し替え、古い認証情報を持つ待機中のコンテキストを破棄する
+        貸し出し中のコンテキストは、返却時(release)に破棄する
+        """
+        if storage_state is self.storage_state:
+            return
+        self.storage_state = storage_state
+        self.close()
+
+    def close(self):
+        """ プール内のすべてのコンテキストを閉じる """
+        while self._idle:
+            self._close_context(self._idle.pop())
+
+    def _close_context(self, context: BrowserContext):
+        self._created -= 1
+        self._states.pop(context, None)
+        try:
+            context.close()
+        except Exception as e:
+            logger.debug(f"コンテキストのクローズ中にエラーが発生しました: {e}")
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable
+import requests
+from playwright.async_api import Error as PlaywrightError
+from src.core.http_extractor import HttpExtractor
+
+logger = logging.getLogger(__name__)
+
+EXISTS = "exists"
+MISSING = "missing"
+LOGIN_REDIRECT = "login_redirect"
+UNKNOWN = "unknown"
+
+MISSING_STATUS_CODES = (404, 410)
+REDIRECT_STATUS_CODES = (301, 302, 303, 307, 308)
+
+class ExistenceProbe:
+    """
+    動画ページの存在を、ブラウザを使わずにHTTPで並行して確認する
+    404/410のみを「存在しない」とみなす
+    ログインページへの転送は、途中でのセッション切れや混雑時の転送と区別できないため判定せず、
+    判定できなかったページ(通信エラーや5xxなど)と同じく通常どおりブラウザで処理させる
+    http_extractorにAsyncHttpExtractorを渡した場合は find_missing_async を使う
+    """
+    def __init__(self, http_extractor: HttpExtractor, workers: int = 8):
+        self.http_extractor = http_extractor
+        self.workers = max(workers, 1)
+
+    def classify(self, status: int, location: str | None) -> str:
+        """ ステータスコードと転送先から、ページの存在を判定する """
+        if status in MISSING_STATUS_CODES:
+            return MISSING
+        if status in REDIRECT_STATUS_CODES and location:
+            if self.http_extractor.browser_manager.is_session_rejected(location):
+                return LOGIN_REDIRECT
+            return UNKNOWN
+        return EXISTS if 200 <= status < 300 else UNKNOWN
+
+    def check(self, url: str) -> str:
+        try:
+            return self.classify(*self.http_extractor.probe(url))
+        except requests.RequestException as e:
+            logger.debug(f"存在確認に失敗しました: {url}: {e}")
+            return UNKNOWN
+
+    async def check_async(self, url: str) -> str:
+        try:
+            return self.classify(*await self.http_extractor.probe(url))
+        except PlaywrightError as e:
+            logger.debug(f"存在確認に失敗しました: {url}: {e}")
+            return UNKNOWN
+
+    def find_missing(self, video_ids: Iterable[int], build_url: Callable[[int], str]) -> set[int]:
+        """ 存在しない動画のIDを返す (workers個のスレッドで確認する) """
+        video_ids = list(video_ids)
+        if not video_ids:
+            return set()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(video_ids)), thread_name_prefix="probe") as executor:
+            results = dict(zip(video_ids, executor.map(lambda video_id: self.check(build_url(video_id)), video_ids)))
+        return self._summarize(results, time.perf_counter() - start)
+
+    async def find_missing_async(self, video_ids: Iterable[int], build_url: Callable[[int], str]) -> set[int]:
+        """ find_missingの非同期版 (同時にworkers件まで確認する) """
+        video_ids = list(video_ids)
+        if not video_ids:
+            return set()
+
+        start = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.workers)
+
+        async def check(video_id: int) -> str:
+            async with semaphore:
+                return await self.check_async(build_url(video_id))
+
+        results = dict(zip(video_ids, await asyncio.gather(*(check(video_id) for video_id in video_ids))))
+        return self._summarize(results, time.perf_counter() - start)
+
+    def _summarize(self, results: dict[int, str], elapsed_sec: float) -> set[int]:
+        """ 確認結果の件数を出力し、存在しない動画のIDを返す """
+        counts = {kind: 0 for kind in (EXISTS, MISSING, LOGIN_REDIRECT, UNKNOWN)}
+        for result in results.values():
+            counts[result] += 1
+        missing = {video_id for video_id, result in results.items() if result == MISSING}
+
+        if counts[LOGIN_REDIRECT]:
+            logger.warning(
+                f"存在確認で {counts[LOGIN_REDIRECT]} 件の動画がログインページへ転送されました。"
+                "セッション切れの可能性があるため、これらの動画はブラウザで処理します。"
+            )
+        logger.info(
+            f"{len(results)} 件の動画の存在を確認しました ({elapsed_sec:.1f}秒): "
+            f"存在 {counts[EXISTS]} 件, 存在しない {len(missing)} 件, "
+            f"判定不能 {counts[UNKNOWN] + counts[LOGIN_REDIRECT]} 件"
+        )
+        return missing
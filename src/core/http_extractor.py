@@ -0,0 +1,102 @@
+import logging
+import re
+import threading
+import requests
+from functools import partial
+from urllib.parse import urljoin
+from requests.adapters import HTTPAdapter
+from src.utils.config_loader import Config, VideoMetadata
+from src.core.session_store import SessionExpiredError
+from src.core.steps import Steps, run_steps
+from src.parsers.html_parser import extract_metadata_from_html, find_urls_in_text, URL_TOKEN_PATTERN
+from src.parsers.url_finder import M3U8_URL_PATTERN
+
+logger = logging.getLogger(__name__)
+
+class HttpExtractor:
+    """
+    ブラウザを使わずにHTTPで動画ページを取得し、メタデータとm3u8のURLを抽出するクラス
+    認証にはBrowserManagerが保持するstorage_stateのCookieを使用する
+    """
+    def __init__(self, config: Config, browser_manager):
+        self.config = config
+        self.browser_manager = browser_manager
+        self.follow_patterns = [re.compile(p) for p in config.http_follow_url_patterns]
+        # requests.Sessionはスレッドセーフではないため、スレッドごとに保持する
+        self._local = threading.local()
+        self._sessions: list[requests.Session] = []
+        self._sessions_lock = threading.Lock()
+
+    def _session(self) -> requests.Session:
+        """ 現在のスレッド用のセッションを返す。認証情報が更新されていれば作り直す """
+        state = self.browser_manager.storage_state
+        session = getattr(self._local, "session", None)
+        if session is not None and self._local.state is state:
+            return session
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers["User-Agent"] = self.browser_manager.user_agent
+        for cookie in (state or {}).get("cookies", []):
+            session.cookies.set(
+                cookie["name"], cookie["value"],
+                domain=cookie.get("domain"), path=cookie.get("path", "/")
+            )
+        self._local.session, self._local.state = session, state
+        with self._sessions_lock:
+            self._sessions.append(session)
+        return session
+
+    def fetch(self, url: str) -> requests.Response:
+        """ 認証付きでURLを取得する。ログインページへ転送された場合はSessionExpiredErrorを送出する """
+        response = self._session().get(url, timeout=self.config.timeout_navigation / 1000)
+        if self.browser_manager.is_session_rejected(response.url):
+            raise SessionExpiredError("ログインページへ転送されました。")
+        response.raise_for_status()
+        return response
+
+    def fetch_text(self, url: str) -> str:
+        return self.fetch(url).text
+
+    def probe(self, url: str) -> tuple[int, str | None]:
+        """
+        リダイレクトを辿らず、本文も読まずに、URLのステータスコードと転送先を返す (ページの存在確認用)
+        転送先はログインページかどうかを判定できるよう絶対URLで返す
+        """
+        with self._session().get(
+            url, allow_redirects=False, stream=True, timeout=self.config.timeout_navigation / 1000
+        ) as response:
+            location = response.headers.get("Location")
+            return response.status_code, urljoin(url, location) if location else None
+
+    def extract_steps(self, video_url: str, need_metadata: bool) -> Steps[tuple[VideoMetadata | None, list[str]]]:
+        """
+        動画ページのHTMLからメタデータとm3u8のURLを抽出する手順 (取得はfetch_textをステップとして行う)
+        HTMLにURLが含まれない場合は、follow_url_patternsに一致するプレイヤーのURLを1階層だけ辿る
+        """
+        html = yield partial(self.fetch_text, video_url)
+        metadata = extract_metadata_from_html(html) if need_metadata else None
+        urls = find_urls_in_text(html, M3U8_URL_PATTERN)
+
+        if not urls and self.follow_patterns:
+            for player_url in URL_TOKEN_PATTERN.findall(html.replace("\\/", "/")):
+                if not any(p.search(player_url) for p in self.follow_patterns):
+                    continue
+                logger.debug(f"プレイヤーのURLを取得します: {player_url}")
+                urls = find_urls_in_text((yield partial(self.fetch_text, player_url)), M3U8_URL_PATTERN)
+                if urls:
+                    break
+
+        return metadata, urls
+
+    def extract(self, video_url: str, need_metadata: bool) -> tuple[VideoMetadata | None, list[str]]:
+        return run_steps(self.extract_steps(video_url, need_metadata))
+
+    def close(self):
+        """ すべてのスレッドのセッションを閉じる """
+        with self._sessions_lock:
+            for session in self._sessions:
+                session.close()
+            self._sessions.clear()
@@ -0,0 +1,67 @@
+import json
+import logging
+import os
+import threading
+from src.utils.config_loader import VideoMetadata
+
+logger = logging.getLogger(__name__)
+
+class MetadataCache:
+    """
+    video_idをキーとしたメタデータのキャッシュ
+    JSONL形式で追記し、実行をまたいで再利用する (同じIDが複数行ある場合は後の行を優先する)
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._entries: dict[int, VideoMetadata] = {}
+        self._lock = threading.Lock()
+        self._file = None
+
+    def open(self):
+        """ キャッシュを読み込み、追記用に開く """
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        self._entries[record["id"]] = VideoMetadata(
+                            lesson=record["lesson"], song_number=record["song_number"], title=record["title"]
+                        )
+                    except (json.JSONDecodeError, KeyError):
+                        continue
+            logger.info(f"メタデータキャッシュから {len(self._entries)} 件を読み込みました: {self.path}")
+
+        output_dir = os.path.dirname(self.path)
+        if output_dir: os.makedirs(output_dir, exist_ok=True)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        if self._file.tell() > 0 and not self._ends_with_newline():
+            # 中断された書き込みの続きに追記しないよう改行を補う
+            self._file.write("\n")
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def get(self, video_id: int) -> VideoMetadata | None:
+        with self._lock:
+            return self._entries.get(video_id)
+
+    def put(self, video_id: int, metadata: VideoMetadata):
+        with self._lock:
+            if self._entries.get(video_id) == metadata:
+                return
+            self._entries[video_id] = metadata
+            if self._file:
+                record = {
+                    "id": video_id, "lesson": metadata.lesson,
+                    "song_number": metadata.song_number, "title": metadata.title
+                }
+                self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,114 @@
+import logging
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List
+from urllib.parse import urlsplit
+from src.utils.config_loader import Config
+
+logger = logging.getLogger(__name__)
+
+# HLS/DASHのメディアセグメント (m3u8のプレイリスト自体は含まない)
+MEDIA_SEGMENT_PATTERN = re.compile(r"\.(ts|m4s)(\?|$)")
+
+def _host_matches(host: str, hosts: frozenset) -> bool:
+    """ hostがhostsのいずれか、またはそのサブドメインであるかを判定する """
+    labels = host.split('.')
+    return any('.'.join(labels[i:]) in hosts for i in range(len(labels)))
+
+@dataclass
+class ResourcePolicy:
+    """
+    context.routeで不要なリソースの通信を遮断するためのポリシー
+    allowed_url_patternsに一致するURLは、他の条件に関わらず常に通過させる
+    """
+    blocked_resource_types: frozenset = frozenset()
+    blocked_url_patterns: List[re.Pattern] = field(default_factory=list)
+    allowed_url_patterns: List[re.Pattern] = field(default_factory=list)
+    blocked_hosts: frozenset = frozenset()
+    block_media_segments: bool = False
+    blocked_counts: Counter = field(default_factory=Counter, init=False, repr=False)
+    _counts_lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    @classmethod
+    def from_config(cls, config: Config) -> "ResourcePolicy":
+        return cls(
+            blocked_resource_types=frozenset(config.block_resource_types),
+            blocked_url_patterns=[re.compile(p) for p in config.block_url_patterns],
+            allowed_url_patterns=[re.compile(p) for p in config.allow_url_patterns],
+            blocked_hosts=frozenset(h.lower() for h in config.block_tracker_hosts),
+            block_media_segments=config.block_media_segments,
+        )
+
+    @property
+    def is_active(self) -> bool:
+        return bool(
+            self.blocked_resource_types or self.blocked_url_patterns
+            or self.blocked_hosts or self.block_media_segments
+        )
+
+    def block_reason(self, url: str, resource_type: str) -> str | None:
+        """ 遮断すべきリクエストであればその理由(集計用の分類名)を、通過させる場合はNoneを返す """
+        if any(p.search(url) for p in self.allowed_url_patterns):
+            return None
+        if self.block_media_segments and MEDIA_SEGMENT_PATTERN.search(url):
+            return "segment"
+        if resource_type in self.blocked_resource_types:
+            return resource_type
+        if self.blocked_hosts:
+            host = (urlsplit(url).hostname or "").lower()
+            if host and _host_matches(host, self.blocked_hosts):
+                return "tracker"
+        if any(p.search(url) for p in self.blocked_url_patterns):
+            return "pattern"
+        return None
+
+    def should_block(self, url: str, resource_type: str) -> bool:
+        return self.block_reason(url, resource_type) is not None
+
+    def _count(self, reason: str):
+        with self._counts_lock:
+            self.blocked_counts[reason] += 1
+
+    def log_summary(self):
+        """ 遮断したリクエスト数を分類ごとにログへ出力する """
+        if not self.blocked_counts:
+            return
+        with self._counts_lock:
+            summary = ", ".join(f"{reason}: {count}" for reason, count in self.blocked_counts.most_common())
+        logger.info(f"遮断したリクエスト数 ({summary})")
+
+    def install(self, context):
+        """ sync APIのコンテキストにルーティングを設定する """
+        if not self.is_active:
+            return
+
+        def handle_route(route):
+            request = route.request
+            reason = self.block_reason(request.url, request.resource_type)
+            if reason:
+                self._count(reason)
+                logger.debug(f"リソースを遮断しました ({reason}): {request.url}")
+                route.abort()
+            else:
+                route.continue_()
+
+        context.route("**/*", handle_route)
+
+    async def install_async(self, context):
+        """ async APIのコンテキストにルーティングを設定する """
+        if not self.is_active:
+            return
+
+        async def handle_route(route):
+            request = route.request
+            reason = self.block_reason(request.url, request.resource_type)
+            if reason:
+                self._count(reason)
+                logger.debug(f"リソースを遮断しました ({reason}): {request.url}")
+                await route.abort()
+            else:
+                await route.continue_()
+
+        await context.route("**/*", handle_route)
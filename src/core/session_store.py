@@ -0,0 +1,59 @@
+import json
+import logging
+import os
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+class SessionExpiredError(Exception):
+    """ 保存済みのセッションがサイトに拒否された(ログインページへ戻された)ことを表す """
+
+def is_login_redirect(page_url: str, login_url: str) -> bool:
+    """ 認証が必要なページへのアクセスがログインページへ転送されたかを判定する """
+    return page_url.split('?')[0].rstrip('/') == login_url.split('?')[0].rstrip('/')
+
+def load_storage_state(path: str, max_age_sec: int) -> dict | None:
+    """
+    ディスクに保存された認証情報を読み込む
+    ファイルが存在しない、または保存から max_age_sec 秒以上経過している場合はNoneを返す
+    """
+    if not path or not os.path.exists(path):
+        return None
+
+    age_sec = time.time() - os.path.getmtime(path)
+    if max_age_sec > 0 and age_sec > max_age_sec:
+        logger.info(f"保存済みの認証情報は有効期限切れです ({age_sec / 3600:.1f}時間前に保存)。")
+        return None
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        logger.info(f"保存済みの認証情報を読み込みました: {path}")
+        return state
+    except Exception as e:
+        logger.warning(f"保存済みの認証情報の読み込みに失敗しました: {e}")
+        return None
+
+def save_storage_state(path: str, state: dict):
+    """ 認証情報をディスクへ保存する (書き込み途中のファイルを読まれないよう一時ファイル経由で置き換える) """
+    if not path:
+        return
+    try:
+        output_dir = os.path.dirname(path)
+        if output_dir: os.makedirs(output_dir, exist_ok=True)
+
+        # シャードのプロセスやワーカーが同時に保存しても互いの一時ファイルを壊さないよう、一意な名前で作成する
+        # (mkstempは所有者のみ読み書きできる権限で作成する)
+        fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix=".tmp", dir=output_dir or ".")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        logger.info(f"認証情報を保存しました: {path}")
+    except Exception as e:
+        logger.warning(f"認証情報の保存に失敗しました: {e}")
@@ -0,0 +1,43 @@
+import os
+import re
+from dataclasses import dataclass
+
+SHARD_PATTERN = re.compile(r"^\s*(\d+)\s*/\s*(\d+)\s*$")
+
+@dataclass(frozen=True)
+class Shard:
+    """
+    複数プロセスで処理を分担する場合の担当範囲 (indexは1始まり、countは全体の分割数)
+    動画は video_id % count で割り振るため、同じ動画の全バージョンは同じシャードが処理する
+    """
+    index: int
+    count: int
+
+    @classmethod
+    def parse(cls, text: str) -> "Shard":
+        """ "1/4" のような i/n 形式の文字列を解析する """
+        match = SHARD_PATTERN.match(text)
+        if not match:
+            raise ValueError(f"シャードは i/n 形式で指定してください: {text}")
+        index, count = int(match.group(1)), int(match.group(2))
+        if count < 1 or not 1 <= index <= count:
+            raise ValueError(f"シャードの番号は1から{count}の範囲で指定してください: {text}")
+        return cls(index, count)
+
+    @property
+    def name(self) -> str:
+        return f"shard{self.index}of{self.count}"
+
+    def owns(self, video_id: int) -> bool:
+        """ このシャードが担当する動画かを返す """
+        return video_id % self.count == self.index - 1
+
+    def path_for(self, path: str | None) -> str | None:
+        """ シャードごとに別のファイルを使うよう、拡張子の前にシャード名を付けたパスを返す """
+        if not path:
+            return path
+        base, ext = os.path.splitext(path)
+        return f"{base}.{self.name}{ext}"
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
@@ -0,0 +1,54 @@
+import logging
+import os
+import subprocess
+import sys
+from datetime import datetime
+from src.core.shard import Shard
+from src.core.task_plan import TaskPlan
+from src.reporters.report_merger import merge_reports
+from src.utils.config_loader import load_config
+
+logger = logging.getLogger(__name__)
+
+def launch_shards(script_path: str, count: int, engine: str = "sync", resume: bool = False,
+                  report_path: str | None = None) -> str | None:
+    """
+    処理をcount個のシャードに分割し、シャードごとに別プロセス(それぞれが専用のPlaywrightとブラウザを持つ)で実行する
+    すべてのプロセスが終了した後、シャードごとのレポートを1つのレポートに結合し、そのパスを返す
+    """
+    config = load_config()
+    if not config:
+        logger.error("設定の読み込みに失敗したため、シャードを起動できません。")
+        return None
+
+    if report_path is None:
+        report_path = os.path.join("urls", f"urls_{datetime.now().strftime('%Y-%m-%d-%H%M%S')}.yaml")
+    shards = [Shard(index, count) for index in range(1, count + 1)]
+
+    processes = []
+    for shard in shards:
+        command = [
+            sys.executable, script_path, "--shard", str(shard),
+            "--engine", engine, "--report", shard.path_for(report_path),
+        ]
+        if resume:
+            command.append("--resume")
+        processes.append((shard, subprocess.Popen(command)))
+        logger.info(f"シャード {shard} を起動しました (PID: {processes[-1][1].pid})。")
+
+    try:
+        for shard, process in processes:
+            returncode = process.wait()
+            if returncode != 0:
+                logger.error(f"シャード {shard} が異常終了しました (終了コード: {returncode})。")
+            else:
+                logger.info(f"シャード {shard} が終了しました。")
+    except KeyboardInterrupt:
+        # 子プロセスにも割り込みが届くため、それぞれが途中までのレポートを保存し終えるのを待つ
+        logger.warning("中断が要求されました。シャードの終了を待ってから、途中までの結果を結合します。")
+        for _, process in processes:
+            process.wait()
+
+    plan = TaskPlan.compile(config.video_processing_rules)
+    merge_reports([shard.path_for(report_path) for shard in shards], report_path, plan)
+    return report_path
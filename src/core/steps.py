@@ -0,0 +1,41 @@
+import inspect
+from typing import Any, Callable, Generator, TypeVar
+
+T = TypeVar("T")
+
+# 処理手順の1ステップ。引数なしで呼び出すとI/O(ブラウザやHTTPの操作)を行う
+Step = Callable[[], Any]
+# 処理手順。Stepをyieldし、その結果(失敗した場合は例外)を受け取って次に進む。最後に結果をreturnする
+Steps = Generator[Step, Any, T]
+
+def run_steps(steps: Steps[T]) -> T:
+    """
+    処理手順を同期的に実行する。各ステップを呼び出した結果を手順へ返し、例外は手順の中へ送出する
+    同期版と非同期版のエンジンで、処理の順序や判定を1つのジェネレーターで共有するために使う
+    """
+    value, error = None, None
+    while True:
+        try:
+            step = steps.throw(error) if error is not None else steps.send(value)
+        except StopIteration as stop:
+            return stop.value
+        try:
+            value, error = step(), None
+        except Exception as e:
+            value, error = None, e
+
+async def run_steps_async(steps: Steps[T]) -> T:
+    """ run_stepsの非同期版。ステップがawaitableを返した場合はawaitした結果を手順へ返す """
+    value, error = None, None
+    while True:
+        try:
+            step = steps.throw(error) if error is not None else steps.send(value)
+        except StopIteration as stop:
+            return stop.value
+        try:
+            value = step()
+            if inspect.isawaitable(value):
+                value = await value
+            error = None
+        except Exception as e:
+            value, error = None, e
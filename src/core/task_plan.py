@@ -0,0 +1,212 @@
+import glob
+import json
+import logging
+import os
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+from src.core.shard import Shard
+
+logger = logging.getLogger(__name__)
+
+# 過去の計測結果がない場合に見積もりに使う、1タスクあたりの再生時間以外の所要時間(秒)
+DEFAULT_TASK_OVERHEAD_SEC = 8.0
+
+class IdSet:
+    """ video_idの集合を、昇順に並んだ重ならない範囲(range)のタプルで表したもの """
+    def __init__(self, ranges: Iterable[range] = ()):
+        merged: List[range] = []
+        for r in sorted((r for r in ranges if len(r)), key=lambda r: r.start):
+            if merged and r.start <= merged[-1].stop:
+                merged[-1] = range(merged[-1].start, max(merged[-1].stop, r.stop))
+            else:
+                merged.append(r)
+        self.ranges: Tuple[range, ...] = tuple(merged)
+        self._starts = [r.start for r in self.ranges]
+
+    @classmethod
+    def parse(cls, spec: Any) -> "IdSet":
+        """
+        ID・範囲の指定を解析する
+        整数、{"start": a, "end": b} (bを含む)、またはそれらのリストを受け付ける
+        """
+        items = spec if isinstance(spec, list) else [spec]
+        ranges = []
+        for item in items:
+            if isinstance(item, bool):
+                raise ValueError(f"IDの指定が不正です: {item}")
+            if isinstance(item, int):
+                ranges.append(range(item, item + 1))
+            elif isinstance(item, dict) and isinstance(item.get('start'), int) and isinstance(item.get('end'), int):
+                ranges.append(range(item['start'], item['end'] + 1))
+            else:
+                raise ValueError(f"IDの指定が不正です: {item}")
+        return cls(ranges)
+
+    def __contains__(self, video_id: int) -> bool:
+        i = bisect_right(self._starts, video_id) - 1
+        return i >= 0 and video_id in self.ranges[i]
+
+    def __iter__(self) -> Iterator[int]:
+        for r in self.ranges:
+            yield from r
+
+    def __len__(self) -> int:
+        return sum(len(r) for r in self.ranges)
+
+    def __or__(self, other: "IdSet") -> "IdSet":
+        return IdSet(self.ranges + other.ranges)
+
+    def __sub__(self, other: "IdSet") -> "IdSet":
+        # どちらも昇順に並んでいるため、先頭から1回ずつ走査すればよい
+        result = []
+        others = other.ranges
+        j = 0
+        for r in self.ranges:
+            start = r.start
+            while j < len(others) and others[j].stop <= start:
+                j += 1
+            k = j
+            while k < len(others) and others[k].start < r.stop:
+                if others[k].start > start:
+                    result.append(range(start, others[k].start))
+                start = max(start, others[k].stop)
+                k += 1
+            if start < r.stop:
+                result.append(range(start, r.stop))
+        return IdSet(result)
+
+    def iter_shard(self, shard: Shard | None) -> Iterator[int]:
+        """ シャードが担当するIDのみを昇順で返す (範囲ごとに剰余から開始位置を求め、1件ずつ判定しない) """
+        if shard is None:
+            yield from self
+            return
+        for r in self.ranges:
+            first = r.start + (shard.index - 1 - r.start) % shard.count
+            yield from range(first, r.stop, shard.count)
+
+    def count_shard(self, shard: Shard | None) -> int:
+        if shard is None:
+            return len(self)
+        return sum(len(range(r.start + (shard.index - 1 - r.start) % shard.count, r.stop, shard.count))
+                   for r in self.ranges)
+
+@dataclass(frozen=True)
+class PlanRule:
+    """
+    コンパイル済みのルール
+    idsは、このルールより前のルールが対象とするIDと除外IDを取り除いた後の集合
+    """
+    index: int
+    description: str
+    ids: IdSet
+    versions: Tuple[int | None, ...]
+    priority: int = 0
+
+class TaskPlan:
+    """
+    video_processing_rules を、重複のない (video_id, バージョン) のタスクの並びにコンパイルしたもの
+    - 同じIDが複数のルールに含まれる場合は、最初のルールを採用する (レポートと同じ)
+    - 処理はpriorityの大きいルールから、同じ優先度なら記述順に行う。レポートは記述順に出力する
+    - IDは範囲のまま保持し、タスクは必要になった時点で1件ずつ生成する
+    """
+    def __init__(self, rules: List[PlanRule], shard: Shard | None = None):
+        self.rules = rules
+        self.shard = shard
+
+    @classmethod
+    def compile(cls, raw_rules: List[Dict[str, Any]], shard: Shard | None = None) -> "TaskPlan":
+        """
+        ルールを検証・正規化する。ルールには以下を指定できる
+        id_range ({"start", "end"})、ids (IDまたは範囲のリスト)、exclude (同じ形式)、versions、priority
+        """
+        rules: List[PlanRule] = []
+        claimed = IdSet()
+        for index, raw in enumerate(raw_rules):
+            description = raw.get('description') or f"ルール{index + 1}"
+            try:
+                ids = IdSet()
+                if 'id_range' in raw:
+                    ids = ids | IdSet.parse(raw['id_range'])
+                if 'ids' in raw:
+                    ids = ids | IdSet.parse(raw['ids'])
+                if 'exclude' in raw:
+                    ids = ids - IdSet.parse(raw['exclude'])
+            except ValueError as e:
+                logger.warning(f"{description} の指定が不正なため、無視します: {e}")
+                continue
+
+            versions = tuple(raw.get('versions', []))
+            if not ids.ranges or not versions:
+                logger.warning(f"{description} は対象のIDまたはバージョンがないため、無視します。")
+                continue
+
+            overlap = len(ids) - len(ids - claimed)
+            if overlap:
+                logger.warning(f"{description} の {overlap} 件のIDは前のルールと重複するため、前のルールで処理します。")
+            rules.append(PlanRule(index, description, ids - claimed, versions, int(raw.get('priority', 0))))
+            claimed = claimed | ids
+        return cls(rules, shard)
+
+    def rule_for(self, video_id: int) -> PlanRule | None:
+        if self.shard and not self.shard.owns(video_id):
+            return None
+        for rule in self.rules:
+            if video_id in rule.ids:
+                return rule
+        return None
+
+    def versions_for(self, video_id: int) -> List[int | None]:
+        """ IDに適用されるバージョン。計画に含まれないIDは空のリスト """
+        rule = self.rule_for(video_id)
+        return list(rule.versions) if rule else []
+
+    def iter_videos(self) -> Iterator[Tuple[int, List[int | None]]]:
+        """ 処理順 (priorityの降順、同じなら記述順、ルール内はIDの昇順) に (video_id, バージョン) を返す """
+        for rule in sorted(self.rules, key=lambda r: (-r.priority, r.index)):
+            versions = list(rule.versions)
+            for video_id in rule.ids.iter_shard(self.shard):
+                yield video_id, versions
+
+    def iter_report_order(self) -> Iterator[Tuple[int, List[int | None]]]:
+        """ レポートの出力順 (ルールの記述順、ルール内はIDの昇順) に (video_id, バージョン) を返す """
+        for rule in self.rules:
+            versions = list(rule.versions)
+            for video_id in rule.ids.iter_shard(self.shard):
+                yield video_id, versions
+
+    def describe(self) -> Iterator[str]:
+        """ ルールごとの対象件数を1行ずつ返す (--planでの表示用) """
+        for rule in self.rules:
+            video_count = rule.ids.count_shard(self.shard)
+            versions = ", ".join("なし" if v is None else str(v) for v in rule.versions)
+            yield (
+                f"{rule.description}: 動画 {video_count} 件 × バージョン [{versions}] = "
+                f"{video_count * len(rule.versions)} タスク (優先度: {rule.priority})"
+            )
+
+    @property
+    def video_count(self) -> int:
+        return sum(rule.ids.count_shard(self.shard) for rule in self.rules)
+
+    @property
+    def task_count(self) -> int:
+        return sum(rule.ids.count_shard(self.shard) * len(rule.versions) for rule in self.rules)
+
+def load_task_seconds(metrics_dir: str = "urls") -> float | None:
+    """ 最新の計測結果(urls_*.metrics.json)から、ブラウザでの1回の試行の平均所要時間を読み込む """
+    paths = sorted(glob.glob(os.path.join(metrics_dir, "urls_*.metrics.json")), key=os.path.getmtime, reverse=True)
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                summary = json.load(f)
+            browser = summary.get("total", {}).get("browser")
+            if browser and browser.get("count"):
+                return browser["mean"] * summary.get("attempts", {}).get("mean", 1.0)
+        except (OSError, ValueError, AttributeError):
+            continue
+    return None
+
+def estimate_runtime_sec(task_count: int, concurrency: int, task_seconds: float) -> float:
+    """ タスク数・同時実行数・1タスクあたりの所要時間から、全体の所要時間を見積もる """
+    return task_count * task_seconds / max(concurrency, 1)
@@ -1,24 +1,86 @@
 import logging
 import os
-import time
+import threading
+from dataclasses import replace
 from datetime import datetime
+from functools import partial
 from src.core.browser_manager import BrowserManager
-from src.utils.config_loader import load_config
+from src.core.checkpoint_store import CheckpointStore
+from src.core.metadata_cache import MetadataCache
+from playwright.sync_api import BrowserContext, Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
+from src.core.context_pool import ContextPool
+from src.core.existence_probe import ExistenceProbe
+from src.core.http_extractor import HttpExtractor
+from src.core.session_store import SessionExpiredError
+from src.core.shard import Shard
+from src.core.steps import Steps, run_steps
+from src.core.task_plan import TaskPlan
+from src.utils.config_loader import load_config, Config, VideoMetadata
+from src.utils.metrics import MetricsRecorder, stage
+from src.utils.retry_policy import CircuitBreaker, RetryPolicy, RetryQueue
 from src.actions.video_actions import play_video
-from src.parsers.metadata_parser import extract_metadata
-from src.parsers.url_finder import UrlFinder
-from src.reporters.yaml_reporter import save_results
+from src.parsers.metadata_parser import extract_metadata, MetadataNotFoundError
+from src.parsers.url_finder import UrlFinder, UrlNotFoundError, M3U8_URL_PATTERN
+from src.reporters.stream_reporter import StreamReporter
 
 logger = logging.getLogger(__name__)
 
+# エラーの種類の分類 (上から順に判定する。TimeoutErrorはPlaywrightErrorのサブクラス)
+FAILURE_CLASSES = (
+    (SessionExpiredError, "session"),
+    (PlaywrightTimeoutError, "timeout"),
+    (MetadataNotFoundError, "metadata"),
+    (UrlNotFoundError, "url_not_found"),
+    (PlaywrightError, "browser"),
+)
+
+def build_retry_policy(config: Config) -> RetryPolicy:
+    """ 設定からリトライ方針を生成する。種類ごとの予算がなければretry_countを使う """
+    return RetryPolicy(
+        config.retry_count, config.retry_budgets,
+        base_delay=config.retry_base_delay_sec, max_delay=config.retry_max_delay_sec,
+        classes=FAILURE_CLASSES,
+    )
+
+def build_circuit_breaker(config: Config) -> CircuitBreaker:
+    return CircuitBreaker(config.breaker_window, config.breaker_failure_ratio, config.breaker_cooldown_sec)
+
 class TaskProcessor:
     """
     設定に基づき、動画処理タスクの実行全体を管理するクラス
+    configを省略した場合は src/config/config.json から読み込む
+    shardを指定した場合は担当する動画のみ処理し、チェックポイントなどのファイルもシャードごとに分ける
     """
-    def __init__(self):
-        self.config = load_config()
+    def __init__(self, resume: bool = False, config: Config | None = None,
+                 shard: Shard | None = None, report_path: str | None = None):
+        self.config = config or load_config()
+        self.shard = shard
+        if self.config and shard:
+            self.config = replace(
+                self.config,
+                checkpoint_path=shard.path_for(self.config.checkpoint_path),
+                metadata_cache_path=shard.path_for(self.config.metadata_cache_path),
+            )
         self.browser_manager = BrowserManager(self.config) if self.config else None
+        self.resume = resume
+        self.checkpoint = CheckpointStore(self.config.checkpoint_path) if self.config and self.config.checkpoint_path else None
+        self.metadata_cache = MetadataCache(self.config.metadata_cache_path) if self.config and self.config.metadata_cache_path else None
+        # 処理が終わっていない動画の結果。処理が終わった動画はレポートへ出力し、ここから取り除く
         self.all_results = {}
+        # 動画ごとの、キューにある(または処理中・再試行待ちの)項目の数
+        self._outstanding: dict[int, int] = {}
+        self._results_lock = threading.Lock()
+        self.http_extractor: HttpExtractor | None = None
+        self.retry_policy = build_retry_policy(self.config) if self.config else None
+        self.circuit_breaker = build_circuit_breaker(self.config) if self.config else None
+        self.metrics = MetricsRecorder(self.retry_policy.classify if self.retry_policy else None)
+        self.plan = TaskPlan.compile(self.config.video_processing_rules, shard) if self.config else None
+        if report_path is None:
+            report_path = os.path.join("urls", f"urls_{datetime.now().strftime('%Y-%m-%d-%H%M%S')}.yaml")
+            if shard:
+                report_path = shard.path_for(report_path)
+        self.report_path = report_path
+        self.reporter = StreamReporter(self.report_path, self.plan) if self.config else None
 
     def run(self):
         """ タスク処理を実行する """
@@ -27,83 +89,358 @@ class TaskProcessor:
             return
 
         try:
+            self._open_checkpoint()
+            self._open_metadata_cache()
+            self.reporter.open()
             self.browser_manager.start()
+            self._start_http_extractor()
             self._process_rules()
         finally:
+            self.browser_manager.resource_policy.log_summary()
             self._save_final_report()
+            self._close_checkpoint()
+            self._close_metadata_cache()
+            self._stop_http_extractor()
             self.browser_manager.stop()
 
+    def _open_checkpoint(self):
+        """ チェックポイントを開く。再開モードでは成功済みの結果を読み込む """
+        if not self.checkpoint:
+            if self.resume:
+                logger.warning("checkpoint_pathが設定されていないため、最初から処理します。")
+            return
+        if self.resume:
+            self.all_results = self.checkpoint.load()
+        self.checkpoint.open(self.resume)
+
+    def _close_checkpoint(self):
+        if self.checkpoint:
+            self.checkpoint.close()
+
+    def _open_metadata_cache(self):
+        if self.metadata_cache:
+            self.metadata_cache.open()
+
+    def _close_metadata_cache(self):
+        if self.metadata_cache:
+            self.metadata_cache.close()
+
+    def _start_http_extractor(self):
+        if self.config.extraction_mode == "http_first":
+            logger.info("HTTPによる直接抽出を優先し、失敗した場合のみブラウザで処理します。")
+            self.http_extractor = HttpExtractor(self.config, self.browser_manager)
+
+    def _stop_http_extractor(self):
+        if self.http_extractor:
+            self.http_extractor.close()
+
+    def _build_groups(self) -> list[tuple[int, list[int | None]]]:
+        """
+        タスク計画を処理順に (video_id, 未取得のバージョン) の並びに展開する
+        同じIDのバージョンは1つのページで続けて処理するため、video_idごとにまとめる
+        URLを取得済みのタスク(チェックポイントから再開した場合)は除外し、
+        すべてのバージョンを取得済みの動画はそのままレポートへ出力してメモリに残さない
+        """
+        groups = []
+        results = {}
+        resolved_count = 0
+        for video_id, versions in self.plan.iter_videos():
+            result = self.all_results.get(video_id) or {"metadata": None, "versions": {}}
+            pending = [version for version in versions if version not in result["versions"]]
+            resolved_count += len(versions) - len(pending)
+            if pending:
+                results[video_id] = result
+                self._outstanding[video_id] = 1
+                groups.append((video_id, pending))
+            else:
+                self.reporter.video_finished(video_id, result)
+        self.all_results = results
+
+        if resolved_count:
+            logger.info(f"取得済みの {resolved_count} 件のタスクをスキップします。")
+        return groups
+
+    def _probe_existence(self, groups: list[tuple[int, list[int | None]]]) -> list[tuple[int, list[int | None]]]:
+        """
+        ブラウザで処理する前にHTTPで各動画ページの存在を確認し、存在しない動画を除外する
+        除外した動画はレポートにMISSINGとして出力する
+        存在確認だけの結果はチェックポイントに記録せず、--resumeで再実行した場合は改めて確認する
+        """
+        if not self.config.probe_enabled or not groups:
+            return groups
+
+        extractor = self.http_extractor or HttpExtractor(self.config, self.browser_manager)
+        try:
+            probe = ExistenceProbe(extractor, self.config.probe_workers)
+            missing = probe.find_missing(
+                (video_id for video_id, _ in groups), lambda video_id: self._build_video_url(video_id, None)
+            )
+        finally:
+            if extractor is not self.http_extractor:
+                extractor.close()
+        return self._exclude_missing(groups, missing)
+
+    def _exclude_missing(self, groups: list[tuple[int, list[int | None]]],
+                         missing: set[int]) -> list[tuple[int, list[int | None]]]:
+        """ 存在しない動画をMISSINGとしてレポートへ出力し、処理対象から除外する """
+        for video_id in missing:
+            with self._results_lock:
+                result = self.all_results.pop(video_id)
+                del self._outstanding[video_id]
+            self.reporter.video_finished(video_id, {**result, "missing": True})
+        return [(video_id, versions) for video_id, versions in groups if video_id not in missing]
+
     def _process_rules(self):
-        """ 設定されたルールに基づいて動画を処理する """
-        for rule in self.config.video_processing_rules:
-            id_range = rule.get('id_range', {})
-            start_id, end_id = id_range.get('start'), id_range.get('end')
-            versions = rule.get('versions', [])
-
-            if start_id is None or end_id is None: continue
-
-            for video_id in range(start_id, end_id + 1):
-                if video_id not in self.all_results:
-                    self.all_results[video_id] = {"metadata": None, "versions": {}}
-                for version in versions:
-                    self._process_single_task_with_retry(video_id, version)
-
-    def _process_single_task_with_retry(self, video_id: int, version: int | None):
-        """ 1つの動画処理タスクをリトライロジック付きで実行する """
-        for attempt in range(self.config.retry_count + 1):
-            context = None
+        """
+        設定されたルールに基づいて動画を処理する
+        キューの要素は (video_id, versions, これまでの失敗回数) で、失敗したタスクは待機後にキューの末尾へ再投入される
+        """
+        groups = self._probe_existence(self._build_groups())
+        work = RetryQueue((video_id, versions, 0) for video_id, versions in groups)
+        if self.config.max_workers <= 1:
+            pool = self.browser_manager.create_context_pool()
             try:
-                logger.info(f"--- Video ID: {video_id} (Ver: {version or 'N/A'}) の処理を開始 (試行: {attempt + 1}/{self.config.retry_count + 1}) ---")
-                
-                context = self.browser_manager.browser.new_context(
-                    storage_state=self.browser_manager.storage_state,
-                    user_agent=self.browser_manager.user_agent
-                )
-                page = context.new_page()
-
-                video_url = f"{self.config.video_url_base}{video_id}/"
-                if version is not None:
-                    video_url += f"?ver={version}"
-                
-                finder = UrlFinder(page, r"https://.*_9\.m3u8")
-
-                page.goto(video_url, wait_until='domcontentloaded')
-                
-                if self.all_results[video_id]["metadata"] is None:
-                    metadata = extract_metadata(page)
-                    if not metadata: raise ValueError("メタデータの抽出に失敗しました。")
-                    self.all_results[video_id]["metadata"] = metadata
-
-                play_video(page, self.config)
-                
-                url = finder.wait_for_url(timeout=15000)
-                
-                if not url:
-                    raise ValueError("指定されたパターンのURLが見つかりませんでした。")
+                self._drain_queue(pool, work)
+            finally:
+                pool.close()
+        else:
+            self._process_videos_in_parallel(work, len(groups))
+
+    def _process_videos_in_parallel(self, work: RetryQueue, group_count: int):
+        """ max_workers個のワーカースレッドで動画を並列に処理する """
+        worker_count = min(self.config.max_workers, group_count)
+        logger.info(f"{group_count} 件の動画を {worker_count} 個のワーカーで並列処理します。")
+
+        workers = [
+            threading.Thread(target=self._worker_loop, args=(work,), name=f"worker-{i + 1}")
+            for i in range(worker_count)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+    def _worker_loop(self, work: RetryQueue):
+        """ ワーカースレッド専用のブラウザで、キューが空になるまで動画を処理する """
+        try:
+            with self.browser_manager.worker_browser() as browser:
+                pool = self.browser_manager.create_context_pool(browser)
+                try:
+                    self._drain_queue(pool, work)
+                finally:
+                    pool.close()
+        except Exception as e:
+            logger.critical(f"ワーカー {threading.current_thread().name} が異常終了しました: {e}", exc_info=True)
+
+    def _drain_queue(self, pool: ContextPool, work: RetryQueue):
+        """ キューが空になり、再試行待ちのタスクもなくなるまで動画を取り出して処理する """
+        while (item := work.get()) is not None:
+            video_id, versions, failures = item
+            try:
+                self.circuit_breaker.wait()
+                failed = run_steps(self._video_steps(pool, video_id, versions, failures))
+                for version, delay in self._finish_video(video_id, failed, failures):
+                    # 待機中もワーカーは他のタスクを処理する
+                    work.defer((video_id, [version], failures + 1), delay)
+            finally:
+                work.task_done()
+
+    def _finish_video(self, video_id: int, failed: list[tuple[int | None, Exception]],
+                      failures: int) -> list[tuple[int | None, float]]:
+        """
+        処理が終わった動画の現時点の結果をレポートへ出力し、再試行するバージョンと待機時間(秒)を返す
+        再試行するバージョンが残っていない動画は、結果をメモリから取り除く
+        """
+        retries = [
+            (version, delay) for version, error in failed
+            if (delay := self._retry_delay(video_id, version, error, failures + 1)) is not None
+        ]
+        with self._results_lock:
+            self._outstanding[video_id] += len(retries) - 1
+            if self._outstanding[video_id] == 0:
+                del self._outstanding[video_id]
+                result = self.all_results.pop(video_id)
+            else:
+                result = self.all_results[video_id]
+            snapshot = {**result, "versions": dict(result["versions"])}
+        self.reporter.video_finished(video_id, snapshot)
+        return retries
 
-                self.all_results[video_id]["versions"][version] = url
-                logger.info(f"Video ID: {video_id} Ver:{version or 'N/A'} の処理に成功しました。")
+    def _retry_delay(self, video_id: int, version: int | None, error: Exception, failures: int) -> float | None:
+        """
+        エラーの種類ごとの予算が残っていれば、再試行までの待機時間(秒)を返す
+        予算を使い切った場合はNoneを返す
+        """
+        kind = self.retry_policy.classify(error)
+        budget = self.retry_policy.budget(kind)
+        if not self.retry_policy.should_retry(kind, failures):
+            logger.error(f"Video ID {video_id} Ver:{version or 'N/A'} のリトライ上限に達しました ({kind}: {failures - 1}/{budget})。")
+            return None
+        delay = self.retry_policy.delay(failures)
+        logger.info(f"Video ID {video_id} Ver:{version or 'N/A'} を{delay:.1f}秒後に再試行します ({kind}: {failures}/{budget})。")
+        return delay
+
+    def _build_video_url(self, video_id: int, version: int | None) -> str:
+        video_url = f"{self.config.video_url_base}{video_id}/"
+        if version is not None:
+            video_url += f"?ver={version}"
+        return video_url
+
+    def _needs_metadata(self, video_id: int) -> bool:
+        """ メタデータが未取得かを返す。キャッシュにあればそれを採用する """
+        with self._results_lock:
+            if self.all_results[video_id]["metadata"] is not None:
+                return False
+        cached = self.metadata_cache.get(video_id) if self.metadata_cache else None
+        if cached is None:
+            return True
+        logger.debug(f"Video ID {video_id} のメタデータをキャッシュから取得しました。")
+        self._store_metadata(video_id, cached)
+        return False
+
+    def _store_metadata(self, video_id: int, metadata: VideoMetadata):
+        with self._results_lock:
+            if self.all_results[video_id]["metadata"] is not None:
                 return
+            self.all_results[video_id]["metadata"] = metadata
+        if self.checkpoint:
+            self.checkpoint.record_metadata(video_id, metadata)
+        if self.metadata_cache:
+            self.metadata_cache.put(video_id, metadata)
+
+    def _store_url(self, video_id: int, version: int | None, url: str):
+        with self._results_lock:
+            self.all_results[video_id]["versions"][version] = url
+        if self.checkpoint:
+            self.checkpoint.record_url(video_id, version, url)
 
+    def _http_steps(self, video_id: int, version: int | None, failures: int = 0) -> Steps[bool]:
+        """
+        ブラウザを使わずにHTTPでメタデータとURLの抽出を試みる
+        必要な情報がすべて得られた場合のみ結果を保存してTrueを返す
+        """
+        with self.metrics.track(video_id, version, failures + 1, path="http") as timing:
+            try:
+                need_metadata = self._needs_metadata(video_id)
+                metadata, urls = yield partial(
+                    self.http_extractor.extract, self._build_video_url(video_id, version), need_metadata
+                )
+                if not urls or (need_metadata and not metadata):
+                    logger.info(f"Video ID {video_id} Ver:{version or 'N/A'} はHTTPで抽出できなかったため、ブラウザで処理します。")
+                    timing.outcome = "fallback"
+                    return False
+                if metadata:
+                    self._store_metadata(video_id, metadata)
+                self._store_url(video_id, version, urls[0])
+                logger.info(f"Video ID: {video_id} Ver:{version or 'N/A'} をHTTPで抽出しました。")
+                return True
             except Exception as e:
-                logger.error(f"Video ID {video_id} Ver:{version or 'N/A'} の処理中にエラー (試行 {attempt + 1}): {e}")
-                if attempt < self.config.retry_count:
-                    logger.info("リトライします...")
-                    time.sleep(3)
-                else:
-                    logger.error(f"Video ID {video_id} Ver:{version or 'N/A'} のリトライ上限に達しました。")
-            finally:
-                if context:
-                    context.close()
-                    logger.info(f"Video ID {video_id} Ver:{version or 'N/A'} のコンテキストを閉じました。")
+                logger.info(f"Video ID {video_id} Ver:{version or 'N/A'} のHTTP抽出に失敗したため、ブラウザで処理します: {e}")
+                timing.outcome = "fallback"
+                return False
+
+    def _video_steps(self, pool, video_id: int, versions: list[int | None],
+                     failures: int = 0) -> Steps[list[tuple[int | None, Exception]]]:
+        """
+        1つの動画の全バージョンを処理し、失敗したバージョンとそのエラーを返す
+        同じコンテキスト・ページを使い回し、メタデータは最初に取得できた1回だけ抽出する
+        """
+        context = None
+        failed = []
+        for i, version in enumerate(versions):
+            if self.http_extractor and (yield from self._http_steps(video_id, version, failures)):
+                continue
+            is_last = i == len(versions) - 1
+            try:
+                context = yield from self._task_steps(pool, context, video_id, version, is_last, failures)
+            except Exception as e:
+                context = None
+                failed.append((version, e))
+        if context:
+            yield partial(pool.release, context)
+            logger.info(f"Video ID {video_id} のコンテキストを返却しました。")
+        return failed
+
+    def _task_steps(self, pool, context: BrowserContext | None, video_id: int, version: int | None,
+                    is_last: bool, failures: int = 0) -> Steps[BrowserContext]:
+        """
+        1つの動画処理タスクを1回実行し、引き続き使えるコンテキストを返す
+        失敗した場合はコンテキストを破棄して例外を送出する (再試行は呼び出し元がキューで管理する)
+        メタデータの抽出失敗は、その動画の最後のバージョン以外では致命的なエラーとして扱わない
+        """
+        try:
+            with self.metrics.track(video_id, version, failures + 1) as timing:
+                logger.info(f"--- Video ID: {video_id} (Ver: {version or 'N/A'}) の処理を開始 (試行: {failures + 1}) ---")
+
+                if context is None:
+                    with stage("acquire_context"):
+                        context = yield pool.acquire
+                page = context.pages[0] if context.pages else (yield context.new_page)
+
+                video_url = self._build_video_url(video_id, version)
+
+                finder = self._create_url_finder(page)
+
+                with stage("goto"):
+                    yield partial(page.goto, video_url, wait_until='domcontentloaded')
+                if self.browser_manager.is_session_rejected(page.url):
+                    raise SessionExpiredError("ログインページへ転送されました。")
+
+                if self._needs_metadata(video_id):
+                    with stage("extract_metadata"):
+                        metadata = yield partial(self._extract_metadata, page)
+                    if metadata:
+                        self._store_metadata(video_id, metadata)
+                    elif is_last:
+                        raise MetadataNotFoundError("メタデータの抽出に失敗しました。")
+                    else:
+                        logger.warning(f"Video ID {video_id} のメタデータを抽出できませんでした。次のバージョンで再試行します。")
+
+                with stage("play_video"):
+                    yield partial(self._play_video, page, finder)
+
+                with stage("wait_for_url"):
+                    url = yield partial(finder.wait_for_url, timeout=15000)
+                finder.stop()
+                timing.mark_at("url_found", finder.found_at)
+                if len(finder.found_urls) > 1:
+                    logger.debug(f"一致したURL候補: {finder.found_urls}")
+
+                if not url:
+                    raise UrlNotFoundError("指定されたパターンのURLが見つかりませんでした。")
+
+                self._store_url(video_id, version, url)
+            self.circuit_breaker.record(True)
+            logger.info(f"Video ID: {video_id} Ver:{version or 'N/A'} の処理に成功しました。")
+            return context
+
+        except Exception as e:
+            logger.error(f"Video ID {video_id} Ver:{version or 'N/A'} の処理中にエラー (試行 {failures + 1}): {e}")
+            self.circuit_breaker.record(False)
+            # 再ログインの要否は、プールの現在の認証情報ではなく拒否されたコンテキストの認証情報で判定する
+            stale_state = pool.state_of(context) if context else pool.storage_state
+            if context:
+                yield partial(pool.release, context, discard=True)
+            if isinstance(e, SessionExpiredError):
+                yield partial(self._refresh_session, pool, stale_state)
+            raise
+
+    # ブラウザの操作。AsyncTaskProcessorは非同期版に置き換え、処理手順は共有する
+    def _create_url_finder(self, page):
+        return UrlFinder(page, M3U8_URL_PATTERN)
+
+    def _extract_metadata(self, page) -> VideoMetadata | None:
+        return extract_metadata(page)
+
+    def _play_video(self, page, finder):
+        play_video(page, self.config, finder)
+
+    def _refresh_session(self, pool: ContextPool, stale_state: dict | None):
+        pool.update_storage_state(self.browser_manager.refresh_session(pool.browser, stale_state))
 
     def _save_final_report(self):
         """ 最終的な結果をファイルに保存する """
         if not self.config: return
-        
-        output_dir = "urls"
-        timestamp = datetime.now().strftime("%Y-%m-%d-%H%M%S")
-        output_filename = f"urls_{timestamp}.yaml"
-        output_path = os.path.join(output_dir, output_filename)
-        
-        save_results(self.all_results, output_path, self.config.video_processing_rules)
\ No newline at end of file
+
+        self.reporter.finalize(self.all_results)
+        self.metrics.save(self.report_path)
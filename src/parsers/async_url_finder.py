@@ -0,0 +1,73 @@
+import asyncio
+import logging
+import re
+import time
+from playwright.async_api import Page, Request, Response
+
+logger = logging.getLogger(__name__)
+
+class AsyncUrlFinder:
+    """
+    Pageのネットワークイベントを監視し、特定のパターンのURLをawaitで待機して取得する
+    event="response"を指定すると、正常に応答したレスポンスのURLのみを対象とする
+    """
+    def __init__(self, page: Page, pattern: str, event: str = "request"):
+        if event not in ("request", "response"):
+            raise ValueError(f"未対応のイベントです: {event}")
+        self.page = page
+        self.pattern = re.compile(pattern)
+        self.event = event
+        self.found_urls: list[str] = []
+        # 最初のURLを捕捉した時刻 (time.perf_counter())。処理時間の計測に使用する
+        self.found_at: float | None = None
+        self._listening = True
+        self._future: asyncio.Future = asyncio.get_running_loop().create_future()
+        # イベントリスナーを登録
+        self.page.on(self.event, self._handle_event)
+
+    @property
+    def found_url(self) -> str | None:
+        """ 最初に捕捉したURL """
+        return self.found_urls[0] if self.found_urls else None
+
+    def _matches(self, target: Request | Response) -> bool:
+        if not self.pattern.match(target.url):
+            return False
+        if isinstance(target, Response):
+            return target.ok
+        return True
+
+    def _handle_event(self, target: Request | Response):
+        if not self._matches(target) or target.url in self.found_urls:
+            return
+        logger.debug(f"目的のパターンのURLを捕捉しました: {target.url}")
+        if not self.found_urls:
+            self.found_at = time.perf_counter()
+        self.found_urls.append(target.url)
+        if not self._future.done():
+            self._future.set_result(target.url)
+
+    async def wait_for_url(self, timeout: int) -> str | None:
+        """
+        指定されたタイムアウト時間まで、URLが見つかるのを待機する
+        一致するイベントが発生した時点で即座に返る
+        """
+        if self.found_url:
+            return self.found_url
+
+        logger.debug(f"URLの出現を最大{timeout/1000}秒間待機します...")
+        try:
+            return await asyncio.wait_for(asyncio.shield(self._future), timeout / 1000)
+        except asyncio.TimeoutError:
+            logger.debug("URLの待機がタイムアウトしました。")
+            return self.found_url
+
+    def stop(self):
+        """ イベントリスナーを解除する """
+        if not self._listening:
+            return
+        self._listening = False
+        try:
+            self.page.remove_listener(self.event, self._handle_event)
+        except Exception:
+            pass
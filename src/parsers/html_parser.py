@@ -0,0 +1,75 @@
+import logging
+import re
+from html.parser import HTMLParser
+from src.utils.config_loader import VideoMetadata
+
+logger = logging.getLogger(__name__)
+
+# メタデータのフィールド名と、それを含む要素の (タグ名, クラス名)
+METADATA_ELEMENTS = {
+    "lesson": ("p", "pageHeader02_lesson"),
+    "song_number": ("p", "pageHeader02_songNumber"),
+    "title": ("h1", "pageHeader02_title"),
+}
+
+URL_TOKEN_PATTERN = re.compile(r"https?://[^\s\"'<>\\]+")
+
+class _MetadataHTMLParser(HTMLParser):
+    """ METADATA_ELEMENTSに一致する要素のテキストを収集する """
+    def __init__(self):
+        super().__init__()
+        self.texts: dict[str, list[str]] = {}
+        self._current: str | None = None
+        self._current_tag: str | None = None
+        self._depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if self._current:
+            if tag == self._current_tag:
+                self._depth += 1
+            return
+        classes = (dict(attrs).get("class") or "").split()
+        for name, (target_tag, target_class) in METADATA_ELEMENTS.items():
+            if tag == target_tag and target_class in classes and name not in self.texts:
+                self._current, self._current_tag, self._depth = name, tag, 1
+                self.texts[name] = []
+                return
+
+    def handle_endtag(self, tag):
+        if self._current and tag == self._current_tag:
+            self._depth -= 1
+            if self._depth == 0:
+                self._current = None
+
+    def handle_data(self, data):
+        if self._current:
+            self.texts[self._current].append(data)
+
+def extract_metadata_from_html(html: str) -> VideoMetadata | None:
+    """ 動画ページのHTMLからメタデータを抽出する (extract_metadataのブラウザ非使用版) """
+    parser = _MetadataHTMLParser()
+    parser.feed(html)
+    parser.close()
+
+    values = {
+        name: " ".join("".join(parts).split())
+        for name, parts in parser.texts.items()
+    }
+    if not all(values.get(name) for name in METADATA_ELEMENTS):
+        logger.debug("HTML内に一部のメタデータ要素が見つかりませんでした。")
+        return None
+    return VideoMetadata(**values)
+
+def find_urls_in_text(text: str, pattern: str) -> list[str]:
+    """
+    HTMLやJSONの本文から、パターンに一致するURLを出現順に重複なく抽出する
+    JSON内でエスケープされたスラッシュ(\\/)にも対応する
+    """
+    normalized = text.replace("\\/", "/")
+    matcher = re.compile(pattern)
+    found = []
+    for match in URL_TOKEN_PATTERN.finditer(normalized):
+        url = match.group(0).rstrip("),;")
+        if matcher.match(url) and url not in found:
+            found.append(url)
+    return found
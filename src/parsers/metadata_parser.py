@@ -4,6 +4,9 @@ from src.utils.config_loader import VideoMetadata
 
 logger = logging.getLogger(__name__)
 
+class MetadataNotFoundError(Exception):
+    """ ページからメタデータを抽出できなかったことを表す """
+
 def extract_metadata(page: Page) -> VideoMetadata | None:
     try:
         logger.debug("メタデータの抽出を開始します。")
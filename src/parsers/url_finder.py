@@ -1,43 +1,79 @@
 import logging
 import re
 import time
-from playwright.sync_api import Page, Request
+from playwright.sync_api import Page, Request, Response, TimeoutError as PlaywrightTimeoutError
 
 logger = logging.getLogger(__name__)
 
+# 抽出対象のm3u8プレイリストのURL
+M3U8_URL_PATTERN = r"https://.*_9\.m3u8"
+
+class UrlNotFoundError(Exception):
+    """ 待機時間内に指定されたパターンのURLが見つからなかったことを表す """
+
 class UrlFinder:
     """
-    Pageのネットワークリクエストを監視し、特定のパターンのURLを待機して取得する
+    Pageのネットワークイベントを監視し、特定のパターンのURLを待機して取得する
+    event="response"を指定すると、正常に応答したレスポンスのURLのみを対象とする
     """
-    def __init__(self, page: Page, pattern: str):
+    def __init__(self, page: Page, pattern: str, event: str = "request"):
+        if event not in ("request", "response"):
+            raise ValueError(f"未対応のイベントです: {event}")
         self.page = page
         self.pattern = re.compile(pattern)
-        self.found_url: str | None = None
+        self.event = event
+        self.found_urls: list[str] = []
+        # 最初のURLを捕捉した時刻 (time.perf_counter())。処理時間の計測に使用する
+        self.found_at: float | None = None
+        self._listening = True
         # イベントリスナーを登録
-        self.page.on("request", self._handle_request)
+        self.page.on(self.event, self._handle_event)
 
-    def _handle_request(self, request: Request):
-        if self.found_url:
-            return
-        if self.pattern.match(request.url):
-            logger.debug(f"目的のパターンのURLを捕捉しました: {request.url}")
-            self.found_url = request.url
-            self.page.remove_listener("request", self._handle_request)
+    @property
+    def found_url(self) -> str | None:
+        """ 最初に捕捉したURL """
+        return self.found_urls[0] if self.found_urls else None
+
+    def _matches(self, target: Request | Response) -> bool:
+        if not self.pattern.match(target.url):
+            return False
+        if isinstance(target, Response):
+            return target.ok
+        return True
+
+    def _record(self, url: str):
+        if url not in self.found_urls:
+            logger.debug(f"目的のパターンのURLを捕捉しました: {url}")
+            if not self.found_urls:
+                self.found_at = time.perf_counter()
+            self.found_urls.append(url)
+
+    def _handle_event(self, target: Request | Response):
+        if self._matches(target):
+            self._record(target.url)
 
     def wait_for_url(self, timeout: int) -> str | None:
         """
         指定されたタイムアウト時間まで、URLが見つかるのを待機する
+        一致するイベントが発生した時点で即座に返る
         """
-        start_time = time.time()
+        if self.found_url:
+            return self.found_url
+
         logger.debug(f"URLの出現を最大{timeout/1000}秒間待機します...")
-        while time.time() - start_time < (timeout / 1000):
-            if self.found_url:
-                return self.found_url
-            time.sleep(0.1)
-        
         try:
-            self.page.remove_listener("request", self._handle_request)
+            target = self.page.wait_for_event(self.event, predicate=self._matches, timeout=timeout)
+            self._record(target.url)
+        except PlaywrightTimeoutError:
+            logger.debug("URLの待機がタイムアウトしました。")
+        return self.found_url
+
+    def stop(self):
+        """ イベントリスナーを解除する """
+        if not self._listening:
+            return
+        self._listening = False
+        try:
+            self.page.remove_listener(self.event, self._handle_event)
         except Exception:
             pass
-            
-        return self.found_url
\ No newline at end of file
@@ -0,0 +1,207 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import yaml
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Any, Iterable, Iterator, Tuple
+from src.utils.config_loader import VideoMetadata
+from src.reporters.yaml_reporter import build_entry
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # libyamlなしでインストールされたPyYAML
+    from yaml import SafeLoader
+
+logger = logging.getLogger(__name__)
+
+REPORT_TIMESTAMP_PATTERN = re.compile(r"urls_(\d{4}-\d{2}-\d{2}-\d{6})")
+
+# (id, バージョン, URL(ERRORの場合はNone), メタデータ(ERRORの場合はNone), 存在しない動画か)
+Record = Tuple[int, int | None, str | None, VideoMetadata | None, bool]
+
+ADDED = "added"
+CHANGED = "changed"
+METADATA = "metadata"
+
+@dataclass(frozen=True)
+class Change:
+    """ 2つのインデックス間の差分1件 (URLの追加・変更、またはメタデータの変更) """
+    kind: str
+    video_id: int
+    version: int | None
+    old: str | None
+    new: str | None
+
+def iter_records(entries: Iterable[Dict[str, Any]]) -> Iterator[Record]:
+    """ レポートのエントリを (id, バージョン) 単位のレコードに展開する """
+    for entry in entries:
+        video_id = entry.get('id')
+        if video_id is None:
+            continue
+        if entry.get('status') == 'MISSING':
+            yield video_id, None, None, None, True
+            continue
+        metadata = None
+        if 'lesson' in entry:
+            metadata = VideoMetadata(
+                lesson=entry['lesson'], song_number=entry.get('song_number'), title=entry.get('title')
+            )
+        if 'versions' in entry:
+            for version in entry['versions'] or []:
+                yield video_id, version.get('ver'), version.get('url'), metadata, False
+        else:
+            yield video_id, None, entry.get('url'), metadata, False
+
+def read_report(path: str, cache_dir: str | None = None) -> List[Record]:
+    """
+    レポートを読み込んでレコードのリストを返す (別プロセスで読み込めるよう、モジュールの関数としている)
+    cache_dirを指定した場合、解析した内容をJSONで保存しておき、レポートが更新されていなければ次回はそちらを読む
+    (YAMLの解析に比べて数十倍速い)
+    """
+    stat = os.stat(path)
+    signature = [stat.st_mtime_ns, stat.st_size]
+    cache_path = None
+    if cache_dir:
+        key = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+        cache_path = os.path.join(cache_dir, f"{key}.json")
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached.get("signature") == signature:
+                return list(iter_records(cached["entries"]))
+        except (OSError, ValueError, KeyError):
+            pass
+
+    with open(path, 'r', encoding='utf-8') as f:
+        entries = yaml.load(f, Loader=SafeLoader) or []
+
+    if cache_path:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = f"{cache_path}.tmp.{os.getpid()}"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"path": path, "signature": signature, "entries": entries}, f, ensure_ascii=False)
+            os.replace(tmp_path, cache_path)
+        except (OSError, TypeError) as e:
+            logger.debug(f"レポートのキャッシュを保存できませんでした: {path}: {e}")
+    return list(iter_records(entries))
+
+def report_sort_key(path: str) -> Tuple[str, float]:
+    """ ファイル名の日時(urls_YYYY-MM-DD-HHMMSS)、なければ更新日時の順に並べるためのキー """
+    match = REPORT_TIMESTAMP_PATTERN.search(os.path.basename(path))
+    return (match.group(1) if match else "", os.path.getmtime(path))
+
+class ReportIndex:
+    """
+    複数のレポートの結果を (id, バージョン) をキーとして索引化したもの
+    後から追加したレポートのURLで上書きするが、ERROR(URLなし)やMISSINGで既存のURLを消すことはない
+    """
+    def __init__(self):
+        self.urls: Dict[Tuple[int, int | None], str] = {}
+        self.metadata: Dict[int, VideoMetadata] = {}
+        # レポートに現れたバージョン (ERRORを含む)。出力時にERRORのバージョンも残すために使う
+        self.versions: Dict[int, Dict[int | None, None]] = {}
+        # MISSINGとして報告された動画。メタデータやURLが得られている動画には適用しない
+        self.missing: set[int] = set()
+
+    def add(self, records: Iterable[Record]):
+        for video_id, version, url, metadata, missing in records:
+            if missing:
+                self.missing.add(video_id)
+                self.versions.setdefault(video_id, {})
+                continue
+            self.versions.setdefault(video_id, {})[version] = None
+            if metadata is not None:
+                self.metadata[video_id] = metadata
+            if url:
+                self.urls[(video_id, version)] = url
+
+    def copy(self) -> "ReportIndex":
+        copied = ReportIndex()
+        copied.urls = dict(self.urls)
+        copied.metadata = dict(self.metadata)
+        copied.versions = {video_id: dict(versions) for video_id, versions in self.versions.items()}
+        copied.missing = set(self.missing)
+        return copied
+
+    def load(self, paths: List[str], jobs: int = 1, cache_dir: str | None = None):
+        """
+        レポートを指定された順に追加する
+        jobsが2以上なら読み込み(YAMLの解析)を複数プロセスで行う。cache_dirについては read_report を参照
+        """
+        if jobs > 1 and len(paths) > 1:
+            with ProcessPoolExecutor(max_workers=min(jobs, len(paths))) as executor:
+                for path, records in zip(paths, executor.map(read_report, paths, [cache_dir] * len(paths))):
+                    self.add(records)
+                    logger.debug(f"レポートを読み込みました: {path} ({len(records)} 件)")
+        else:
+            for path in paths:
+                records = read_report(path, cache_dir)
+                self.add(records)
+                logger.debug(f"レポートを読み込みました: {path} ({len(records)} 件)")
+        if paths:
+            logger.info(f"{len(paths)} 件のレポートを読み込みました (URL: 累計 {len(self.urls)} 件)。")
+
+    def to_results(self) -> Dict[int, Dict[str, Any]]:
+        """ all_results と同じ形式に変換する """
+        results: Dict[int, Dict[str, Any]] = {
+            video_id: {"metadata": metadata, "versions": {}} for video_id, metadata in self.metadata.items()
+        }
+        for (video_id, version), url in self.urls.items():
+            results.setdefault(video_id, {"metadata": None, "versions": {}})["versions"][version] = url
+        for video_id in self.missing:
+            if video_id not in results:
+                results[video_id] = {"metadata": None, "versions": {}, "missing": True}
+        return results
+
+    def _version_list(self, video_id: int) -> List[int | None]:
+        versions = list(self.versions.get(video_id, {}))
+        if versions == [None]:
+            return versions
+        return sorted((v for v in versions if v is not None))
+
+    def iter_entries(self, video_ids: Iterable[int] | None = None) -> Iterator[Dict[str, Any]]:
+        """ id順にレポートのエントリを返す。video_idsを指定した場合はそのIDのみ返す """
+        results = self.to_results()
+        for video_id in sorted(self.versions if video_ids is None else video_ids):
+            yield build_entry(video_id, results.get(video_id), self._version_list(video_id))
+
+    def diff(self, base: "ReportIndex") -> List[Change]:
+        """ baseと比べて追加・変更されたURLと、変更されたメタデータを返す """
+        changes = []
+        for key in sorted(self.urls, key=lambda k: (k[0], -1 if k[1] is None else k[1])):
+            new, old = self.urls[key], base.urls.get(key)
+            if old is None:
+                changes.append(Change(ADDED, key[0], key[1], None, new))
+            elif old != new:
+                changes.append(Change(CHANGED, key[0], key[1], old, new))
+        for video_id in sorted(self.metadata):
+            old_metadata, new_metadata = base.metadata.get(video_id), self.metadata[video_id]
+            if old_metadata is not None and old_metadata != new_metadata:
+                changes.append(Change(METADATA, video_id, None, _describe(old_metadata), _describe(new_metadata)))
+        return changes
+
+    def subset(self, changes: Iterable[Change]) -> "ReportIndex":
+        """
+        差分に含まれる (id, バージョン) のみのインデックスを返す
+        メタデータが変わった動画は保存先も変わるため、その動画のすべてのURLを含める
+        """
+        subset = ReportIndex()
+        metadata_changed = set()
+        for change in changes:
+            if change.kind == METADATA:
+                metadata_changed.add(change.video_id)
+            else:
+                subset.add([(change.video_id, change.version, change.new, self.metadata.get(change.video_id), False)])
+        if metadata_changed:
+            subset.add(
+                (video_id, version, url, self.metadata.get(video_id), False)
+                for (video_id, version), url in self.urls.items() if video_id in metadata_changed
+            )
+        return subset
+
+def _describe(metadata: VideoMetadata) -> str:
+    return f"{metadata.lesson} / {metadata.song_number} / {metadata.title}"
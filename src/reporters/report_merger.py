@@ -0,0 +1,33 @@
+import logging
+import os
+from typing import Dict, List, Any, Iterable
+from src.core.task_plan import TaskPlan
+from src.reporters.report_index import ReportIndex
+from src.reporters.yaml_reporter import save_results
+
+logger = logging.getLogger(__name__)
+
+def load_results(paths: Iterable[str]) -> Dict[int, Dict[str, Any]]:
+    """
+    複数のレポートを読み込み、1つの all_results にまとめる
+    同じ (id, バージョン) のURLが複数のレポートにある場合は、後に指定したレポートを優先する
+    """
+    existing = []
+    for path in paths:
+        if os.path.exists(path):
+            existing.append(path)
+        else:
+            logger.warning(f"レポートが見つからないため、結合の対象から除外します: {path}")
+    index = ReportIndex()
+    index.load(existing)
+    return index.to_results()
+
+def merge_reports(paths: List[str], output_path: str, plan: TaskPlan) -> Dict[int, Dict[str, Any]]:
+    """
+    シャードごとのレポートを結合し、単独で実行した場合と同じ形式のレポートとして保存する
+    どのレポートにも結果のない動画は、通常の実行と同じくERRORとして出力する
+    """
+    all_results = load_results(paths)
+    logger.info(f"{len(paths)} 件のレポートを結合します。")
+    save_results(all_results, output_path, plan)
+    return all_results
@@ -0,0 +1,83 @@
+import json
+import logging
+import os
+import threading
+from typing import BinaryIO, Dict, Any, Iterator
+from src.core.task_plan import TaskPlan
+from src.reporters.yaml_reporter import build_entry, write_entries
+
+logger = logging.getLogger(__name__)
+
+class StreamReporter:
+    """
+    処理が終わった動画のエントリを1件ずつJSONLへ追記し、終了時にJSONLからYAMLレポートを組み立てる
+    JSONLは実行中に読み進められる。同じIDが複数回現れた場合(再試行で結果が変わった場合)は後の行が最新
+    """
+    def __init__(self, output_path: str, plan: TaskPlan):
+        self.output_path = output_path
+        self.jsonl_path = f"{os.path.splitext(output_path)[0]}.jsonl"
+        self.plan = plan
+        self._file = None
+        self._lock = threading.Lock()
+
+    def open(self):
+        output_dir = os.path.dirname(self.jsonl_path)
+        if output_dir: os.makedirs(output_dir, exist_ok=True)
+        self._file = open(self.jsonl_path, 'w', encoding='utf-8')
+        logger.info(f"処理済みの動画を逐次出力します: {self.jsonl_path}")
+
+    def video_finished(self, video_id: int, result: Dict[str, Any]):
+        """ 動画1件の処理が終わった時点の結果を追記する """
+        if not self._file:
+            return
+        entry = build_entry(video_id, result, self.plan.versions_for(video_id))
+        with self._lock:
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+    def finalize(self, pending_results: Dict[int, Dict[str, Any]]):
+        """
+        JSONLを閉じ、タスク計画のレポート順にYAMLレポートを書き出す
+        各IDのエントリはJSONLの最新の行から読み込むため、メモリにはIDごとの行の位置だけを保持する
+        pending_resultsには処理が終わっていない動画(中断時など)の現時点の結果を渡す
+        """
+        self.close()
+        logger.info(f"抽出した結果をYAMLファイルに保存します: {self.output_path}")
+        try:
+            if os.path.exists(self.jsonl_path):
+                with open(self.jsonl_path, 'rb') as f:
+                    write_entries(self._iter_entries(f, self._index_lines(f), pending_results), self.output_path)
+            else:
+                write_entries(self._iter_entries(None, {}, pending_results), self.output_path)
+            logger.info("YAMLファイルへの保存が完了しました。")
+        except Exception as e:
+            logger.error(f"URLのファイル保存中にエラーが発生しました: {e}", exc_info=True)
+
+    def _index_lines(self, f: BinaryIO) -> Dict[int, int]:
+        """ JSONLを先頭から読み、IDごとに最新の行の位置を返す """
+        offsets: Dict[int, int] = {}
+        offset = 0
+        for line_no, line in enumerate(f, 1):
+            try:
+                offsets[json.loads(line)["id"]] = offset
+            except (ValueError, KeyError, TypeError):
+                logger.warning(f"{self.jsonl_path} の{line_no}行目を読み込めませんでした。")
+            offset += len(line)
+        return offsets
+
+    def _iter_entries(self, f: BinaryIO | None, offsets: Dict[int, int],
+                      pending_results: Dict[int, Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for video_id, versions in self.plan.iter_report_order():
+            if video_id in pending_results:
+                yield build_entry(video_id, pending_results[video_id], versions)
+            elif video_id in offsets:
+                f.seek(offsets[video_id])
+                yield json.loads(f.readline())
+            else:
+                yield build_entry(video_id, None, versions)
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
@@ -1,67 +1,81 @@
 import logging
 import os
 import yaml
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterable, Iterator
+from src.core.task_plan import TaskPlan
+
+try:
+    from yaml import CDumper as Dumper
+except ImportError:  # libyamlなしでインストールされたPyYAML
+    from yaml import Dumper
 
 logger = logging.getLogger(__name__)
 
-def save_results(
-    all_results: Dict[int, Dict[str, Any]],
-    output_path: str,
-    rules: List[Dict[str, Any]]
-):
-    logger.info(f"抽出した結果をYAMLファイルに保存します: {output_path}")
-    
-    output_data = []
-    processed_ids = set()
+def build_entry(video_id: int, result: Dict[str, Any] | None, versions: List[int | None]) -> Dict[str, Any]:
+    """ 1つの動画の結果を、レポートの1エントリの形式に変換する """
+    if result and result.get("missing"):
+        return {'id': video_id, 'status': 'MISSING'}
+    if not result or not result.get("metadata"):
+        return {'id': video_id, 'status': 'ERROR'}
 
-    for rule in rules:
-        id_range = rule.get('id_range', {})
-        start_id, end_id = id_range.get('start'), id_range.get('end')
-        versions = rule.get('versions', [])
+    metadata = result["metadata"]
+    base_info = {
+        'id': video_id,
+        'lesson': metadata.lesson,
+        'song_number': metadata.song_number,
+        'title': metadata.title
+    }
 
-        if start_id is None or end_id is None: continue
+    version_urls = result.get("versions", {})
 
-        for video_id in range(start_id, end_id + 1):
-            if video_id in processed_ids: continue
-            processed_ids.add(video_id)
+    if versions == [None]:
+        url = version_urls.get(None)
+        if url: base_info['url'] = url
+        else: base_info['status'] = 'ERROR'
+    else:
+        version_list = []
+        for ver in versions:
+            url = version_urls.get(ver)
+            if url: version_list.append({'ver': ver, 'url': url})
+            else: version_list.append({'ver': ver, 'status': 'ERROR'})
+        base_info['versions'] = version_list
+    return base_info
 
-            result = all_results.get(video_id)
-            if not result or not result.get("metadata"):
-                output_data.append({'id': video_id, 'status': 'ERROR'})
-                continue
+def iter_report_entries(all_results: Dict[int, Dict[str, Any]], plan: TaskPlan) -> Iterator[Dict[str, Any]]:
+    """ タスク計画のレポート順(ルールの記述順)に、各動画のエントリを1件ずつ返す """
+    for video_id, versions in plan.iter_report_order():
+        yield build_entry(video_id, all_results.get(video_id), versions)
 
-            metadata = result["metadata"]
-            base_info = {
-                'id': video_id,
-                'lesson': metadata.lesson,
-                'song_number': metadata.song_number,
-                'title': metadata.title
-            }
-            
-            version_urls = result.get("versions", {})
-            
-            if versions == [None]:
-                url = version_urls.get(None)
-                if url: base_info['url'] = url
-                else: base_info['status'] = 'ERROR'
-                output_data.append(base_info)
-            else:
-                version_list = []
-                for ver in versions:
-                    url = version_urls.get(ver)
-                    if url: version_list.append({'ver': ver, 'url': url})
-                    else: version_list.append({'ver': ver, 'status': 'ERROR'})
-                base_info['versions'] = version_list
-                output_data.append(base_info)
+def save_results(
+    all_results: Dict[int, Dict[str, Any]],
+    output_path: str,
+    plan: TaskPlan
+):
+    """ 結果をYAMLファイルに保存する (libyamlがあればC実装で書き出す) """
+    logger.info(f"抽出した結果をYAMLファイルに保存します: {output_path}")
 
     try:
-        output_dir = os.path.dirname(output_path)
-        if output_dir: os.makedirs(output_dir, exist_ok=True)
-
-        with open(output_path, 'w', encoding='utf-8') as f:
-            yaml.dump(output_data, f, allow_unicode=True, default_flow_style=False, sort_keys=False)
-            
+        write_entries(iter_report_entries(all_results, plan), output_path)
         logger.info("YAMLファイルへの保存が完了しました。")
     except Exception as e:
-        logger.error(f"URLのファイル保存中にエラーが発生しました: {e}", exc_info=True)
\ No newline at end of file
+        logger.error(f"URLのファイル保存中にエラーが発生しました: {e}", exc_info=True)
+
+def write_entries(entries: Iterable[Dict[str, Any]], output_path: str) -> int:
+    """
+    エントリをYAMLのリストとして1件ずつ書き出し、書き出した件数を返す
+    書き込み途中のファイルを読まれないよう、一時ファイル経由で置き換える
+    """
+    output_dir = os.path.dirname(output_path)
+    if output_dir: os.makedirs(output_dir, exist_ok=True)
+
+    tmp_path = f"{output_path}.tmp"
+    written = 0
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for entry in entries:
+            # 1要素のリストとして書き出すと、連結した結果が1つのリストになる
+            yaml.dump([entry], f, Dumper=Dumper, allow_unicode=True, default_flow_style=False, sort_keys=False)
+            written += 1
+        if written == 0:
+            f.write("[]\n")
+    os.replace(tmp_path, output_path)
+    return written
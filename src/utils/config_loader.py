@@ -22,6 +22,30 @@ class Config:
     username: str
     password: str
     video_processing_rules: List[Dict[str, Any]] = field(default_factory=list)
+    max_workers: int = 1
+    checkpoint_path: str | None = None
+    metadata_cache_path: str | None = None
+    session_cache_path: str | None = None
+    session_max_age_sec: int = 0
+    session_probe_url: str | None = None
+    browser_headless: bool = False
+    browser_channel: str | None = "chrome"
+    browser_args: List[str] = field(default_factory=list)
+    block_resource_types: List[str] = field(default_factory=list)
+    block_url_patterns: List[str] = field(default_factory=list)
+    allow_url_patterns: List[str] = field(default_factory=list)
+    block_tracker_hosts: List[str] = field(default_factory=list)
+    block_media_segments: bool = False
+    extraction_mode: str = "browser"
+    http_follow_url_patterns: List[str] = field(default_factory=list)
+    probe_enabled: bool = False
+    probe_workers: int = 8
+    retry_budgets: Dict[str, int] = field(default_factory=dict)
+    retry_base_delay_sec: float = 2.0
+    retry_max_delay_sec: float = 60.0
+    breaker_window: int = 10
+    breaker_failure_ratio: float = 0.8
+    breaker_cooldown_sec: float = 120.0
 
 def load_config() -> Config | None:
     logger = logging.getLogger(__name__)
@@ -38,11 +62,40 @@ def load_config() -> Config | None:
         logger.info("設定ファイルを正常に読み込みました。")
 
         timeout_settings = config_data.get('timeout_ms', {})
+        session_settings = config_data.get('session', {})
+        browser_settings = config_data.get('browser', {})
+        extraction_settings = config_data.get('extraction', {})
+        retry_settings = config_data.get('retry', {})
+        breaker_settings = retry_settings.get('circuit_breaker', {})
         
         return Config(
             login_url=config_data.get('login_url'),
             video_url_base=config_data.get('video_url_base'),
             retry_count=config_data.get('retry_count', 2),
+            max_workers=max(1, config_data.get('max_workers', 1)),
+            checkpoint_path=config_data.get('checkpoint_path'),
+            metadata_cache_path=config_data.get('metadata_cache_path'),
+            session_cache_path=session_settings.get('cache_path'),
+            session_max_age_sec=int(session_settings.get('max_age_hours', 0) * 3600),
+            session_probe_url=session_settings.get('probe_url') or config_data.get('video_url_base'),
+            browser_headless=browser_settings.get('headless', False),
+            browser_channel=browser_settings.get('channel', 'chrome'),
+            browser_args=browser_settings.get('args', []),
+            block_resource_types=browser_settings.get('block_resource_types', []),
+            block_url_patterns=browser_settings.get('block_url_patterns', []),
+            allow_url_patterns=browser_settings.get('allow_url_patterns', []),
+            block_tracker_hosts=browser_settings.get('block_tracker_hosts', []),
+            block_media_segments=browser_settings.get('block_media_segments', False),
+            extraction_mode=extraction_settings.get('mode', 'browser'),
+            http_follow_url_patterns=extraction_settings.get('follow_url_patterns', []),
+            probe_enabled=extraction_settings.get('probe_existence', False),
+            probe_workers=extraction_settings.get('probe_workers', 8),
+            retry_budgets=retry_settings.get('budgets', {}),
+            retry_base_delay_sec=retry_settings.get('base_delay_sec', 2.0),
+            retry_max_delay_sec=retry_settings.get('max_delay_sec', 60.0),
+            breaker_window=breaker_settings.get('window', 10),
+            breaker_failure_ratio=breaker_settings.get('failure_ratio', 0.8),
+            breaker_cooldown_sec=breaker_settings.get('cooldown_sec', 120.0),
             video_processing_rules=config_data.get('video_processing_rules', []),
             video_play_duration=config_data.get('wait_options', {}).get('video_play_duration_sec', 60),
             timeout_navigation=timeout_settings.get('navigation', 20000),
@@ -1,3 +1,4 @@
+import asyncio
 import time
 import sys
 import logging
@@ -18,4 +19,11 @@ def start_countdown(duration_sec: int):
         sys.stdout.flush()
         time.sleep(1)
     
-    sys.stdout.write("\n")
\ No newline at end of file
+    sys.stdout.write("\n")
+
+async def start_countdown_async(duration_sec: int):
+    """ イベントループをブロックせずに待機する (並列実行時は表示が混ざるためログのみ出力する) """
+    if duration_sec <= 0: return
+
+    logger.info(f"{duration_sec}秒間の待機を開始します。")
+    await asyncio.sleep(duration_sec)
@@ -10,7 +10,8 @@ def trace(self, message, *args, **kws):
         self._log(TRACE_LEVEL_NUM, message, args, **kws)
 logging.Logger.trace = trace
 
-def setup_logging():
+def setup_logging(suffix: str = ""):
+    """ ログの出力先を設定する。suffixはログファイル名に付け、同時に起動した複数プロセスのログを分ける """
     logger = logging.getLogger()
     if logger.hasHandlers():
         logger.handlers.clear()
@@ -21,7 +22,7 @@ def setup_logging():
     os.makedirs(log_dir, exist_ok=True)
 
     timestamp = datetime.now().strftime("%Y-%m-%d-%H%M%S")
-    log_filename = os.path.join(log_dir, f"log_{timestamp}_.txt")
+    log_filename = os.path.join(log_dir, f"log_{timestamp}_{suffix}.txt")
 
     file_handler = logging.FileHandler(log_filename, mode='w', encoding='utf-8')
     file_handler.setLevel(TRACE_LEVEL_NUM)
@@ -0,0 +1,180 @@
+import csv
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Iterator
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class TaskTiming:
+    """ 1回の試行で計測した、処理段階ごとの所要時間(秒)と結果 """
+    video_id: int
+    version: int | None
+    attempt: int
+    path: str
+    started_at: float
+    stages: dict[str, float] = field(default_factory=dict)
+    marks: dict[str, float] = field(default_factory=dict)
+    outcome: str | None = None
+    total: float = 0.0
+
+    def add_stage(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def mark_at(self, name: str, perf_time: float | None):
+        """ 試行の開始からperf_time(time.perf_counter()の値)までの経過時間を記録する """
+        if perf_time is not None and name not in self.marks:
+            self.marks[name] = max(0.0, perf_time - self.started_at)
+
+# 実行中の試行。スレッドごと・asyncioのタスクごとに独立して保持される
+_current: ContextVar[TaskTiming | None] = ContextVar("task_timing", default=None)
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """ 実行中の試行があれば、ブロックの所要時間をその処理段階の時間として記録する """
+    timing = _current.get()
+    if timing is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add_stage(name, time.perf_counter() - start)
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """ 昇順に並んだ値のq分位点 (線形補間) """
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+def summarize(values: list[float]) -> dict:
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "total": round(sum(values), 3),
+        "mean": round(sum(values) / len(values), 3) if values else 0.0,
+        "p50": round(percentile(values, 0.5), 3),
+        "p95": round(percentile(values, 0.95), 3),
+        "max": round(values[-1], 3) if values else 0.0,
+    }
+
+class MetricsRecorder:
+    """
+    (video_id, version)ごとの試行について、処理段階の所要時間・試行回数・結果を集計する
+    実行終了時にYAMLレポートと同じ場所へ *.metrics.json と *.metrics.csv を出力する
+    """
+    def __init__(self, classify: Callable[[BaseException], str] | None = None):
+        self.classify = classify
+        self.records: list[TaskTiming] = []
+        self.started_at = datetime.now()
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(self, video_id: int, version: int | None, attempt: int, path: str = "browser") -> Iterator[TaskTiming]:
+        """
+        ブロックを1回の試行として計測する
+        例外で終了した場合は、classifyで分類したエラーの種類を結果とする
+        """
+        timing = TaskTiming(video_id, version, attempt, path, time.perf_counter())
+        token = _current.set(timing)
+        try:
+            yield timing
+            timing.outcome = timing.outcome or "success"
+        except BaseException as e:
+            timing.outcome = self.classify(e) if self.classify else type(e).__name__
+            raise
+        finally:
+            timing.total = time.perf_counter() - timing.started_at
+            _current.reset(token)
+            with self._lock:
+                self.records.append(timing)
+
+    def summary(self) -> dict:
+        """ 処理段階ごと・経路ごとのp50/p95と、結果・試行回数の集計を返す """
+        with self._lock:
+            records = list(self.records)
+
+        stage_values: dict[str, list[float]] = {}
+        mark_values: dict[str, list[float]] = {}
+        total_values: dict[str, list[float]] = {}
+        attempts: Counter = Counter()
+        succeeded = set()
+        for record in records:
+            for name, seconds in record.stages.items():
+                stage_values.setdefault(name, []).append(seconds)
+            for name, seconds in record.marks.items():
+                mark_values.setdefault(name, []).append(seconds)
+            total_values.setdefault(record.path, []).append(record.total)
+            key = (record.video_id, record.version)
+            attempts[key] += 1
+            if record.outcome == "success":
+                succeeded.add(key)
+
+        wall_time = time.perf_counter() - self._started
+        return {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "wall_time_sec": round(wall_time, 3),
+            "tasks": len(attempts),
+            "succeeded": len(succeeded),
+            "failed": len(attempts) - len(succeeded),
+            "tasks_per_min": round(len(succeeded) / wall_time * 60, 2) if wall_time > 0 else 0.0,
+            "attempts": summarize([float(count) for count in attempts.values()]),
+            "outcomes": dict(Counter(record.outcome for record in records)),
+            "total": {path: summarize(values) for path, values in total_values.items()},
+            "stages": {name: summarize(values) for name, values in stage_values.items()},
+            "marks": {name: summarize(values) for name, values in mark_values.items()},
+        }
+
+    def save(self, report_path: str):
+        """ report_path(urls_*.yaml)の拡張子を置き換えたパスに、集計(JSON)と試行ごとの記録(CSV)を保存する """
+        base_path = os.path.splitext(report_path)[0]
+        with self._lock:
+            records = list(self.records)
+        try:
+            output_dir = os.path.dirname(base_path)
+            if output_dir: os.makedirs(output_dir, exist_ok=True)
+
+            summary = self.summary()
+            with open(f"{base_path}.metrics.json", "w", encoding="utf-8") as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+
+            stage_names = sorted({name for record in records for name in record.stages})
+            mark_names = sorted({name for record in records for name in record.marks})
+            with open(f"{base_path}.metrics.csv", "w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(
+                    ["video_id", "version", "attempt", "path", "outcome", "total"]
+                    + stage_names + [f"mark:{name}" for name in mark_names]
+                )
+                for record in records:
+                    writer.writerow(
+                        [record.video_id, record.version, record.attempt, record.path, record.outcome,
+                         round(record.total, 3)]
+                        + [_cell(record.stages.get(name)) for name in stage_names]
+                        + [_cell(record.marks.get(name)) for name in mark_names]
+                    )
+
+            self._log_summary(summary)
+            logger.info(f"処理時間の計測結果を保存しました: {base_path}.metrics.json")
+        except Exception as e:
+            logger.error(f"計測結果の保存中にエラーが発生しました: {e}", exc_info=True)
+
+    def _log_summary(self, summary: dict):
+        for name, values in summary["stages"].items():
+            logger.info(f"  {name}: p50={values['p50']:.2f}s p95={values['p95']:.2f}s (n={values['count']})")
+
+def _cell(value: float | None) -> str:
+    return "" if value is None else f"{value:.3f}"
@@ -0,0 +1,178 @@
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 分類できなかったエラーの種類
+OTHER = "other"
+
+# CircuitBreakerの状態
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class RetryPolicy:
+    """
+    エラーの種類ごとのリトライ回数(予算)と、指数バックオフ+ジッターによる待機時間を決める
+    classesには (例外クラス, 種類) の組を優先順に指定する
+    rngにはジッターに使う乱数生成器を指定できる (テスト用。省略時はrandomモジュール)
+    """
+    def __init__(self, default_budget: int, budgets: Optional[Dict[str, int]] = None,
+                 base_delay: float = 2.0, max_delay: float = 60.0, multiplier: float = 2.0,
+                 classes: Tuple[Tuple[type, str], ...] = (), rng: Optional[random.Random] = None):
+        self.default_budget = max(0, default_budget)
+        self.budgets = budgets or {}
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.classes = classes
+        self._uniform = (rng or random).uniform
+
+    def classify(self, error: BaseException) -> str:
+        """ 例外をエラーの種類に分類する """
+        for error_class, kind in self.classes:
+            if isinstance(error, error_class):
+                return kind
+        return OTHER
+
+    def budget(self, kind: str) -> int:
+        return self.budgets.get(kind, self.default_budget)
+
+    def should_retry(self, kind: str, failures: int) -> bool:
+        """ failures回失敗した後に、もう一度試行してよいかを返す """
+        return failures <= self.budget(kind)
+
+    def delay(self, failures: int) -> float:
+        """
+        failures回目の失敗後の待機時間(秒)
+        上限付きの指数バックオフの半分を固定、残り半分をランダムにして、同時に失敗したタスクの再試行を分散させる
+        """
+        ceiling = min(self.max_delay, self.base_delay * self.multiplier ** max(0, failures - 1))
+        return ceiling / 2 + self._uniform(0, ceiling / 2)
+
+class CircuitBreaker:
+    """
+    直近window件の結果のうち失敗の割合がfailure_ratio以上になったら、cooldown秒の間は新しい処理を止める (OPEN)
+    cooldownの経過後は処理を再開し (HALF_OPEN)、最初の結果が成功なら通常の状態 (CLOSED) に戻り、失敗なら再び遮断する
+    サイト全体の障害時に、すべてのタスクが失敗してリトライ予算を使い切るのを防ぐ
+    clockには現在時刻(秒)を返す関数を指定できる (テスト用。省略時はtime.monotonic)
+    """
+    def __init__(self, window: int = 10, failure_ratio: float = 0.8, cooldown: float = 120.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.window = max(1, window)
+        self.failure_ratio = failure_ratio
+        self.cooldown = cooldown
+        self.clock = clock
+        self._results: Deque[bool] = deque(maxlen=self.window)
+        self._open_until = 0.0
+        self._half_open = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self.clock() < self._open_until:
+            return OPEN
+        return HALF_OPEN if self._half_open else CLOSED
+
+    def record(self, success: bool):
+        """ 1件の処理結果を記録し、失敗が続いていれば遮断する """
+        with self._lock:
+            state = self._state()
+            if state == OPEN:
+                # 遮断前に開始した処理の結果は、再開後の判定に含めない
+                return
+            if state == HALF_OPEN:
+                self._half_open = False
+                if not success:
+                    self._trip("再開後の最初の処理が失敗した")
+                    return
+                logger.info("処理の再開後に成功したため、通常の状態に戻ります。")
+            self._results.append(success)
+            if len(self._results) < self.window:
+                return
+            failures = self._results.count(False)
+            if failures / self.window >= self.failure_ratio:
+                self._trip(f"直近{self.window}件中{failures}件が失敗した")
+
+    def _trip(self, reason: str):
+        self._open_until = self.clock() + self.cooldown
+        self._half_open = True
+        # 再開後は新しい結果だけで判定する
+        self._results.clear()
+        logger.warning(f"{reason}ため、{self.cooldown:.0f}秒間処理を停止します。")
+
+    def remaining(self) -> float:
+        """ 遮断中であれば、再開までの残り秒数を返す """
+        with self._lock:
+            return max(0.0, self._open_until - self.clock())
+
+    def wait(self):
+        """ 遮断中であれば、再開まで待機する """
+        remaining = self.remaining()
+        if remaining > 0:
+            logger.info(f"処理の再開まで{remaining:.0f}秒待機します。")
+            time.sleep(remaining)
+
+class RetryQueue:
+    """
+    失敗したタスクを、待機時間が経過するまで後回しにして再投入するキュー
+    ワーカーは待機中のタスクのために止まらず、通常のタスクを優先して処理する
+    clockには現在時刻(秒)を返す関数を指定できる (テスト用。省略時はtime.monotonic)
+    """
+    def __init__(self, items=(), clock: Callable[[], float] = time.monotonic):
+        self._ready: Deque[Any] = deque(items)
+        self._deferred: List[Tuple[float, int, Any]] = []
+        self._sequence = itertools.count()
+        self._active = 0
+        self._condition = threading.Condition()
+        self.clock = clock
+
+    def put(self, item: Any):
+        with self._condition:
+            self._ready.append(item)
+            self._condition.notify()
+
+    def defer(self, item: Any, delay: float):
+        """ delay秒後に再投入する """
+        with self._condition:
+            heapq.heappush(self._deferred, (self.clock() + delay, next(self._sequence), item))
+            self._condition.notify_all()
+
+    def get(self) -> Any:
+        """
+        次のタスクを返す。後回しのタスクしかなければ、待機時間が経過するまで待つ
+        処理中のタスクがなく、キューも空であればNoneを返す
+        """
+        with self._condition:
+            while True:
+                if self._ready:
+                    self._active += 1
+                    return self._ready.popleft()
+                if self._deferred:
+                    wait = self._deferred[0][0] - self.clock()
+                    if wait <= 0:
+                        self._active += 1
+                        return heapq.heappop(self._deferred)[2]
+                    self._condition.wait(wait)
+                    continue
+                if self._active == 0:
+                    # 他のワーカーも終了できるように通知する
+                    self._condition.notify_all()
+                    return None
+                self._condition.wait()
+
+    def task_done(self):
+        """ getで取り出したタスクの処理が終わったことを通知する (再投入はこれより前に行う) """
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# プロジェクトのルートと downloader/ をシステムパスに追加し、
+# 'src'パッケージと downloader/ 内のモジュール(hls_downloader など)をインポートできるようにする
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, "downloader"))
@@ -0,0 +1,96 @@
+import pytest
+import requests
+from hls_downloader import (
+    REASON_CLIENT_ERROR, REASON_TRANSIENT, HlsError, HlsSegment, _classify, _fingerprint,
+    parse_media_playlist, select_variant,
+)
+
+BASE_URL = "https://cdn.example.com/video/1/master.m3u8?token=abc"
+
+MASTER = """#EXTM3U
+#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=640x360,CODECS="avc1.4d401e,mp4a.40.2"
+low/index.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=2400000,RESOLUTION=1280x720
+
+https://other.example.com/high/index.m3u8?sig=1
+#EXT-X-STREAM-INF:BANDWIDTH=1200000
+mid/index.m3u8
+"""
+
+MEDIA = """#EXTM3U
+#EXT-X-VERSION:3
+#EXT-X-TARGETDURATION:10
+#EXT-X-MEDIA-SEQUENCE:7
+#EXT-X-MAP:URI="init.mp4"
+#EXTINF:9.5,
+seg7.ts?sig=a
+#EXT-X-KEY:METHOD=AES-128,URI="key.bin",IV=0x000102030405060708090A0B0C0D0E0F
+#EXTINF:10.0,title
+/abs/seg8.ts
+#EXT-X-KEY:METHOD=NONE
+#EXTINF:4.25,
+https://other.example.com/seg9.ts
+#EXT-X-ENDLIST
+"""
+
+def test_select_variant_picks_highest_bandwidth():
+    assert select_variant(MASTER, BASE_URL) == "https://other.example.com/high/index.m3u8?sig=1"
+
+def test_select_variant_resolves_relative_uris():
+    master = "#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=1\nlow/index.m3u8\n"
+    assert select_variant(master, BASE_URL) == "https://cdn.example.com/video/1/low/index.m3u8"
+
+def test_select_variant_returns_none_for_media_playlist():
+    assert select_variant(MEDIA, BASE_URL) is None
+
+def test_parse_media_playlist():
+    playlist = parse_media_playlist(MEDIA, BASE_URL)
+    assert playlist.init_uri == "https://cdn.example.com/video/1/init.mp4"
+    assert [(s.uri, s.duration, s.sequence) for s in playlist.segments] == [
+        ("https://cdn.example.com/video/1/seg7.ts?sig=a", 9.5, 7),
+        ("https://cdn.example.com/abs/seg8.ts", 10.0, 8),
+        ("https://other.example.com/seg9.ts", 4.25, 9),
+    ]
+    assert playlist.total_duration == pytest.approx(23.75)
+
+def test_parse_media_playlist_tracks_keys():
+    first, second, third = parse_media_playlist(MEDIA, BASE_URL).segments
+    assert first.key is None
+    assert second.key.method == "AES-128"
+    assert second.key.uri == "https://cdn.example.com/video/1/key.bin"
+    assert second.key.iv == bytes(range(16))
+    assert third.key is None
+
+@pytest.mark.parametrize("text, message", [
+    ("<html></html>", "m3u8"),
+    ("#EXTM3U\n#EXT-X-ENDLIST\n", "セグメント"),
+    ("#EXTM3U\n#EXT-X-KEY:METHOD=SAMPLE-AES,URI=\"k\"\n#EXTINF:1,\na.ts\n", "SAMPLE-AES"),
+    ("#EXTM3U\n#EXTINF:1,\n#EXT-X-BYTERANGE:100@0\na.ts\n", "バイトレンジ"),
+])
+def test_parse_media_playlist_rejects_unsupported_playlists(text, message):
+    with pytest.raises(HlsError, match=message):
+        parse_media_playlist(text, BASE_URL)
+
+def test_fingerprint_ignores_query_tokens_but_not_segments():
+    def segments(token, durations=(10.0, 10.0), start=0):
+        return [HlsSegment(f"https://cdn.example.com/seg{i}.ts?token={token}", d, start + i)
+                for i, d in enumerate(durations)]
+
+    assert _fingerprint(segments("a")) == _fingerprint(segments("b"))
+    assert _fingerprint(segments("a")) != _fingerprint(segments("a", (10.0, 4.0)))
+    assert _fingerprint(segments("a")) != _fingerprint(segments("a", start=5))
+
+def _http_error(status_code: int) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.HTTPError(response=response)
+
+@pytest.mark.parametrize("error, reason", [
+    (_http_error(404), REASON_CLIENT_ERROR),
+    (_http_error(403), REASON_CLIENT_ERROR),
+    (_http_error(429), REASON_TRANSIENT),
+    (_http_error(503), REASON_TRANSIENT),
+    (requests.ConnectionError(), REASON_TRANSIENT),
+])
+def test_classify(error, reason):
+    assert _classify(error) == reason
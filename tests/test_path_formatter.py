@@ -0,0 +1,60 @@
+import os
+import pytest
+from path_formatter import format_all_tasks, format_download_tasks
+
+BASELINE_KEYS = ("dir_path", "file_name", "download_url")
+
+def item(song_number, lesson="L", title="T", **sources):
+    return {"id": 1, "lesson": lesson, "song_number": song_number, "title": title, **sources}
+
+# 書き換え前の実装が出力していた保存先 (dir_path, file_name, download_url)
+@pytest.mark.parametrize("entry, expected", [
+    (
+        item("1-3", lesson="Sing Along", title="Hello", url="https://e/1.m3u8"),
+        [(os.path.join("VIDEO", "Sing Along", "01"), "1-03_Hello.mp4", "https://e/1.m3u8")],
+    ),
+    (
+        item("2-12a", lesson="Sing Along", title="What's up?", versions=[
+            {"ver": 1, "url": "https://e/2a"}, {"ver": 2, "status": "ERROR"},
+            {"ver": 3, "url": "https://e/2c"}, {"ver": 4, "url": "https://e/2d"},
+        ]),
+        [
+            (os.path.join("VIDEO", "Sing Along_Lyrics", "02"), "2-12_What's up.mp4", "https://e/2a"),
+            (os.path.join("VIDEO", "Sing Along_Karaoke", "02"), "2-12_What's up.mp4", "https://e/2c"),
+            (os.path.join("VIDEO", "Sing Along", "02"), "2-12_What's up.mp4", "https://e/2d"),
+        ],
+    ),
+    (
+        item("7-01", lesson="A/B: C*D", title='x<y>"z"|', versions=[
+            {"ver": 2, "url": "https://e/3"}, {"ver": 1, "url": ""},
+        ]),
+        [(os.path.join("VIDEO", "AB CD_Vocabulary", "7"), "7-01_xyz.mp4", "https://e/3")],
+    ),
+    (item("DVD1-5", url="https://e/4"), [(os.path.join("VIDEO", "L", "DVD1"), "DVD1-05_T.mp4", "https://e/4")]),
+    (item("3-4-5", url="https://e/8"), [(os.path.join("VIDEO", "L", "03"), "3-04_T.mp4", "https://e/8")]),
+    (item("1-x", url="https://e/5"), []),
+    (item("1-2", url="https://e/6", status="ERROR"), []),
+    (item("1-2", lesson="", url="https://e/7"), []),
+    (item("1-2"), []),
+])
+def test_matches_baseline_output(entry, expected):
+    tasks = format_download_tasks(entry)
+    assert [tuple(task[key] for key in BASELINE_KEYS) for task in tasks] == expected
+
+@pytest.mark.parametrize("song_number", ["12", 12, "1"])
+def test_song_number_without_dash_is_skipped(song_number):
+    # 書き換え前の実装は、ハイフンのない曲番号でIndexError(数値の場合はAttributeError)になっていた
+    assert format_download_tasks(item(song_number, url="https://e/9")) == []
+
+def test_tasks_carry_lesson_and_version():
+    tasks = format_download_tasks(item("1-1", versions=[{"ver": 3, "url": "u"}]))
+    assert (tasks[0]["lesson"], tasks[0]["ver"]) == ("L", 3)
+
+def test_duplicate_destinations_keep_the_first_entry():
+    entries = [
+        {**item("1-1", url="https://e/a"), "id": 1},
+        {**item("1-1", url="https://e/b"), "id": 2},
+        {**item("1-1", url="https://e/a"), "id": 3},
+        {**item("1-2", url="https://e/c"), "id": 4},
+    ]
+    assert [task["download_url"] for task in format_all_tasks(entries)] == ["https://e/a", "https://e/c"]
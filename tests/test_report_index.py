@@ -0,0 +1,91 @@
+import yaml
+from src.reporters.report_index import ADDED, CHANGED, METADATA, ReportIndex, iter_records, read_report
+from src.utils.config_loader import VideoMetadata
+
+def entry(video_id, versions=None, url=None, title="T"):
+    base = {"id": video_id, "lesson": "L", "song_number": f"1-{video_id}", "title": title}
+    if versions is not None:
+        base["versions"] = [
+            {"ver": ver, "url": u} if u else {"ver": ver, "status": "ERROR"} for ver, u in versions
+        ]
+    elif url:
+        base["url"] = url
+    else:
+        base["status"] = "ERROR"
+    return base
+
+def index_of(*entries):
+    index = ReportIndex()
+    index.add(iter_records(entries))
+    return index
+
+def test_iter_records_expands_versions_and_statuses():
+    records = list(iter_records([
+        entry(1, [(1, "a"), (2, None)]),
+        entry(2, url="b"),
+        {"id": 3, "status": "ERROR"},
+        {"id": 4, "status": "MISSING"},
+        {"status": "ERROR"},
+    ]))
+    metadata = VideoMetadata(lesson="L", song_number="1-1", title="T")
+    assert records[:2] == [(1, 1, "a", metadata, False), (1, 2, None, metadata, False)]
+    assert [r[:3] for r in records[2:]] == [(2, None, "b"), (3, None, None), (4, None, None)]
+    assert records[3][3] is None
+    assert records[4][4] is True
+
+def test_error_and_missing_never_erase_a_url():
+    index = index_of(entry(1, [(1, "a"), (2, "b")]), entry(2, url="c"))
+    index.add(iter_records([
+        entry(1, [(1, None), (2, "b2")]),
+        {"id": 2, "status": "ERROR"},
+        {"id": 2, "status": "MISSING"},
+    ]))
+    assert index.urls == {(1, 1): "a", (1, 2): "b2", (2, None): "c"}
+    entries = {e["id"]: e for e in index.iter_entries()}
+    assert entries[2]["url"] == "c"
+    assert "status" not in entries[2]
+
+def test_missing_only_applies_without_results():
+    index = index_of({"id": 5, "status": "MISSING"}, entry(6, url="x"), {"id": 6, "status": "MISSING"})
+    assert list(index.iter_entries()) == [{"id": 5, "status": "MISSING"}, entry(6, url="x")]
+
+def test_error_versions_are_kept_in_output():
+    index = index_of(entry(1, [(2, "b"), (1, None)]))
+    assert list(index.iter_entries()) == [entry(1, [(1, None), (2, "b")])]
+
+def test_diff_reports_added_changed_and_metadata():
+    base = index_of(entry(1, [(1, "a"), (2, "b")]), entry(2, url="c"))
+    new = index_of(entry(1, [(1, "a"), (2, "b2"), (3, "d")]), entry(2, url="c", title="T2"), entry(3, url="e"))
+    changes = new.diff(base)
+    assert [(c.kind, c.video_id, c.version, c.old, c.new) for c in changes] == [
+        (CHANGED, 1, 2, "b", "b2"),
+        (ADDED, 1, 3, None, "d"),
+        (ADDED, 3, None, None, "e"),
+        (METADATA, 2, None, "L / 1-2 / T", "L / 1-2 / T2"),
+    ]
+    assert new.diff(new) == []
+
+def test_subset_includes_all_urls_of_videos_with_changed_metadata():
+    base = index_of(entry(1, [(1, "a"), (2, "b")]), entry(2, [(1, "c"), (2, "d")]))
+    new = index_of(entry(1, [(1, "a"), (2, "b2")]), entry(2, [(1, "c"), (2, "d")], title="T2"))
+    subset = new.subset(new.diff(base))
+    assert subset.urls == {(1, 2): "b2", (2, 1): "c", (2, 2): "d"}
+    assert subset.metadata[2].title == "T2"
+
+def test_read_report_uses_cache_until_the_report_changes(tmp_path):
+    path = tmp_path / "urls_2024-01-01-000000.yaml"
+    cache_dir = tmp_path / "cache"
+    path.write_text(yaml.safe_dump([entry(1, url="a")]), encoding="utf-8")
+    assert read_report(str(path), str(cache_dir))[0][2] == "a"
+    assert len(list(cache_dir.iterdir())) == 1
+    assert read_report(str(path), str(cache_dir))[0][2] == "a"
+
+    path.write_text(yaml.safe_dump([entry(1, url="changed"), entry(2, url="b")]), encoding="utf-8")
+    assert [record[2] for record in read_report(str(path), str(cache_dir))] == ["changed", "b"]
+
+def test_to_results_round_trips_through_entries():
+    index = index_of(entry(1, [(1, "a"), (2, None)]), entry(2, url="b"), {"id": 3, "status": "MISSING"})
+    results = index.to_results()
+    assert results[1]["versions"] == {1: "a"}
+    assert results[2]["versions"] == {None: "b"}
+    assert results[3]["missing"] is True
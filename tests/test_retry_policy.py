@@ -0,0 +1,123 @@
+import random
+import threading
+import pytest
+from src.utils.retry_policy import CLOSED, HALF_OPEN, OPEN, OTHER, CircuitBreaker, RetryPolicy, RetryQueue
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+class FixedRandom(random.Random):
+    """ uniform(a, b) が常に a + (b - a) * fraction を返す乱数生成器 """
+    def __init__(self, fraction: float):
+        super().__init__()
+        self.fraction = fraction
+
+    def uniform(self, a, b):
+        return a + (b - a) * self.fraction
+
+def test_classify_uses_first_matching_class():
+    policy = RetryPolicy(1, classes=((TimeoutError, "timeout"), (OSError, "os")))
+    assert policy.classify(TimeoutError()) == "timeout"
+    assert policy.classify(FileNotFoundError()) == "os"
+    assert policy.classify(ValueError()) == OTHER
+
+def test_budgets_per_kind_and_give_up():
+    policy = RetryPolicy(2, {"session": 0, "timeout": 3})
+    assert [policy.should_retry("timeout", n) for n in range(1, 5)] == [True, True, True, False]
+    assert [policy.should_retry("other", n) for n in range(1, 4)] == [True, True, False]
+    assert not policy.should_retry("session", 1)
+    assert RetryPolicy(-1).budget("any") == 0
+
+@pytest.mark.parametrize("fraction", [0.0, 1.0])
+def test_backoff_grows_exponentially_up_to_the_cap(fraction):
+    policy = RetryPolicy(5, base_delay=2.0, max_delay=30.0, rng=FixedRandom(fraction))
+    ceilings = [2.0, 4.0, 8.0, 16.0, 30.0, 30.0]
+    assert [policy.delay(n) for n in range(1, 7)] == [c / 2 + c / 2 * fraction for c in ceilings]
+
+def test_jitter_stays_within_half_to_full_ceiling():
+    policy = RetryPolicy(5, base_delay=1.0, max_delay=8.0, rng=random.Random(42))
+    for failures in range(1, 8):
+        ceiling = min(8.0, 2.0 ** (failures - 1))
+        delays = [policy.delay(failures) for _ in range(200)]
+        assert all(ceiling / 2 <= d <= ceiling for d in delays)
+        assert len(set(delays)) > 1
+
+def test_breaker_opens_half_opens_and_closes():
+    clock = FakeClock()
+    breaker = CircuitBreaker(window=4, failure_ratio=0.75, cooldown=60, clock=clock)
+    for success in (True, False, False):
+        breaker.record(success)
+    assert breaker.state == CLOSED
+    breaker.record(False)
+    assert breaker.state == OPEN
+    assert breaker.remaining() == 60
+
+    # 遮断中に終わった処理の結果は判定に含めない
+    breaker.record(False)
+    clock.advance(59)
+    assert breaker.state == OPEN and breaker.remaining() == 1
+    clock.advance(1)
+    assert breaker.state == HALF_OPEN and breaker.remaining() == 0
+
+    breaker.record(True)
+    assert breaker.state == CLOSED
+    # 再開後は新しい結果だけで判定する
+    for _ in range(2):
+        breaker.record(False)
+    assert breaker.state == CLOSED
+
+def test_breaker_reopens_when_the_first_result_after_cooldown_fails():
+    clock = FakeClock()
+    breaker = CircuitBreaker(window=2, failure_ratio=1.0, cooldown=30, clock=clock)
+    breaker.record(False)
+    breaker.record(False)
+    clock.advance(30)
+    assert breaker.state == HALF_OPEN
+    breaker.record(False)
+    assert breaker.state == OPEN
+    assert breaker.remaining() == 30
+
+def test_breaker_stays_closed_below_the_ratio():
+    breaker = CircuitBreaker(window=5, failure_ratio=0.8, cooldown=30, clock=FakeClock())
+    for success in (False, False, False, True, True, False, True):
+        breaker.record(success)
+    assert breaker.state == CLOSED
+
+def test_queue_serves_ready_items_before_deferred_ones():
+    clock = FakeClock()
+    queue = RetryQueue(["a", "b"], clock=clock)
+    queue.defer("late", 10)
+    queue.defer("early", 5)
+    queue.defer("early-2", 5)
+    queue.put("c")
+    clock.advance(10)
+    # 待機時間が経過していても通常のタスクを優先し、後回しのタスクは再投入の予定時刻順(同時刻なら追加順)
+    assert [queue.get() for _ in range(6)] == ["a", "b", "c", "early", "early-2", "late"]
+
+def test_queue_returns_none_only_after_all_tasks_are_done():
+    clock = FakeClock()
+    queue = RetryQueue(["task"], clock=clock)
+    assert queue.get() == "task"
+    # 処理中のタスクが再投入された後に完了を通知する
+    queue.defer("task-retry", 5)
+    queue.task_done()
+    clock.advance(5)
+    assert queue.get() == "task-retry"
+
+    # 処理中のタスクがある間は、空でも終了しない
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(queue.get()))
+    waiter.start()
+    waiter.join(timeout=0.05)
+    assert waiter.is_alive()
+    queue.task_done()
+    waiter.join(timeout=1)
+    assert result == [None]
+    assert queue.get() is None
@@ -0,0 +1,99 @@
+import json
+from src.core.checkpoint_store import CheckpointStore
+from src.core.task_plan import TaskPlan
+from src.core.task_processor import TaskProcessor
+from src.reporters.stream_reporter import StreamReporter
+from src.reporters.yaml_reporter import save_results
+from src.utils.config_loader import Config, VideoMetadata
+
+RULES = [
+    {"id_range": {"start": 1, "end": 4}, "versions": [1, 2]},
+    {"ids": [10, 11], "versions": [None]},
+]
+
+def metadata(video_id):
+    return VideoMetadata(lesson="L", song_number=f"1-{video_id}", title=f"タイトル{video_id}")
+
+def result(video_id, versions, with_metadata=True):
+    return {"metadata": metadata(video_id) if with_metadata else None, "versions": dict(versions)}
+
+def expected_report(tmp_path, results, plan):
+    path = tmp_path / "expected.yaml"
+    save_results(results, str(path), plan)
+    return path.read_text(encoding="utf-8")
+
+def test_finalize_matches_save_results_with_a_truncated_last_line(tmp_path):
+    plan = TaskPlan.compile(RULES)
+    reporter = StreamReporter(str(tmp_path / "urls_test.yaml"), plan)
+    reporter.open()
+    reporter.video_finished(1, result(1, {1: "u1a"}))
+    reporter.video_finished(2, {"metadata": None, "versions": {}, "missing": True})
+    reporter.video_finished(10, result(10, {None: "u10"}))
+    # 再試行で結果が変わった場合は後の行が最新
+    reporter.video_finished(1, result(1, {1: "u1a", 2: "u1b"}))
+    reporter.video_finished(3, result(3, {1: "u3a"}))
+    # 書き込み途中で中断された行 (読み飛ばし、それより前の行を採用する)
+    line = json.dumps({"id": 3, "lesson": "L", "versions": [{"ver": 1, "url": "broken"}]})
+    reporter._file.write(line[:len(line) // 2])
+    reporter._file.flush()
+
+    pending = {4: result(4, {2: "u4b"})}
+    reporter.finalize(pending)
+
+    results = {
+        1: result(1, {1: "u1a", 2: "u1b"}),
+        2: {"metadata": None, "versions": {}, "missing": True},
+        3: result(3, {1: "u3a"}),
+        4: result(4, {2: "u4b"}),
+        10: result(10, {None: "u10"}),
+    }
+    assert (tmp_path / "urls_test.yaml").read_text(encoding="utf-8") == expected_report(tmp_path, results, plan)
+
+def test_resume_from_a_truncated_checkpoint_matches_save_results(tmp_path):
+    checkpoint_path = tmp_path / "checkpoint.jsonl"
+    checkpoint = CheckpointStore(str(checkpoint_path))
+    checkpoint.open(resume=False)
+    for video_id in (1, 2):
+        checkpoint.record_metadata(video_id, metadata(video_id))
+        checkpoint.record_url(video_id, 1, f"u{video_id}a")
+    checkpoint.record_url(1, 2, "u1b")
+    checkpoint.record_metadata(10, metadata(10))
+    checkpoint.close()
+    with open(checkpoint_path, "a", encoding="utf-8") as f:
+        f.write('{"type": "url", "id": 10, "ver": nu')
+
+    config = Config(
+        login_url="https://example.com/login/", video_url_base="https://example.com/movie/",
+        retry_count=1, video_play_duration=1, timeout_navigation=1000, timeout_visible=1000,
+        timeout_click=1000, username="user", password="password",
+        video_processing_rules=RULES, checkpoint_path=str(checkpoint_path),
+    )
+    report_path = tmp_path / "urls_resume.yaml"
+    processor = TaskProcessor(resume=True, config=config, report_path=str(report_path))
+    processor._open_checkpoint()
+    processor.reporter.open()
+    groups = processor._build_groups()
+    # 1はすべてのバージョンを取得済みのため、レポートへ出力済みで処理の対象外
+    assert groups == [(2, [2]), (3, [1, 2]), (4, [1, 2]), (10, [None]), (11, [None])]
+    assert 1 not in processor.all_results
+
+    processor._store_url(2, 2, "u2b")
+    processor._finish_video(2, [], 0)
+    processor._store_metadata(3, metadata(3))
+    processor._store_url(3, 1, "u3a")
+    processor._finish_video(3, [], 0)
+    processor._store_url(10, None, "u10")
+    processor._finish_video(10, [], 0)
+    # 4と11は処理の途中で中断された
+    processor._save_final_report()
+    processor._close_checkpoint()
+
+    results = {
+        1: result(1, {1: "u1a", 2: "u1b"}),
+        2: result(2, {1: "u2a", 2: "u2b"}),
+        3: result(3, {1: "u3a"}),
+        10: result(10, {None: "u10"}),
+    }
+    assert report_path.read_text(encoding="utf-8") == expected_report(tmp_path, results, processor.plan)
+    # 再開後の結果はチェックポイントへ追記され、中断された行の続きにはならない
+    assert len(CheckpointStore(str(checkpoint_path)).load()[10]["versions"]) == 1
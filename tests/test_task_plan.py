@@ -0,0 +1,80 @@
+import pytest
+from src.core.shard import Shard
+from src.core.task_plan import IdSet, TaskPlan
+
+def test_idset_merges_overlapping_and_adjacent_ranges():
+    ids = IdSet([range(10, 20), range(1, 5), range(5, 8), range(15, 25), range(30, 30)])
+    assert ids.ranges == (range(1, 8), range(10, 25))
+    assert len(ids) == 7 + 15
+
+def test_idset_parse_accepts_ids_and_inclusive_ranges():
+    ids = IdSet.parse([3, {"start": 5, "end": 7}, 4])
+    assert list(ids) == [3, 4, 5, 6, 7]
+    assert list(IdSet.parse({"start": 1, "end": 1})) == [1]
+
+@pytest.mark.parametrize("spec", [True, "1", {"start": 1}, [1, None]])
+def test_idset_parse_rejects_invalid_specs(spec):
+    with pytest.raises(ValueError):
+        IdSet.parse(spec)
+
+def test_idset_contains():
+    ids = IdSet([range(1, 4), range(10, 12)])
+    assert [i for i in range(0, 13) if i in ids] == [1, 2, 3, 10, 11]
+
+def test_idset_union():
+    assert list(IdSet([range(1, 3)]) | IdSet([range(2, 5), range(8, 9)])) == [1, 2, 3, 4, 8]
+
+def test_idset_subtraction():
+    ids = IdSet([range(1, 11), range(20, 31)])
+    removed = IdSet([range(0, 2), range(5, 7), range(10, 22), range(25, 26), range(30, 40)])
+    assert list(ids - removed) == [2, 3, 4, 7, 8, 9, 22, 23, 24, 26, 27, 28, 29]
+    assert list(ids - IdSet()) == list(ids)
+    assert list(IdSet() - ids) == []
+
+def test_idset_shard_iteration_matches_owns():
+    ids = IdSet([range(1, 12), range(40, 47)])
+    for count in (1, 3, 4):
+        shards = [Shard(index, count) for index in range(1, count + 1)]
+        for shard in shards:
+            expected = [video_id for video_id in ids if shard.owns(video_id)]
+            assert list(ids.iter_shard(shard)) == expected
+            assert ids.count_shard(shard) == len(expected)
+        assert sorted(v for shard in shards for v in ids.iter_shard(shard)) == list(ids)
+    assert list(ids.iter_shard(None)) == list(ids)
+
+def test_compile_first_rule_wins_and_exclude():
+    plan = TaskPlan.compile([
+        {"id_range": {"start": 1, "end": 5}, "exclude": [2], "versions": [1, 2]},
+        {"ids": [1, 2, {"start": 5, "end": 6}], "versions": [None]},
+    ])
+    assert plan.versions_for(1) == [1, 2]
+    assert plan.versions_for(2) == [None]
+    assert plan.versions_for(5) == [1, 2]
+    assert plan.versions_for(7) == []
+    assert list(plan.iter_report_order()) == [
+        (1, [1, 2]), (3, [1, 2]), (4, [1, 2]), (5, [1, 2]), (2, [None]), (6, [None]),
+    ]
+    assert plan.video_count == 6
+    assert plan.task_count == 4 * 2 + 2
+
+def test_compile_skips_invalid_and_empty_rules():
+    plan = TaskPlan.compile([
+        {"ids": ["x"], "versions": [1]},
+        {"ids": [1], "versions": []},
+        {"ids": [1], "exclude": [1], "versions": [1]},
+        {"ids": [2], "versions": [1]},
+    ])
+    assert list(plan.iter_videos()) == [(2, [1])]
+
+def test_processing_order_follows_priority_but_report_order_does_not():
+    plan = TaskPlan.compile([
+        {"ids": [1, 2], "versions": [1]},
+        {"ids": [3], "versions": [1], "priority": 5},
+    ])
+    assert [video_id for video_id, _ in plan.iter_videos()] == [3, 1, 2]
+    assert [video_id for video_id, _ in plan.iter_report_order()] == [1, 2, 3]
+
+def test_sharded_plan_only_yields_owned_ids():
+    plan = TaskPlan.compile([{"id_range": {"start": 1, "end": 10}, "versions": [1]}], Shard(2, 3))
+    assert [video_id for video_id, _ in plan.iter_videos()] == [1, 4, 7, 10]
+    assert plan.versions_for(2) == []
@@ -0,0 +1,45 @@
+import pytest
+import yaml
+from yaml_stream import iter_yaml_items
+
+ITEMS = [
+    {"id": 1, "lesson": "L", "song_number": "1-1", "title": "T1", "url": "https://e/1.m3u8"},
+    {"id": 2, "lesson": "L", "song_number": "1-2", "title": "複数行\nのタイトル",
+     "versions": [{"ver": 1, "url": "https://e/2a.m3u8"}, {"ver": 2, "status": "ERROR"}]},
+    {"id": 3, "status": "MISSING"},
+    None,
+    [1, 2],
+    "- not an item start",
+]
+
+def write(tmp_path, text, name="urls.yaml"):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+@pytest.mark.parametrize("batch_size", [1, 2, 4, 256])
+def test_batches_match_full_load(tmp_path, batch_size):
+    path = write(tmp_path, yaml.safe_dump(ITEMS, allow_unicode=True, default_flow_style=False))
+    assert list(iter_yaml_items(path, batch_size)) == ITEMS
+
+def test_concatenated_single_item_dumps(tmp_path):
+    # write_entries と同様に、1要素のリストを連結した形式
+    text = "".join(yaml.safe_dump([item], allow_unicode=True, default_flow_style=False) for item in ITEMS[:3])
+    assert list(iter_yaml_items(write(tmp_path, text), batch_size=1)) == ITEMS[:3]
+
+def test_header_comments_and_document_marker(tmp_path):
+    text = "# generated\n---\n- id: 1\n-\n  id: 2\n"
+    assert list(iter_yaml_items(write(tmp_path, text), batch_size=1)) == [{"id": 1}, {"id": 2}]
+
+@pytest.mark.parametrize("text, expected", [
+    ("[{id: 1}, {id: 2}]\n", [{"id": 1}, {"id": 2}]),
+    ("[]\n", []),
+    ("", []),
+])
+def test_flow_style_and_empty_files(tmp_path, text, expected):
+    assert list(iter_yaml_items(write(tmp_path, text))) == expected
+
+@pytest.mark.parametrize("text", ["id: 1\n", "just a string\n"])
+def test_non_sequence_raises_value_error(tmp_path, text):
+    with pytest.raises(ValueError):
+        list(iter_yaml_items(write(tmp_path, text)))
@@ -0,0 +1,112 @@
+# ==============================================================================
+# ファイル: merge_reports.py
+# 説明: このスクリプトは、app.py が出力した複数のレポート (urls/urls_*.yaml) を
+#       (id, バージョン) をキーとして1つにまとめ、統合したレポートを出力します。
+#       同じ (id, バージョン) は、より新しいレポートで取得できたURLを優先します。
+#       ERROR のバージョンが、過去に取得できたURLを消すことはありません。
+#       また、統合前からの差分(追加・変更されたURL)を表示し、差分のみのレポートを
+#       出力できます。差分のみのレポートは download_videos.py にそのまま渡せます。
+#
+# 使い方:
+# python tools/merge_reports.py [レポート ...] --output [統合レポート]
+#
+# 例:
+# python tools/merge_reports.py urls/urls_*.yaml --output urls/merged.yaml --changed urls/changed.yaml
+# python downloader/download_videos.py urls/changed.yaml
+#
+# --output のファイルが既に存在する場合は、それを前回の統合結果として読み込み、
+# 今回追加したレポートとの差分を表示します。存在しない場合は、最も新しいレポートに
+# よる差分を表示します。
+# レポートは、ファイル名の日時 (urls_YYYY-MM-DD-HHMMSS) の順に古いものから適用します。
+# 解析したレポートは cache/report_index/ にJSONで保存し、2回目以降は変更された
+# レポートのみYAMLを解析します。
+# ==============================================================================
+
+import argparse
+import logging
+import os
+import sys
+
+# プロジェクトのルートをシステムパスに追加し、'src'パッケージをインポートできるようにする
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from src.reporters.report_index import ReportIndex, report_sort_key, ADDED, CHANGED, METADATA
+from src.reporters.yaml_reporter import write_entries
+
+DEFAULT_CACHE_DIR = os.path.join("cache", "report_index")
+DIFF_MARKS = {ADDED: "+", CHANGED: "~", METADATA: "*"}
+
+def format_change(change) -> str:
+    target = "metadata" if change.kind == METADATA else f"ver {change.version if change.version is not None else 'N/A'}"
+    if change.kind == ADDED:
+        return f"{DIFF_MARKS[change.kind]} {change.video_id} {target}: {change.new}"
+    return f"{DIFF_MARKS[change.kind]} {change.video_id} {target}: {change.old} -> {change.new}"
+
+def main():
+    parser = argparse.ArgumentParser(description="複数のレポートを統合し、差分を表示します。")
+    parser.add_argument("reports", nargs="+", help="統合するレポート (urls_*.yaml)")
+    parser.add_argument("-o", "--output", required=True, help="統合したレポートの出力先")
+    parser.add_argument("--base", help="差分の比較元とするレポート (デフォルト: --outputのファイルが存在すればそれ)")
+    parser.add_argument("--changed", help="追加・変更されたURLのみを含むレポートの出力先 (download_videos.pyの入力用)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="レポートを並行して読み込むプロセス数")
+    parser.add_argument(
+        "--cache-dir", default=DEFAULT_CACHE_DIR,
+        help=f"解析したレポートのキャッシュの保存先 (デフォルト: {DEFAULT_CACHE_DIR})"
+    )
+    parser.add_argument("--no-cache", action="store_true", help="キャッシュを使用せず、すべてのレポートを解析します")
+    parser.add_argument("--summary", action="store_true", help="差分の件数のみ表示します")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    base_path = args.base or (args.output if os.path.exists(args.output) else None)
+    if base_path and not os.path.exists(base_path):
+        print(f"エラー: 比較元のレポートが見つかりません: {base_path}")
+        sys.exit(1)
+
+    excluded = {os.path.abspath(p) for p in (base_path, args.output) if p}
+    reports = []
+    for path in args.reports:
+        if not os.path.exists(path):
+            print(f"エラー: レポートが見つかりません: {path}")
+            sys.exit(1)
+        if os.path.abspath(path) not in excluded and path not in reports:
+            reports.append(path)
+    reports.sort(key=report_sort_key)
+    if not reports and not base_path:
+        print("エラー: 統合するレポートがありません。")
+        sys.exit(1)
+
+    # 比較元を先に読み込み、その上に新しいレポートを重ねる
+    cache_dir = None if args.no_cache else args.cache_dir
+    index = ReportIndex()
+    if base_path:
+        # 比較元(統合レポート)は毎回書き換わるため、キャッシュしない
+        index.load([base_path])
+        base = index.copy()
+        index.load(reports, args.jobs, cache_dir)
+    else:
+        index.load(reports[:-1], args.jobs, cache_dir)
+        base = index.copy()
+        index.load(reports[-1:], cache_dir=cache_dir)
+
+    changes = index.diff(base)
+    if not args.summary:
+        for change in changes:
+            print(format_change(change))
+    counts = {kind: sum(1 for change in changes if change.kind == kind) for kind in DIFF_MARKS}
+    print(
+        f"\n{len(reports)} 件のレポートを統合しました (比較元: {base_path or reports[-1] + ' より前のレポート'})。"
+        f"\n追加: {counts[ADDED]} 件, 変更: {counts[CHANGED]} 件, メタデータの変更: {counts[METADATA]} 件"
+    )
+
+    written = write_entries(index.iter_entries(), args.output)
+    print(f"統合したレポートを保存しました: {args.output} ({written} 件)")
+
+    if args.changed:
+        written = write_entries(index.subset(changes).iter_entries(), args.changed)
+        print(f"差分のみのレポートを保存しました: {args.changed} ({written} 件)")
+
+if __name__ == '__main__':
+    main()